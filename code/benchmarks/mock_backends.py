@@ -0,0 +1,280 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Deterministic stand-ins for the LLM, embedding and vector database backends, so
+that the whole query pipeline can be benchmarked offline. Each one waits for a
+time drawn from a configurable latency distribution and then returns a
+synthetic answer that depends only on its input:
+
+- MockLLMProvider answers every prompt in the shape of its return structure,
+  steering the pre-retrieval checks down their common path (relevant query, no
+  decontextualization, no memory request) and scoring items by a hash of the
+  prompt, so roughly half of them pass the ranking threshold.
+- MockEmbeddingProvider turns each text into a fixed pseudo-random unit vector.
+- SyntheticVectorStore holds generated items and does an exact dot-product
+  search over their vectors.
+
+install() registers all three and makes them the preferred providers.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config.config import CONFIG, EmbeddingProviderConfig, LLMProviderConfig, ModelConfig, RetrievalProviderConfig
+from embedding.cache import embedding_cache
+from embedding.embedding import get_embedding, register_embedding_provider
+from llm import llm
+from llm.llm_provider import LLMProvider
+import retrieval.retriever as retriever
+from retrieval.search_result import SearchResult
+from utils.utils import siteToItemType
+
+# Name of the stand-in LLM provider, embedding provider and retrieval endpoint
+BENCHMARK_PROVIDER = "benchmark"
+BENCHMARK_SITE = "benchmark_site"
+
+# Answers to the yes/no questions of the pre-retrieval prompts that let a query go
+# straight to ranking; any other "True or False" field is answered "False"
+BOOLEAN_ANSWERS = {
+    "site_is_irrelevant_to_query": "False",
+    "requires_decontextualization": "False",
+    "is_memory_request": "False",
+    "single_item_type_query": "True",
+    "item_details_query": "False",
+    "required_info_found": "True",
+}
+
+_ID_PATTERN = re.compile(r'"id":\s*(\d+)')
+_URL_PATTERN = re.compile(r'https?://[^\s"\\]+')
+
+_WORDS = ("spicy", "vegan", "quick", "classic", "smoky", "summer", "winter", "crispy",
+          "lentil", "noodle", "salad", "curry", "soup", "tart", "bread", "stew")
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+class LatencyModel:
+    """
+    Seconds a stand-in backend waits per call, drawn from a seeded distribution.
+    Specs are "fixed:SECONDS", "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA";
+    a bare number means fixed.
+    """
+
+    KINDS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0, seed: int = 0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}', expected one of {self.KINDS}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 0) -> "LatencyModel":
+        kind, _, params = spec.partition(":")
+        try:
+            if not params:
+                return cls("fixed", float(kind), seed=seed)
+            values = [float(value) for value in params.split(":")]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        if kind == "fixed" and len(values) == 1:
+            return cls(kind, values[0], seed=seed)
+        if kind in ("uniform", "lognormal") and len(values) == 2:
+            return cls(kind, values[0], values[1], seed=seed)
+        raise ValueError(f"Invalid latency spec '{spec}'")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return self._rng.uniform(self.a, self.b)
+        return self._rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+
+    async def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def __str__(self):
+        if self.kind == "fixed":
+            return f"fixed {self.a * 1000:.0f}ms"
+        if self.kind == "uniform":
+            return f"uniform {self.a * 1000:.0f}-{self.b * 1000:.0f}ms"
+        return f"lognormal median {self.a * 1000:.0f}ms sigma {self.b}"
+
+
+class MockLLMProvider(LLMProvider):
+    """LLM provider whose answers are a function of the prompt and the requested structure."""
+
+    def __init__(self, latency: LatencyModel, item_type: Optional[str] = None):
+        self.latency = latency
+        self.item_type = item_type or siteToItemType(BENCHMARK_SITE)
+        self.calls = 0
+
+    @classmethod
+    def get_client(cls):
+        return None
+
+    @classmethod
+    def clean_response(cls, content: str) -> Dict[str, Any]:
+        return json.loads(content)
+
+    async def get_completion(self, prompt: str, schema: Dict[str, Any], model: Optional[str] = None,
+                             temperature: float = 0.7, max_tokens: int = 2048, timeout: float = 30.0,
+                             **kwargs) -> Dict[str, Any]:
+        self.calls += 1
+        await self.latency.wait()
+        return self.answer(prompt, schema)
+
+    def answer(self, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: self._value(key, spec, prompt) for key, spec in (schema or {}).items()}
+
+    def _value(self, key, spec, prompt):
+        if key == "rankings":
+            return [{"id": int(item_id), "score": self._score(f"{item_id}:{prompt}"),
+                     "description": f"Synthetic description of item {item_id}"}
+                    for item_id in _ID_PATTERN.findall(prompt)]
+        if key == "score":
+            return self._score(prompt)
+        if key == "item_type":
+            return self.item_type
+        if key == "urls":
+            return list(dict.fromkeys(_URL_PATTERN.findall(prompt)))[:3]
+        if key in BOOLEAN_ANSWERS:
+            return BOOLEAN_ANSWERS[key]
+        if isinstance(spec, str) and spec.startswith("True or False"):
+            return "False"
+        if isinstance(spec, dict):
+            return self.answer(prompt, spec)
+        return f"Synthetic {key.replace('_', ' ')}"
+
+    @staticmethod
+    def _score(text: str) -> int:
+        return _digest(text) % 101
+
+
+class MockEmbeddingProvider:
+    """Embeds each text as a unit vector seeded by its hash."""
+
+    def __init__(self, latency: LatencyModel, dimensions: int = 256):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def vector(self, text: str) -> np.ndarray:
+        rng = np.random.default_rng(_digest(text))
+        vector = rng.standard_normal(self.dimensions).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    async def get_embeddings(self, text: str, model: Optional[str] = None) -> List[float]:
+        self.calls += 1
+        await self.latency.wait()
+        return self.vector(text).tolist()
+
+
+class SyntheticVectorStore:
+    """In-memory vector database of generated items, searched exactly by dot product."""
+
+    def __init__(self, embedder: MockEmbeddingProvider, latency: LatencyModel,
+                 num_items: int = 2000, sites: Optional[List[str]] = None, seed: int = 0):
+        self.latency = latency
+        self.sites = list(sites or [BENCHMARK_SITE])
+        rng = random.Random(seed)
+        self.rows = []
+        vectors = []
+        for i in range(num_items):
+            site = self.sites[i % len(self.sites)]
+            name = " ".join(rng.choice(_WORDS) for _ in range(3)).title()
+            url = f"https://{site}.example.com/items/{i}"
+            schema_object = {"@type": "Thing", "name": name, "url": url,
+                             "description": f"{name}, synthetic item {i} of {site}."}
+            self.rows.append([url, json.dumps(schema_object), name, site])
+            vectors.append(embedder.vector(url))
+        self.vectors = np.stack(vectors) if vectors else np.zeros((0, embedder.dimensions), np.float32)
+        self.site_ids = np.array([self.sites.index(row[3]) for row in self.rows], dtype=np.int32)
+
+    def _site_mask(self, site):
+        if site in (None, "all"):
+            return None
+        names = site if isinstance(site, list) else [site]
+        ids = [self.sites.index(name) for name in names if name in self.sites]
+        return np.isin(self.site_ids, ids)
+
+    async def search(self, query, site, num_results=50, with_vectors=False, **kwargs):
+        embedding = await get_embedding(query)
+        await self.latency.wait()
+        scores = self.vectors @ np.asarray(embedding, dtype=np.float32)
+        mask = self._site_mask(site)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        count = min(num_results, int(np.isfinite(scores).sum()))
+        if count <= 0:
+            return []
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top])]
+        return [SearchResult(*self.rows[i], score=float(scores[i]), rank=rank,
+                             vector=self.vectors[i].tolist() if with_vectors else None)
+                for rank, i in enumerate(top)]
+
+    async def search_all_sites(self, query, num_results=50, with_vectors=False, **kwargs):
+        return await self.search(query, "all", num_results, with_vectors)
+
+    async def search_by_url(self, url, **kwargs):
+        await self.latency.wait()
+        for row in self.rows:
+            if row[0] == url:
+                return SearchResult(*row)
+        return None
+
+    async def upload_documents(self, documents, **kwargs):
+        return 0
+
+    async def delete_documents_by_site(self, site, **kwargs):
+        return 0
+
+
+def install(llm_latency: LatencyModel, embedding_latency: LatencyModel, search_latency: LatencyModel,
+            num_items: int = 2000, dimensions: int = 256, seed: int = 0, caches: bool = False):
+    """
+    Register the stand-in backends and make them the preferred LLM provider,
+    embedding provider and retrieval endpoint. Unless `caches` is set, the LLM
+    and embedding caches are turned off so that every call reaches a backend.
+    """
+    llm_provider = MockLLMProvider(llm_latency)
+    CONFIG.llm_providers[BENCHMARK_PROVIDER] = LLMProviderConfig(
+        models=ModelConfig(high="benchmark-high", low="benchmark-low")
+    )
+    CONFIG.preferred_llm_provider = BENCHMARK_PROVIDER
+    llm._providers[BENCHMARK_PROVIDER] = llm_provider
+
+    embedder = MockEmbeddingProvider(embedding_latency, dimensions)
+    CONFIG.embedding_providers[BENCHMARK_PROVIDER] = EmbeddingProviderConfig(model="benchmark-embedding")
+    CONFIG.preferred_embedding_provider = BENCHMARK_PROVIDER
+    register_embedding_provider(BENCHMARK_PROVIDER, embedder.get_embeddings)
+
+    sites = [site for site in CONFIG.nlweb.sites if site != "all"] or None
+    store = SyntheticVectorStore(embedder, search_latency, num_items, sites, seed)
+    CONFIG.retrieval_endpoints[BENCHMARK_PROVIDER] = RetrievalProviderConfig(db_type="synthetic")
+    CONFIG.preferred_retrieval_endpoint = BENCHMARK_PROVIDER
+    retriever._client_cache[f"synthetic_{BENCHMARK_PROVIDER}"] = store
+    retriever._search_semaphores.pop(BENCHMARK_PROVIDER, None)
+
+    if not caches:
+        CONFIG.llm_cache.enabled = False
+        embedding_cache.enabled = False
+    return llm_provider, embedder, store
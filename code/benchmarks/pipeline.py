@@ -0,0 +1,237 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+End-to-end benchmark of the /ask pipeline, run offline against the stand-in
+backends of benchmarks.mock_backends. A closed-loop load generator keeps a
+fixed number of queries in flight, either through the web server's
+fulfill_request (routing, admission control, SSE streaming) or by calling
+NLWebHandler.runQuery directly, and reports the p50/p95/p99 time to the first
+result and total latency, and the number of requests per second.
+
+Usage (from the code directory):
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --concurrency 1,8,32 --requests 200 --llm-latency lognormal:0.4:0.5
+    python -m benchmarks.pipeline --target handler --generate-mode summarize --output results.json
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import random
+import time
+from typing import List, Optional
+
+from benchmarks.mock_backends import LatencyModel, install
+from core.baseHandler import NLWebHandler, RESULT_MESSAGE_TYPES
+from core.generate_answer import GenerateAnswer
+from prompts.prompts import ensure_prompts_loaded
+from webserver.WebServer import fulfill_request
+
+TARGETS = ("http", "handler")
+
+_RESULT_MARKERS = tuple(f'"message_type": "{message_type}"' for message_type in RESULT_MESSAGE_TYPES)
+
+_WORDS = ("spicy", "vegan", "quick", "classic", "smoky", "summer", "winter", "crispy",
+          "lentil", "noodle", "salad", "curry", "soup", "tart", "bread", "stew")
+
+
+def make_queries(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [f"{' '.join(rng.choice(_WORDS) for _ in range(3))} {i}" for i in range(count)]
+
+
+class RequestTiming:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_result: Optional[float] = None
+        self.end: Optional[float] = None
+        self.status = 200
+        self.error: Optional[str] = None
+
+    def result_seen(self):
+        if self.first_result is None:
+            self.first_result = time.perf_counter() - self.start
+
+    def finish(self):
+        self.end = time.perf_counter() - self.start
+
+    @property
+    def ok(self):
+        return self.error is None and self.status < 400
+
+
+class _TimingStream:
+    """Stands in for the HTTP handler that NLWebHandler streams its messages to."""
+
+    def __init__(self, timing: RequestTiming):
+        self.timing = timing
+
+    async def write_stream(self, message, end_response=False):
+        if message.get("message_type") in RESULT_MESSAGE_TYPES:
+            self.timing.result_seen()
+
+
+async def run_http(query: str, site: str, generate_mode: str) -> RequestTiming:
+    timing = RequestTiming()
+
+    async def send_response(status, headers, end_response=False):
+        timing.status = status
+
+    async def send_chunk(chunk, end_response=False):
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("utf-8", errors="replace")
+        if timing.first_result is None and any(marker in chunk for marker in _RESULT_MARKERS):
+            timing.result_seen()
+
+    query_params = {"query": [query], "site": [site], "generate_mode": [generate_mode]}
+    try:
+        await fulfill_request("GET", "/ask", {}, query_params, None, send_response, send_chunk)
+    except Exception as e:
+        timing.error = f"{type(e).__name__}: {e}"
+    timing.finish()
+    return timing
+
+
+async def run_handler(query: str, site: str, generate_mode: str) -> RequestTiming:
+    timing = RequestTiming()
+    query_params = {"query": [query], "site": [site], "generate_mode": [generate_mode]}
+    handler_class = GenerateAnswer if generate_mode == "generate" else NLWebHandler
+    try:
+        await handler_class(query_params, _TimingStream(timing)).runQuery()
+    except Exception as e:
+        timing.error = f"{type(e).__name__}: {e}"
+    timing.finish()
+    return timing
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of `values`, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def run_level(target: str, concurrency: int, queries: List[str], site: str, generate_mode: str):
+    """Run every query with `concurrency` queries in flight; returns the timings and the wall time."""
+    run = run_http if target == "http" else run_handler
+    pending = iter(queries)
+    timings = []
+
+    async def worker():
+        for query in pending:
+            timings.append(await run(query, site, generate_mode))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return timings, time.perf_counter() - start
+
+
+def summarize(concurrency: int, timings: List[RequestTiming], elapsed: float):
+    ok = [t for t in timings if t.ok]
+    ttfr = [t.first_result for t in ok if t.first_result is not None]
+    total = [t.end for t in ok]
+    summary = {
+        "concurrency": concurrency,
+        "requests": len(timings),
+        "errors": len(timings) - len(ok),
+        "without_results": len(ok) - len(ttfr),
+        "requests_per_second": len(ok) / elapsed if elapsed > 0 else 0.0,
+    }
+    for name, values in (("ttfr", ttfr), ("total", total)):
+        for p in (50, 95, 99):
+            summary[f"{name}_p{p}_ms"] = None if not values else percentile(values, p) * 1000
+    return summary
+
+
+def _ms(value):
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_report(summaries):
+    print(f"{'in-flight':>10} {'req/s':>8} {'errors':>7} "
+          f"{'ttfr p50':>9} {'p95':>8} {'p99':>8} {'total p50':>10} {'p95':>8} {'p99':>8}  (ms)")
+    for s in summaries:
+        print(f"{s['concurrency']:>10} {s['requests_per_second']:>8.1f} {s['errors']:>7} "
+              f"{_ms(s['ttfr_p50_ms']):>9} {_ms(s['ttfr_p95_ms'])} {_ms(s['ttfr_p99_ms'])} "
+              f"{_ms(s['total_p50_ms']):>10} {_ms(s['total_p95_ms'])} {_ms(s['total_p99_ms'])}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline /ask pipeline benchmark with stand-in backends")
+    parser.add_argument("--target", choices=TARGETS, default="http",
+                        help="Drive fulfill_request (http) or NLWebHandler.runQuery (handler)")
+    parser.add_argument("--concurrency", type=str, default="1,4,16",
+                        help="Comma-separated numbers of queries in flight")
+    parser.add_argument("--requests", type=int, default=100, help="Queries per concurrency level")
+    parser.add_argument("--warmup", type=int, default=5, help="Queries run before measuring")
+    parser.add_argument("--site", default="all")
+    parser.add_argument("--generate-mode", default="none", choices=("none", "list", "summarize", "generate"))
+    parser.add_argument("--llm-latency", default="lognormal:0.3:0.4",
+                        help="LLM latency: fixed:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA (seconds)")
+    parser.add_argument("--embedding-latency", default="lognormal:0.05:0.3")
+    parser.add_argument("--search-latency", default="lognormal:0.03:0.3")
+    parser.add_argument("--items", type=int, default=2000, help="Items in the synthetic vector store")
+    parser.add_argument("--dimensions", type=int, default=256, help="Embedding dimensions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--caches", action="store_true", help="Keep the LLM and embedding caches enabled")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own logging and output")
+    args = parser.parse_args()
+
+    # The pipeline logs and prints every step; only the report is wanted here
+    quiet = contextlib.nullcontext()
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+        quiet = contextlib.redirect_stdout(open(os.devnull, "w"))
+
+    llm_latency = LatencyModel.parse(args.llm_latency, args.seed)
+    embedding_latency = LatencyModel.parse(args.embedding_latency, args.seed + 1)
+    search_latency = LatencyModel.parse(args.search_latency, args.seed + 2)
+    llm_provider, embedder, _store = install(llm_latency, embedding_latency, search_latency,
+                                             args.items, args.dimensions, args.seed, args.caches)
+    ensure_prompts_loaded()
+
+    print(f"Target {args.target}, generate_mode {args.generate_mode}, {args.requests} queries per level")
+    print(f"LLM {llm_latency}, embedding {embedding_latency}, search {search_latency}, "
+          f"{args.items} items of {args.dimensions} dimensions")
+
+    levels = [int(x) for x in args.concurrency.split(",")]
+    summaries = []
+    failures = []
+    with quiet:
+        if args.warmup > 0:
+            await run_level(args.target, min(levels), make_queries(args.warmup, args.seed - 1), args.site,
+                            args.generate_mode)
+        for level in levels:
+            llm_calls, embedding_calls = llm_provider.calls, embedder.calls
+            timings, elapsed = await run_level(args.target, level, make_queries(args.requests, args.seed + level),
+                                               args.site, args.generate_mode)
+            summary = summarize(level, timings, elapsed)
+            summary["llm_calls_per_request"] = (llm_provider.calls - llm_calls) / max(1, len(timings))
+            summary["embedding_calls_per_request"] = (embedder.calls - embedding_calls) / max(1, len(timings))
+            summaries.append(summary)
+            errors = [t.error or f"HTTP {t.status}" for t in timings if not t.ok]
+            if errors:
+                failures.append(f"{len(errors)} failed requests at {level} in flight, e.g. {errors[0]}")
+
+    for failure in failures:
+        print(failure)
+    print_report(summaries)
+    print(f"LLM calls per query {summaries[-1]['llm_calls_per_request']:.1f}, "
+          f"embedding calls per query {summaries[-1]['embedding_calls_per_request']:.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "levels": summaries}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Benchmark for VectorDBClient search throughput as the number of in-flight
+requests grows. A synthetic backend with a fixed per-search latency stands in
+for the vector database, so the numbers reflect the client's concurrency model
+rather than any particular backend.
+
+Usage (from the code directory):
+    python -m benchmarks.retrieval_concurrency
+    python -m benchmarks.retrieval_concurrency --latency 0.05 --max-concurrency 16 --requests 400
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import argparse
+import asyncio
+import time
+
+from config.config import CONFIG, RetrievalProviderConfig
+import retrieval.retriever as retriever
+
+BENCHMARK_ENDPOINT = "benchmark_synthetic"
+
+
+class SyntheticSearchBackend:
+    """Backend whose searches take a fixed time and can all run concurrently."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def search(self, query, site, num_results=50, **kwargs):
+        await asyncio.sleep(self.latency)
+        return [[f"https://example.com/{query}/{i}", "{}", f"item {i}", site] for i in range(num_results)]
+
+    async def search_all_sites(self, query, num_results=50, **kwargs):
+        return await self.search(query, "all", num_results)
+
+    async def search_by_url(self, url, **kwargs):
+        await asyncio.sleep(self.latency)
+        return [url, "{}", "item", "site"]
+
+    async def upload_documents(self, documents, **kwargs):
+        return len(documents)
+
+    async def delete_documents_by_site(self, site, **kwargs):
+        return 0
+
+
+def install_backend(latency: float, max_concurrency: int):
+    CONFIG.retrieval_endpoints[BENCHMARK_ENDPOINT] = RetrievalProviderConfig(
+        db_type="synthetic", max_concurrency=max_concurrency
+    )
+    retriever._client_cache[f"synthetic_{BENCHMARK_ENDPOINT}"] = SyntheticSearchBackend(latency)
+    # Fresh semaphore for the new limit
+    retriever._search_semaphores.pop(BENCHMARK_ENDPOINT, None)
+
+
+async def run_level(in_flight: int, total_requests: int) -> float:
+    """Issue `total_requests` searches with `in_flight` concurrent callers; returns searches/sec."""
+    remaining = total_requests
+
+    async def caller(worker_id):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            # A new client per request, as NLWebHandler does
+            client = retriever.get_vector_db_client(BENCHMARK_ENDPOINT)
+            await client.search(f"query {worker_id}", "example_site", num_results=10)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[caller(i) for i in range(in_flight)])
+    return total_requests / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="VectorDBClient search throughput benchmark")
+    parser.add_argument("--latency", type=float, default=0.02, help="Synthetic search latency in seconds")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Endpoint max_concurrency to test")
+    parser.add_argument("--requests", type=int, default=200, help="Searches per concurrency level")
+    parser.add_argument("--levels", type=str, default="1,2,4,8,16,32,64",
+                        help="Comma-separated in-flight request counts")
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.levels.split(",")]
+    ideal_per_slot = 1.0 / args.latency
+
+    print(f"Synthetic latency {args.latency * 1000:.0f}ms, {args.requests} searches per level")
+    print(f"{'in-flight':>10} {'serialized (1)':>16} {f'semaphore ({args.max_concurrency})':>18}")
+    for level in levels:
+        install_backend(args.latency, 1)
+        serialized = await run_level(level, args.requests)
+        install_backend(args.latency, args.max_concurrency)
+        bounded = await run_level(level, args.requests)
+        print(f"{level:>10} {serialized:>14.1f}/s {bounded:>16.1f}/s")
+    print(f"Upper bound: {ideal_per_slot:.1f}/s per slot, "
+          f"{ideal_per_slot * args.max_concurrency:.1f}/s at max_concurrency={args.max_concurrency}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -26,6 +26,43 @@ class LLMProviderConfig:
     endpoint: Optional[str] = None
     api_version: Optional[str] = None
 
+@dataclass
+class LLMRateLimits:
+    max_concurrency: int = 32  # Maximum in-flight calls; 0 means unlimited
+    requests_per_minute: int = 0  # 0 means unlimited
+    tokens_per_minute: int = 0  # 0 means unlimited
+
+@dataclass
+class LLMSchedulerConfig:
+    enabled: bool = True
+    queue_timeout: float = 30.0  # Maximum seconds a call may wait for admission
+    default: LLMRateLimits = field(default_factory=LLMRateLimits)
+    providers: Dict[str, LLMRateLimits] = field(default_factory=dict)  # Per-provider overrides
+    models: Dict[str, LLMRateLimits] = field(default_factory=dict)  # Per-model overrides
+
+    def get_limits(self, provider_name: str, model: str) -> LLMRateLimits:
+        """Most specific limits for a provider/model pair: model, then provider, then default."""
+        if model in self.models:
+            return self.models[model]
+        if provider_name in self.providers:
+            return self.providers[provider_name]
+        return self.default
+
+@dataclass
+class LLMCacheConfig:
+    enabled: bool = True
+    max_entries: int = 10000  # Size of the in-memory LRU tier
+    default_ttl: int = 3600  # Seconds; 0 disables caching
+    prompt_ttls: Dict[str, int] = field(default_factory=dict)  # Per prompt-name TTL overrides
+    disk_enabled: bool = False
+    disk_path: Optional[str] = None  # SQLite file for the persistent tier
+    disk_max_entries: int = 200000
+
+    def get_ttl(self, prompt_name: Optional[str]) -> int:
+        if prompt_name and prompt_name in self.prompt_ttls:
+            return self.prompt_ttls[prompt_name]
+        return self.default_ttl
+
 @dataclass
 class EmbeddingProviderConfig:
     api_key: Optional[str] = None
@@ -33,6 +70,25 @@ class EmbeddingProviderConfig:
     api_version: Optional[str] = None
     model: Optional[str] = None
 
+@dataclass
+class EmbeddingCacheConfig:
+    enabled: bool = True
+    max_entries: int = 5000  # Size of the in-memory LRU tier
+    disk_enabled: bool = False
+    disk_path: Optional[str] = None  # SQLite file for the persistent tier
+    disk_max_entries: int = 100000
+
+@dataclass
+class EmbeddingLoaderConfig:
+    concurrency: int = 4  # Embedding batches in flight at once while loading
+    requests_per_minute: int = 0  # 0 = unlimited
+    tokens_per_minute: int = 0  # 0 = unlimited
+    adaptive_batching: bool = True
+    target_batch_seconds: float = 5.0  # Batch latency adaptive sizing aims for
+    min_batch_size: int = 16
+    max_batch_size: int = 1024
+    max_batch_tokens: int = 100000  # Upper bound on the estimated tokens in one batch
+
 @dataclass
 class RetrievalProviderConfig:
     api_key: Optional[str] = None
@@ -40,6 +96,10 @@ class RetrievalProviderConfig:
     database_path: Optional[str] = None
     index_name: Optional[str] = None
     db_type: Optional[str] = None  
+    max_concurrency: int = 16  # Maximum concurrent searches against this endpoint
+    vector_dtype: str = "float32"  # local_index only: float32 or float16 storage
+    ivf_lists: int = 0  # local_index only: number of IVF lists, 0 for exact search
+    ivf_probes: int = 8  # local_index only: IVF lists scanned per query
 
 @dataclass
 class SSLConfig:
@@ -57,23 +117,92 @@ class StaticConfig:
     enable_cache: bool = True
     cache_max_age: int = 3600
     gzip_enabled: bool = True
+    memory_cache_max_bytes: int = 64 * 1024 * 1024  # Total size of static files kept in memory
+    sendfile_min_size: int = 256 * 1024  # Files at least this large are streamed with sendfile, not cached
+
+@dataclass
+class AdmissionLimits:
+    max_in_flight: int = 0  # Requests of this class processed at once; 0 means unlimited
+    max_queue: int = 0  # Requests of this class waiting for a slot; beyond this they are rejected at once
+
+@dataclass
+class AdmissionConfig:
+    enabled: bool = True
+    queue_timeout: float = 10.0  # Maximum seconds a request waits for a slot before it is rejected
+    retry_after: int = 5  # Seconds advertised in the Retry-After header of 503 responses
+    expensive: AdmissionLimits = field(default_factory=lambda: AdmissionLimits(16, 64))  # /ask and MCP calls
+    standard: AdmissionLimits = field(default_factory=lambda: AdmissionLimits(256, 256))  # static files, who, ...
+
+@dataclass
+class CompressionConfig:
+    enabled: bool = True  # Compress responses according to the client's Accept-Encoding
+    min_size: int = 1024  # Bodies smaller than this many bytes are sent uncompressed
+    gzip_level: int = 6
+    brotli_quality: int = 4  # Used only when the optional brotli package is installed
+
+@dataclass
+class PreforkConfig:
+    workers: int = 0  # Worker processes started by webserver.prefork; 0 means one per CPU
+    graceful_timeout: int = 30  # Seconds a stopping worker waits for in-flight requests
+    share_caches: bool = True  # Share LLM and embedding caches between workers through their disk tiers
+    split_limits: bool = True  # Divide LLM rate limits, max_connections and admission limits among workers
 
 @dataclass
 class ServerConfig:
     host: str = "localhost"
     enable_cors: bool = True
     max_connections: int = 100
-    timeout: int = 30
+    timeout: int = 30  # Seconds a persistent connection may sit idle between requests
+    max_requests_per_connection: int = 100  # Requests served on one keep-alive connection before it is closed
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+    compression: CompressionConfig = field(default_factory=CompressionConfig)
+    prefork: PreforkConfig = field(default_factory=PreforkConfig)
     ssl: Optional[SSLConfig] = None
     logging: Optional[LoggingConfig] = None
     static: Optional[StaticConfig] = None
 
+# First-stage scorers of the ranking cascade
+RANKING_CASCADE_SCORERS = ("none", "retrieval", "bm25")
+
+@dataclass
+class RankingCascadeConfig:
+    scorer: str = "none"  # First stage: none, retrieval (the backend's result order) or bm25 (lexical, over the item JSON)
+    shortlist_size: int = 20  # Items per site passed on to LLM ranking
+
+@dataclass
+class RankingConfig:
+    batch_size: int = 1  # Number of items packed into one ranking prompt; 1 ranks each item separately
+    batch_timeout: int = 20  # Timeout in seconds for a batched ranking call
+    early_stop: bool = False  # Stop ranking once the top results have scores the remaining items are unlikely to beat
+    early_stop_margin: int = 15  # The top results are settled when the lowest of them is within this many points of 100
+    max_concurrency: int = 16  # Ranking calls in flight per query with early_stop; items start in retrieval order
+    cascade: RankingCascadeConfig = field(default_factory=RankingCascadeConfig)
+    site_cascades: Dict[str, RankingCascadeConfig] = field(default_factory=dict)  # Per-site overrides
+
+    def get_cascade(self, site: str) -> RankingCascadeConfig:
+        """First-stage settings for items of `site`: its override, or the default."""
+        return self.site_cascades.get(site, self.cascade)
+
+@dataclass
+class PromptsConfig:
+    hot_reload: bool = False  # Rebuild the prompt index when site_type.xml changes on disk
+    reload_check_interval: float = 2.0  # Seconds between checks of the prompt files' modification times
+
+@dataclass
+class TracingConfig:
+    enabled: bool = False  # Record a latency trace for every query
+    export_path: str = "logs/traces.jsonl"  # JSON lines file the spans of finished traces are appended to
+    return_to_client: bool = False  # Allow clients to ask for their query's trace with trace=true
+
 @dataclass
 class NLWebConfig:
     sites: List[str]  # List of allowed sites
     json_data_folder: str = "./data/json"  # Default folder for JSON data
     json_with_embeddings_folder: str = "./data/json_with_embeddings"  # Default folder for JSON with embeddings
     chatbot_instructions: Dict[str, str] = field(default_factory=dict)  # Dictionary of chatbot instructions
+    ranking: RankingConfig = field(default_factory=RankingConfig)  # Ranking stage settings
+    prompts: PromptsConfig = field(default_factory=PromptsConfig)  # Prompt file loading
+    tracing: TracingConfig = field(default_factory=TracingConfig)  # Per-query latency tracing
 class AppConfig:
     config_paths = ["config.yaml", "config_llm.yaml", "config_embedding.yaml", "config_retrieval.yaml", 
                    "config_webserver.yaml", "config_nlweb.yaml"]
@@ -172,6 +301,58 @@ class AppConfig:
                     api_version=api_version
                 )
 
+            self.llm_scheduler = self._load_llm_scheduler_config(data.get("scheduler", {}) or {})
+            self.llm_cache = self._load_llm_cache_config(data.get("cache", {}) or {})
+
+    def _load_llm_cache_config(self, data: Dict[str, Any]) -> LLMCacheConfig:
+        disk_data = data.get("disk", {}) or {}
+        disk_path = self._get_config_value(disk_data.get("path"), "../../data/llm_cache.db")
+        return LLMCacheConfig(
+            enabled=self._get_config_value(data.get("enabled"), True),
+            max_entries=int(self._get_config_value(data.get("max_entries"), 10000)),
+            default_ttl=int(self._get_config_value(data.get("default_ttl"), 3600)),
+            prompt_ttls={name: int(ttl) for name, ttl in (data.get("prompt_ttls", {}) or {}).items()},
+            disk_enabled=self._get_config_value(disk_data.get("enabled"), False),
+            disk_path=self._resolve_path(disk_path),
+            disk_max_entries=int(self._get_config_value(disk_data.get("max_entries"), 200000))
+        )
+
+    def _load_llm_rate_limits(self, data: Dict[str, Any], base: LLMRateLimits) -> LLMRateLimits:
+        """Build rate limits from a YAML mapping, inheriting unset values from `base`."""
+        return LLMRateLimits(
+            max_concurrency=int(self._get_config_value(data.get("max_concurrency"), base.max_concurrency)),
+            requests_per_minute=int(self._get_config_value(data.get("requests_per_minute"), base.requests_per_minute)),
+            tokens_per_minute=int(self._get_config_value(data.get("tokens_per_minute"), base.tokens_per_minute))
+        )
+
+    def _load_ranking_cascade(self, data: Dict[str, Any], base: RankingCascadeConfig) -> RankingCascadeConfig:
+        """Build first-stage ranking settings from a YAML mapping, inheriting unset values from `base`."""
+        scorer = str(self._get_config_value(data.get("scorer"), base.scorer)).lower()
+        if scorer not in RANKING_CASCADE_SCORERS:
+            print(f"Warning: unknown ranking cascade scorer '{scorer}', using 'none'")
+            scorer = "none"
+        return RankingCascadeConfig(
+            scorer=scorer,
+            shortlist_size=max(1, int(self._get_config_value(data.get("shortlist_size"), base.shortlist_size)))
+        )
+
+    def _load_llm_scheduler_config(self, data: Dict[str, Any]) -> LLMSchedulerConfig:
+        default_limits = self._load_llm_rate_limits(data.get("default", {}) or {}, LLMRateLimits())
+        providers = {}
+        models = {}
+        for name, cfg in (data.get("providers", {}) or {}).items():
+            cfg = cfg or {}
+            providers[name] = self._load_llm_rate_limits(cfg, default_limits)
+            for model_name, model_cfg in (cfg.get("models", {}) or {}).items():
+                models[model_name] = self._load_llm_rate_limits(model_cfg or {}, providers[name])
+        return LLMSchedulerConfig(
+            enabled=self._get_config_value(data.get("enabled"), True),
+            queue_timeout=float(self._get_config_value(data.get("queue_timeout"), 30.0)),
+            default=default_limits,
+            providers=providers,
+            models=models
+        )
+
     def load_embedding_config(self, path: str = "config_embedding.yaml"):
         """Load embedding model configuration."""
         # Get the directory where this config.py file is located
@@ -208,6 +389,28 @@ class AppConfig:
                 model=model
             )
 
+        cache_data = data.get("cache", {}) or {}
+        disk_data = cache_data.get("disk", {}) or {}
+        self.embedding_cache = EmbeddingCacheConfig(
+            enabled=self._get_config_value(cache_data.get("enabled"), True),
+            max_entries=int(self._get_config_value(cache_data.get("max_entries"), 5000)),
+            disk_enabled=self._get_config_value(disk_data.get("enabled"), False),
+            disk_path=self._resolve_path(self._get_config_value(disk_data.get("path"), "../../data/embedding_cache.db")),
+            disk_max_entries=int(self._get_config_value(disk_data.get("max_entries"), 100000))
+        )
+
+        loader_data = data.get("loader", {}) or {}
+        self.embedding_loader = EmbeddingLoaderConfig(
+            concurrency=int(self._get_config_value(loader_data.get("concurrency"), 4)),
+            requests_per_minute=int(self._get_config_value(loader_data.get("requests_per_minute"), 0)),
+            tokens_per_minute=int(self._get_config_value(loader_data.get("tokens_per_minute"), 0)),
+            adaptive_batching=self._get_config_value(loader_data.get("adaptive_batching"), True),
+            target_batch_seconds=float(self._get_config_value(loader_data.get("target_batch_seconds"), 5.0)),
+            min_batch_size=int(self._get_config_value(loader_data.get("min_batch_size"), 16)),
+            max_batch_size=int(self._get_config_value(loader_data.get("max_batch_size"), 1024)),
+            max_batch_tokens=int(self._get_config_value(loader_data.get("max_batch_tokens"), 100000))
+        )
+
     def load_retrieval_config(self, path: str = "config_retrieval.yaml"):
         # Get the directory where this config.py file is located
         config_dir = os.path.dirname(os.path.abspath(__file__))
@@ -237,7 +440,11 @@ class AppConfig:
                 api_endpoint=self._get_config_value(cfg.get("api_endpoint_env")),
                 database_path=self._get_config_value(cfg.get("database_path")),
                 index_name=self._get_config_value(cfg.get("index_name")),
-                db_type=self._get_config_value(cfg.get("db_type"))  # Add db_type
+                db_type=self._get_config_value(cfg.get("db_type")),  # Add db_type
+                max_concurrency=int(self._get_config_value(cfg.get("max_concurrency"), 16)),
+                vector_dtype=self._get_config_value(cfg.get("vector_dtype"), "float32"),
+                ivf_lists=int(self._get_config_value(cfg.get("ivf_lists"), 0)),
+                ivf_probes=int(self._get_config_value(cfg.get("ivf_probes"), 8))
             )
     
     def load_webserver_config(self, path: str = "config_webserver.yaml"):
@@ -294,20 +501,63 @@ class AppConfig:
         static_config = StaticConfig(
             enable_cache=self._get_config_value(static_data.get("enable_cache"), True),
             cache_max_age=self._get_config_value(static_data.get("cache_max_age"), 3600),
-            gzip_enabled=self._get_config_value(static_data.get("gzip_enabled"), True)
+            gzip_enabled=self._get_config_value(static_data.get("gzip_enabled"), True),
+            memory_cache_max_bytes=int(self._get_config_value(static_data.get("memory_cache_max_bytes"), 64 * 1024 * 1024)),
+            sendfile_min_size=int(self._get_config_value(static_data.get("sendfile_min_size"), 256 * 1024))
         )
         
+        # Admission control configuration
+        admission_data = server_data.get("admission", {}) or {}
+        admission_defaults = AdmissionConfig()
+        admission_config = AdmissionConfig(
+            enabled=self._get_config_value(admission_data.get("enabled"), True),
+            queue_timeout=float(self._get_config_value(admission_data.get("queue_timeout"), 10.0)),
+            retry_after=int(self._get_config_value(admission_data.get("retry_after"), 5)),
+            expensive=self._load_admission_limits(admission_data.get("expensive", {}) or {},
+                                                  admission_defaults.expensive),
+            standard=self._load_admission_limits(admission_data.get("standard", {}) or {},
+                                                 admission_defaults.standard)
+        )
+
+        # Response compression configuration
+        compression_data = server_data.get("compression", {}) or {}
+        compression_config = CompressionConfig(
+            enabled=self._get_config_value(compression_data.get("enabled"), True),
+            min_size=int(self._get_config_value(compression_data.get("min_size"), 1024)),
+            gzip_level=int(self._get_config_value(compression_data.get("gzip_level"), 6)),
+            brotli_quality=int(self._get_config_value(compression_data.get("brotli_quality"), 4))
+        )
+
+        # Multi-process worker configuration
+        prefork_data = server_data.get("prefork", {}) or {}
+        prefork_config = PreforkConfig(
+            workers=int(self._get_config_value(prefork_data.get("workers"), 0)),
+            graceful_timeout=int(self._get_config_value(prefork_data.get("graceful_timeout"), 30)),
+            share_caches=self._get_config_value(prefork_data.get("share_caches"), True),
+            split_limits=self._get_config_value(prefork_data.get("split_limits"), True)
+        )
+
         # Create the server config
         self.server = ServerConfig(
             host=self._get_config_value(server_data.get("host"), "localhost"),
             enable_cors=self._get_config_value(server_data.get("enable_cors"), True),
             max_connections=self._get_config_value(server_data.get("max_connections"), 100),
             timeout=self._get_config_value(server_data.get("timeout"), 30),
+            max_requests_per_connection=self._get_config_value(server_data.get("max_requests_per_connection"), 100),
+            admission=admission_config,
+            compression=compression_config,
+            prefork=prefork_config,
             ssl=ssl_config,
             logging=logging_config,
             static=static_config
         )
 
+    def _load_admission_limits(self, data: Dict[str, Any], base: AdmissionLimits) -> AdmissionLimits:
+        return AdmissionLimits(
+            max_in_flight=int(self._get_config_value(data.get("max_in_flight"), base.max_in_flight)),
+            max_queue=int(self._get_config_value(data.get("max_queue"), base.max_queue))
+        )
+
     def load_nlweb_config(self, path: str = "config_nlweb.yaml"):
         """Load Natural Language Web configuration."""
         # Get the directory where this config.py file is located
@@ -352,6 +602,36 @@ class AppConfig:
 
         # Load chatbot instructions from config
         chatbot_instructions = data.get("chatbot_instructions", {})
+
+        # Ranking configuration
+        ranking_data = data.get("ranking", {}) or {}
+        ranking_config = RankingConfig(
+            batch_size=max(1, int(self._get_config_value(ranking_data.get("batch_size"), 1))),
+            batch_timeout=self._get_config_value(ranking_data.get("batch_timeout"), 20),
+            early_stop=self._get_config_value(ranking_data.get("early_stop"), False),
+            early_stop_margin=int(self._get_config_value(ranking_data.get("early_stop_margin"), 15)),
+            max_concurrency=max(1, int(self._get_config_value(ranking_data.get("max_concurrency"), 16)))
+        )
+        cascade_data = ranking_data.get("cascade", {}) or {}
+        ranking_config.cascade = self._load_ranking_cascade(cascade_data, RankingCascadeConfig())
+        for site, site_data in (cascade_data.get("sites", {}) or {}).items():
+            ranking_config.site_cascades[site] = self._load_ranking_cascade(site_data or {}, ranking_config.cascade)
+
+        # Prompt file loading
+        prompts_data = data.get("prompts", {}) or {}
+        prompts_config = PromptsConfig(
+            hot_reload=self._get_config_value(prompts_data.get("hot_reload"), False),
+            reload_check_interval=float(self._get_config_value(prompts_data.get("reload_check_interval"), 2.0))
+        )
+
+        # Latency tracing
+        tracing_data = data.get("tracing", {}) or {}
+        trace_export_path = self._get_config_value(tracing_data.get("export_path"), "logs/traces.jsonl")
+        tracing_config = TracingConfig(
+            enabled=self._get_config_value(tracing_data.get("enabled"), False),
+            export_path=trace_export_path,
+            return_to_client=self._get_config_value(tracing_data.get("return_to_client"), False)
+        )
         
         # Convert relative paths to use NLWEB_OUTPUT_DIR if available
         base_output_dir = self.base_output_directory
@@ -360,6 +640,8 @@ class AppConfig:
                 json_data_folder = os.path.join(base_output_dir, "data", "json")
             if not os.path.isabs(json_with_embeddings_folder):
                 json_with_embeddings_folder = os.path.join(base_output_dir, "data", "json_with_embeddings")
+            if trace_export_path and not os.path.isabs(trace_export_path):
+                tracing_config.export_path = os.path.join(base_output_dir, "logs", os.path.basename(trace_export_path))
     
         # Ensure directories exist
         os.makedirs(json_data_folder, exist_ok=True)
@@ -369,7 +651,10 @@ class AppConfig:
             sites=sites_list,
             json_data_folder=json_data_folder,
             json_with_embeddings_folder=json_with_embeddings_folder,
-            chatbot_instructions=chatbot_instructions
+            chatbot_instructions=chatbot_instructions,
+            ranking=ranking_config,
+            prompts=prompts_config,
+            tracing=tracing_config
         )
     
     def get_chatbot_instructions(self, instruction_type: str = "search_results") -> str:
@@ -9,6 +9,7 @@ Backwards compatibility is not guaranteed at this time.
 """
 
 import asyncio
+import time
 import traceback
 
 import core.fastTrack as fastTrack
@@ -19,8 +20,10 @@ import pre_retrieval.decontextualize as decontextualize
 import pre_retrieval.memory as memory
 import pre_retrieval.relevance_detection as relevance_detection
 import pre_retrieval.required_info as required_info
+from core.retrieval_memo import RetrievalMemo
 from core.state import NLWebHandlerState
-from retrieval.retriever import get_vector_db_client
+from config.config import CONFIG
+from utils import metrics, tracing
 from utils.logging_config_helper import get_configured_logger
 from utils.utils import get_param, log, siteToItemType
 
@@ -28,6 +31,13 @@ logger = get_configured_logger("nlweb_handler")
 
 API_VERSION = "0.1"
 
+# Messages that carry results; the first one sent is marked in the query's trace
+RESULT_MESSAGE_TYPES = ("result_batch", "nlws")
+
+TIME_TO_FIRST_RESULT = metrics.histogram("nlweb_time_to_first_result_seconds",
+                                         "Time from the start of a query to its first result being sent",
+                                         ("handler",))
+
 
 class NLWebHandler:
     def __init__(self, query_params, http_handler):
@@ -68,6 +78,10 @@ class NLWebHandler:
         streaming = get_param(query_params, "streaming", str, "True")
         self.streaming = streaming not in ["False", "false", "0"]
 
+        # whether to send the query's latency trace back in a "trace" message, if the config allows it
+        trace = get_param(query_params, "trace", str, "False")
+        self.return_trace = CONFIG.nlweb.tracing.return_to_client and trace in ["True", "true", "1"]
+
         # should we just list the results or try to summarize the results or use the results to generate an answer
         # Valid values are "none","summarize" and "generate"
         self.generate_mode = get_param(query_params, "generate_mode", str, "none")
@@ -108,6 +122,14 @@ class NLWebHandler:
         self._state_lock = asyncio.Lock()
         self._send_lock = asyncio.Lock()
 
+        # every task started for this query, so that cancel() can stop all outstanding
+        # work (LLM calls, vector searches) when the client goes away
+        self.tasks = set()
+
+        # vector database lookups made while handling this request, shared by fast track,
+        # the regular retrieval path and the decontextualizers
+        self.retrieval_memo = RetrievalMemo(self)
+
         self.fastTrackRanker = None
         self.fastTrackWorked = False
         self.sites_in_embeddings_sent = False
@@ -119,6 +141,9 @@ class NLWebHandler:
 
         self.versionNumberSent = False
 
+        self.start_time = time.monotonic()
+        self.first_result_sent = False
+
         logger.info("NLWebHandler initialized with parameters:")
         logger.debug(f"site: {self.site}, query: {self.query}")
         logger.debug(f"model: {self.model}, streaming: {self.streaming}")
@@ -141,6 +166,21 @@ class NLWebHandler:
         else:
             self.connection_alive_event.clear()
 
+    def create_task(self, coro):
+        """Start `coro` as a task belonging to this query."""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def cancel(self):
+        """Stop all work started for this query, e.g. because the client disconnected."""
+        self.connection_alive_event.clear()
+        if self.tasks:
+            logger.info(f"Cancelling {len(self.tasks)} outstanding tasks for query_id: {self.query_id}")
+        for task in list(self.tasks):
+            task.cancel()
+
     async def send_message(self, message):
         logger.debug(
             f"Sending message of type: {message.get('message_type', 'unknown')}"
@@ -164,6 +204,8 @@ class NLWebHandler:
                 try:
                     await self.http_handler.write_stream(message)
                     logger.debug("Message streamed successfully")
+                    if message.get("message_type") in RESULT_MESSAGE_TYPES:
+                        self.result_sent()
                 except Exception as e:
                     logger.error(f"Error streaming message: {e}")
                     self.connection_alive_event.clear()  # Use event instead of flag
@@ -183,8 +225,24 @@ class NLWebHandler:
                             val[key] = message[key]
                     self.return_value[message["message_type"]] = val
                 logger.debug("Message added to return value store")
+                if message_type in RESULT_MESSAGE_TYPES:
+                    self.result_sent()
+
+    def result_sent(self):
+        if not self.first_result_sent:
+            self.first_result_sent = True
+            tracing.mark("first_result_sent")
+            TIME_TO_FIRST_RESULT.labels(type(self).__name__).observe(time.monotonic() - self.start_time)
 
     async def runQuery(self):
+        with tracing.trace_request(self.query_id, force=self.return_trace, site=str(self.site),
+                                   generate_mode=self.generate_mode, handler=type(self).__name__) as trace:
+            result = await self.run_pipeline()
+        if trace is not None and self.return_trace:
+            await self.send_message({"message_type": "trace", "trace": trace.summary()})
+        return result
+
+    async def run_pipeline(self):
         logger.info(f"Starting query execution for query_id: {self.query_id}")
         try:
             await self.prepare()
@@ -199,6 +257,7 @@ class NLWebHandler:
                 log("ranked answers done")
             await self.post_ranking_tasks()
             self.return_value["query_id"] = self.query_id
+            logger.debug(f"Retrieval memo stats: {self.retrieval_memo.get_stats()}")
             logger.info(f"Query execution completed for query_id: {self.query_id}")
             return self.return_value
         except Exception as e:
@@ -209,21 +268,19 @@ class NLWebHandler:
 
     async def prepare(self):
         logger.info("Starting preparation phase")
-        tasks = []
+        steps = [
+            fastTrack.FastTrack(self),
+            analyze_query.DetectItemType(self),
+            analyze_query.DetectMultiItemTypeQuery(self),
+            analyze_query.DetectQueryType(self),
+            self.decontextualizeQuery(),
+            relevance_detection.RelevanceDetection(self),
+            memory.Memory(self),
+            required_info.RequiredInfo(self),
+        ]
 
         logger.debug("Creating preparation tasks")
-        tasks.append(asyncio.create_task(fastTrack.FastTrack(self).do()))
-        tasks.append(asyncio.create_task(analyze_query.DetectItemType(self).do()))
-        tasks.append(
-            asyncio.create_task(analyze_query.DetectMultiItemTypeQuery(self).do())
-        )
-        tasks.append(asyncio.create_task(analyze_query.DetectQueryType(self).do()))
-        tasks.append(asyncio.create_task(self.decontextualizeQuery().do()))
-        tasks.append(
-            asyncio.create_task(relevance_detection.RelevanceDetection(self).do())
-        )
-        tasks.append(asyncio.create_task(memory.Memory(self).do()))
-        tasks.append(asyncio.create_task(required_info.RequiredInfo(self).do()))
+        tasks = [self.start_step(step) for step in steps]
 
         try:
             logger.debug(f"Running {len(tasks)} preparation tasks concurrently")
@@ -239,14 +296,18 @@ class NLWebHandler:
             logger.info(
                 "Retrieval not done by fast track, performing regular retrieval"
             )
-            client = get_vector_db_client(query_params=self.query_params)
-            items = await client.search(self.decontextualized_query, self.site)
+            with tracing.span("retrieval"):
+                items = await self.retrieval_memo.search(self.decontextualized_query, self.site)
             self.final_retrieved_items = items
             logger.debug(f"Retrieved {len(items)} items from database")
             self.retrieval_done_event.set()
 
         logger.info("Preparation phase completed")
 
+    def start_step(self, step):
+        """Run a pre-retrieval step as a task, in a span named after its class."""
+        return self.create_task(tracing.traced(f"prepare.{type(step).__name__}", step.do()))
+
     def decontextualizeQuery(self):
         logger.info("Determining decontextualization strategy")
         if len(self.prev_queries) < 1:
@@ -280,9 +341,10 @@ class NLWebHandler:
                 f"Starting ranking process on {len(self.final_retrieved_items)} items"
             )
             log(f"Getting ranked answers on {len(self.final_retrieved_items)} items")
-            await ranking.Ranking(
-                self, self.final_retrieved_items, ranking.Ranking.REGULAR_TRACK
-            ).do()
+            with tracing.span("ranking", items=len(self.final_retrieved_items)):
+                await ranking.Ranking(
+                    self, self.final_retrieved_items, ranking.Ranking.REGULAR_TRACK
+                ).do()
             logger.info("Ranking process completed")
             return self.return_value
         except Exception as e:
@@ -293,5 +355,6 @@ class NLWebHandler:
 
     async def post_ranking_tasks(self):
         logger.info("Starting post-ranking tasks")
-        await post_ranking.PostRanking(self).do()
+        with tracing.span("post_ranking", generate_mode=self.generate_mode):
+            await post_ranking.PostRanking(self).do()
         logger.info("Post-ranking tasks completed")
@@ -11,7 +11,6 @@ WARNING: This code is under development and may undergo changes in future releas
 Backwards compatibility is not guaranteed at this time.
 """
 
-from retrieval.retriever import get_vector_db_client
 import core.ranking as ranking
 from utils.logger import get_logger, LogLevel
 from utils.logging_config_helper import get_configured_logger
@@ -48,8 +47,7 @@ class FastTrack:
         
         try:
             logger.debug(f"Retrieving items for query: {self.handler.query}")
-            client = get_vector_db_client(query_params=self.handler.query_params)
-            items = await client.search(self.handler.query, self.handler.site)
+            items = await self.handler.retrieval_memo.search(self.handler.query, self.handler.site)
             self.handler.final_retrieved_items = items
             logger.info(f"Fast track retrieved {len(items)} items")
             
@@ -11,10 +11,12 @@ Backwards compatibility is not guaranteed at this time.
 
 import asyncio
 from core.baseHandler import NLWebHandler
+from core.shortlist import shortlist
 from llm.llm import ask_llm
+from llm.scheduler import PRIORITY_BACKGROUND
 from prompts.prompt_runner import PromptRunner
-import retrieval.retriever as retriever
 from prompts.prompts import find_prompt, fill_ranking_prompt
+from utils import tracing
 from utils.trim import trim_json, trim_json_hard
 from utils.logging_config_helper import get_configured_logger
 from utils.utils import log
@@ -44,7 +46,7 @@ class GenerateAnswer(NLWebHandler):
         logger.info(f"GenerateAnswer initialized with query_params: {query_params}")
         log(f"GenerateAnswer query_params: {query_params}")
 
-    async def runQuery(self):
+    async def run_pipeline(self):
         try:
             logger.info(f"Starting query execution for query_id: {self.query_id}")
             await self.prepare()
@@ -63,14 +65,16 @@ class GenerateAnswer(NLWebHandler):
     async def prepare(self):
         # runs the tasks that need to be done before retrieval, ranking, etc.
         logger.info("Starting preparation phase")
-        tasks = []
         
         # Adding all necessary preparation tasks
-        tasks.append(asyncio.create_task(analyze_query.DetectItemType(self).do()))
-        tasks.append(asyncio.create_task(self.decontextualizeQuery().do()))
-        tasks.append(asyncio.create_task(relevance_detection.RelevanceDetection(self).do()))
-        tasks.append(asyncio.create_task(memory.Memory(self).do()))
-        tasks.append(asyncio.create_task(required_info.RequiredInfo(self).do()))
+        steps = [
+            analyze_query.DetectItemType(self),
+            self.decontextualizeQuery(),
+            relevance_detection.RelevanceDetection(self),
+            memory.Memory(self),
+            required_info.RequiredInfo(self),
+        ]
+        tasks = [self.start_step(step) for step in steps]
          
         try:
             logger.debug(f"Running {len(tasks)} preparation tasks concurrently")
@@ -94,7 +98,8 @@ class GenerateAnswer(NLWebHandler):
             description = trim_json_hard(json_str)
             prompt = fill_ranking_prompt(prompt_str, self, description)
             logger.debug(f"Sending ranking request to LLM for item: {name}")
-            ranking = await ask_llm(prompt, ans_struc, level="low")
+            with tracing.span("ranking.llm", item=name):
+                ranking = await ask_llm(prompt, ans_struc, level="low", prompt_name=self.RANKING_PROMPT_NAME)
             logger.debug(f"Received ranking score: {ranking.get('score', 'N/A')} for item: {name}")
             ansr = {
                 'url': url,
@@ -119,22 +124,24 @@ class GenerateAnswer(NLWebHandler):
         try:
             # Wait for retrieval to be done if not already
             logger.info("Retrieving items for query")
-            client = retriever.get_vector_db_client(query_params=self.query_params)
-            top_embeddings = await client.search(self.decontextualized_query, self.site)
+            with tracing.span("retrieval"):
+                top_embeddings = await self.retrieval_memo.search(self.decontextualized_query, self.site)
             self.items = top_embeddings  # Store all retrieved items
             logger.debug(f"Retrieved {len(top_embeddings)} items from database")
-            # Rank each item
+            # Rank each item on the first stage's shortlist
             tasks = []
-            for url, json_str, name, site in top_embeddings:
-                tasks.append(asyncio.create_task(self.rankItem(url, json_str, name, site)))
+            for url, json_str, name, site in shortlist(top_embeddings, self.decontextualized_query):
+                tasks.append(self.create_task(self.rankItem(url, json_str, name, site)))
             
             
             logger.debug(f"Running {len(tasks)} ranking tasks concurrently")
-            await asyncio.gather(*tasks, return_exceptions=True)
+            with tracing.span("ranking", items=len(tasks)):
+                await asyncio.gather(*tasks, return_exceptions=True)
             
             # Synthesize the answer from ranked items
             logger.info("Ranking completed, synthesizing answer")
-            await self.synthesizeAnswer()
+            with tracing.span("synthesis", items=len(self.final_ranked_answers)):
+                await self.synthesizeAnswer()
             
         except Exception as e:
             logger.exception(f"Error in get_ranked_answers: {e}")
@@ -143,7 +150,7 @@ class GenerateAnswer(NLWebHandler):
     async def getDescription(self, url, json_str, query, answer, name, site):
         try:
             logger.debug(f"Getting description for item: {name}")
-            description = await PromptRunner(self).run_prompt(self.DESCRIPTION_PROMPT_NAME)
+            description = await PromptRunner(self).run_prompt(self.DESCRIPTION_PROMPT_NAME, priority=PRIORITY_BACKGROUND)
             logger.debug(f"Got description for item: {name}")
             return (url, name, site, description["description"], json_str)
         except Exception as e:
@@ -194,7 +201,7 @@ class GenerateAnswer(NLWebHandler):
                     item = matching_items[0]
                     (url, json_str, name, site) = item
                     logger.debug(f"Creating description task for item: {name}")
-                    t = asyncio.create_task(self.getDescription(url, json_str, self.decontextualized_query, answer, name, site))
+                    t = self.create_task(self.getDescription(url, json_str, self.decontextualized_query, answer, name, site))
                     description_tasks.append(t)
                     
                 if description_tasks:
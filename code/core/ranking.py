@@ -10,14 +10,24 @@ Backwards compatibility is not guaranteed at this time.
 
 from utils.utils import log
 from llm.llm import ask_llm
+from llm.scheduler import PRIORITY_INTERACTIVE, PRIORITY_NORMAL
 import asyncio
 import json
+from utils import metrics, tracing
 from utils.trim import trim_json
-from prompts.prompts import find_prompt, fill_ranking_prompt
+from prompts.prompts import find_prompt, fill_ranking_prompt, fill_batch_ranking_prompt
+from core.shortlist import shortlist
+from config.config import CONFIG
 from utils.logging_config_helper import get_configured_logger
 
 logger = get_configured_logger("ranking_engine")
 
+RANKED_ITEMS = metrics.counter("nlweb_ranked_items_total",
+                               "Items ranked, by track and outcome (ok, error, stopped by early stopping, "
+                               "pruned by the first stage of the cascade)",
+                               ("track", "outcome"))
+RESULTS_SENT = metrics.counter("nlweb_results_sent_total", "Ranked results streamed to clients", ("track",))
+
 
 class Ranking:
      
@@ -38,6 +48,20 @@ The user's question is: {request.query}. The item's description is {item.descrip
  "description" : "short description of the item"}]
  
     RANKING_PROMPT_NAME = "RankingPrompt"
+
+    # Default prompt for ranking several items in one LLM call, used if site_type.xml has no BatchRankingPrompt.
+    BATCH_RANKING_PROMPT = ["""  Assign a score between 0 and 100 to each of the following {site.itemType}s
+based on how relevant it is to the user's question. Use your knowledge from other sources, about the item, to make a judgement. 
+Score each item independently of the others.
+If the score is above 50, provide a short description of the item highlighting the relevance to the user's question, without mentioning the user's question.
+If the score is below 75, in the description, include the reason why it is still relevant.
+The user's question is: {request.query}. The items, each with an id and a description, are {item.descriptions}.
+Return one entry for every item, using the item's id.""",
+    {"rankings" : [{"id" : "integer id of the item",
+                    "score" : "integer between 0 and 100",
+                    "description" : "short description of the item"}]}]
+
+    BATCH_RANKING_PROMPT_NAME = "BatchRankingPrompt"
      
     def get_ranking_prompt(self):
         site = self.handler.site
@@ -49,6 +73,17 @@ The user's question is: {request.query}. The item's description is {item.descrip
         else:
             logger.debug(f"Using custom ranking prompt for site: {site}, item_type: {item_type}")
             return prompt_str, ans_struc
+
+    def get_batch_ranking_prompt(self):
+        site = self.handler.site
+        item_type = self.handler.item_type
+        prompt_str, ans_struc = find_prompt(site, item_type, self.BATCH_RANKING_PROMPT_NAME)
+        if prompt_str is None:
+            logger.debug("Using default batch ranking prompt")
+            return self.BATCH_RANKING_PROMPT[0], self.BATCH_RANKING_PROMPT[1]
+        else:
+            logger.debug(f"Using custom batch ranking prompt for site: {site}, item_type: {item_type}")
+            return prompt_str, ans_struc
         
     def __init__(self, handler, items, ranking_type=FAST_TRACK):
         ll = len(items)
@@ -60,12 +95,66 @@ The user's question is: {request.query}. The item's description is {item.descrip
         self.num_results_sent = 0
         self.rankedAnswers = []
         self.ranking_type = ranking_type
+        # Fast track results are what the user sees first, so its ranking calls jump the LLM queue
+        self.priority = PRIORITY_INTERACTIVE if ranking_type == self.FAST_TRACK else PRIORITY_NORMAL
+        self.batch_size = CONFIG.nlweb.ranking.batch_size
+        self.batch_timeout = CONFIG.nlweb.ranking.batch_timeout
         self._results_lock = asyncio.Lock()  # Add lock for thread-safe operations
+        # Early stopping: once the best NUM_RESULTS_TO_SEND scores all reach early_stop_score,
+        # the LLM calls in flight are cancelled and no more items are ranked
+        self.early_stop = CONFIG.nlweb.ranking.early_stop
+        self.early_stop_score = max(100 - CONFIG.nlweb.ranking.early_stop_margin, self.EARLY_SEND_THRESHOLD + 1)
+        self.max_concurrency = CONFIG.nlweb.ranking.max_concurrency
+        self.stopped_early = False
+        self._llm_calls = set()
+
+    def _build_answer(self, url, json_str, name, site, ranking):
+        return {
+            'url': url,
+            'site': site,
+            'name': name,
+            'ranking': ranking,
+            'schema_object': json.loads(json_str),
+            'sent': False,
+        }
+
+    async def _ask_llm(self, *args, **kwargs):
+        """
+        ask_llm, run as a task that early stopping can cancel. Returns None if it was
+        cancelled that way; cancelling the caller still cancels the call.
+        """
+        task = asyncio.ensure_future(ask_llm(*args, **kwargs))
+        self._llm_calls.add(task)
+        try:
+            await asyncio.wait((task,))
+        finally:
+            task.cancel()
+            self._llm_calls.discard(task)
+        if task.cancelled():
+            return None
+        return task.result()
+
+    def _check_early_stop(self):
+        """Stop ranking if the top NUM_RESULTS_TO_SEND scores have all reached early_stop_score."""
+        if not self.early_stop or self.stopped_early or len(self.rankedAnswers) < self.NUM_RESULTS_TO_SEND:
+            return
+        scores = sorted((a["ranking"]["score"] for a in self.rankedAnswers), reverse=True)
+        if scores[self.NUM_RESULTS_TO_SEND - 1] < self.early_stop_score:
+            return
+        self.stopped_early = True
+        logger.info(f"Top {self.NUM_RESULTS_TO_SEND} results all score {self.early_stop_score} or more after "
+                    f"{len(self.rankedAnswers)} of {len(self.items)} items, cancelling "
+                    f"{len(self._llm_calls)} ranking calls {self.ranking_type_str}")
+        tracing.mark("ranking.stopped_early", track=self.ranking_type_str, ranked=len(self.rankedAnswers))
+        for task in list(self._llm_calls):
+            task.cancel()
 
     async def rankItem(self, url, json_str, name, site):
         if not self.handler.connection_alive_event.is_set():
             logger.warning("Connection lost, skipping item ranking")
             return
+        if self.stopped_early:
+            return
         if (self.ranking_type == Ranking.FAST_TRACK and self.handler.abort_fast_track_event.is_set()):
             logger.info("Fast track aborted, skipping item ranking")
             logger.info("Aborting fast track")
@@ -77,17 +166,15 @@ The user's question is: {request.query}. The item's description is {item.descrip
             prompt = fill_ranking_prompt(prompt_str, self.handler, description)
             
             logger.debug(f"Sending ranking request to LLM for item: {name}")
-            ranking = await ask_llm(prompt, ans_struc, level="low")
+            with tracing.span("ranking.llm", item=name, track=self.ranking_type_str):
+                ranking = await self._ask_llm(prompt, ans_struc, level="low", priority=self.priority,
+                                              prompt_name=self.RANKING_PROMPT_NAME)
+            if ranking is None:
+                RANKED_ITEMS.labels(self.ranking_type_str, "stopped").inc()
+                return
             logger.debug(f"Received ranking score: {ranking.get('score', 'N/A')} for item: {name}")
             
-            ansr = {
-                'url': url,
-                'site': site,
-                'name': name,
-                'ranking': ranking,
-                'schema_object': json.loads(json_str),
-                'sent': False,
-            }
+            ansr = self._build_answer(url, json_str, name, site, ranking)
             
             if (ranking["score"] > self.EARLY_SEND_THRESHOLD):
                 logger.info(f"High score item: {name} (score: {ranking['score']}) - sending early {self.ranking_type_str}")
@@ -101,13 +188,97 @@ The user's question is: {request.query}. The item's description is {item.descrip
             
             async with self._results_lock:  # Use lock when modifying shared state
                 self.rankedAnswers.append(ansr)
+                self._check_early_stop()
+            RANKED_ITEMS.labels(self.ranking_type_str, "ok").inc()
             logger.debug(f"Item {name} added to ranked answers")
         
         except Exception as e:
+            RANKED_ITEMS.labels(self.ranking_type_str, "error").inc()
             logger.error(f"Error in rankItem for {name}: {str(e)}")
             logger.debug(f"Full error trace: ", exc_info=True)
             print(f"Error in rankItem for {name}: {str(e)}")
 
+    def _parse_batch_rankings(self, response, batch_len):
+        """Map item ids in a batched ranking response to per-item {score, description} dicts."""
+        entries = response.get("rankings") if isinstance(response, dict) else None
+        if not isinstance(entries, list):
+            logger.warning("Batch ranking response has no 'rankings' list")
+            return {}
+        rankings = {}
+        for entry in entries:
+            try:
+                item_id = int(entry["id"])
+                score = int(entry["score"])
+            except (KeyError, TypeError, ValueError):
+                logger.debug(f"Skipping malformed batch ranking entry: {entry}")
+                continue
+            if 0 <= item_id < batch_len:
+                rankings[item_id] = {"score": score, "description": entry.get("description", "")}
+        return rankings
+
+    async def rankBatch(self, batch):
+        """
+        Rank a batch of items with a single LLM call. Items that are missing from
+        the response (or the whole batch, if the call fails) fall back to rankItem.
+        """
+        if not self.handler.connection_alive_event.is_set():
+            logger.warning("Connection lost, skipping batch ranking")
+            return
+        if (self.ranking_type == Ranking.FAST_TRACK and self.handler.abort_fast_track_event.is_set()):
+            logger.info("Fast track aborted, skipping batch ranking")
+            return
+        if self.stopped_early:
+            return
+
+        rankings = {}
+        try:
+            logger.debug(f"Ranking batch of {len(batch)} items")
+            prompt_str, ans_struc = self.get_batch_ranking_prompt()
+            descriptions = [(i, trim_json(json_str)) for i, (url, json_str, name, site) in enumerate(batch)]
+            prompt = fill_batch_ranking_prompt(prompt_str, self.handler, descriptions)
+            with tracing.span("ranking.batch_llm", items=len(batch), track=self.ranking_type_str):
+                response = await self._ask_llm(prompt, ans_struc, level="low", timeout=self.batch_timeout,
+                                               priority=self.priority, prompt_name=self.BATCH_RANKING_PROMPT_NAME)
+            if response is None:
+                RANKED_ITEMS.labels(self.ranking_type_str, "stopped").inc(len(batch))
+                return
+            rankings = self._parse_batch_rankings(response, len(batch))
+            logger.debug(f"Received {len(rankings)} of {len(batch)} batch ranking scores")
+        except Exception as e:
+            logger.error(f"Error in rankBatch: {str(e)}")
+            logger.debug("Full error trace: ", exc_info=True)
+
+        answers = []
+        missing = []
+        for i, (url, json_str, name, site) in enumerate(batch):
+            if i not in rankings:
+                missing.append((url, json_str, name, site))
+                continue
+            try:
+                answers.append(self._build_answer(url, json_str, name, site, rankings[i]))
+            except Exception as e:
+                logger.error(f"Error building answer for {name}: {str(e)}")
+
+        early = [a for a in answers if a["ranking"]["score"] > self.EARLY_SEND_THRESHOLD]
+        if early:
+            logger.info(f"{len(early)} high score items in batch - sending early {self.ranking_type_str}")
+            try:
+                await self.sendAnswers(early)
+            except (BrokenPipeError, ConnectionResetError):
+                logger.warning("Client disconnected while sending early batch answers")
+                self.handler.connection_alive_event.clear()
+                return
+
+        async with self._results_lock:
+            self.rankedAnswers.extend(answers)
+            self._check_early_stop()
+        RANKED_ITEMS.labels(self.ranking_type_str, "ok").inc(len(answers))
+
+        if missing and not self.stopped_early:
+            logger.info(f"Falling back to per-item ranking for {len(missing)} items")
+            await asyncio.gather(*[self.rankItem(url, json_str, name, site)
+                                   for url, json_str, name, site in missing], return_exceptions=True)
+
     def shouldSend(self, result):
         should_send = False
         if (self.num_results_sent < self.NUM_RESULTS_TO_SEND - 5):
@@ -165,6 +336,7 @@ The user's question is: {request.query}. The item's description is {item.descrip
                 to_send = {"message_type": "result_batch", "results": json_results, "query_id": self.handler.query_id}
                 await self.handler.send_message(to_send)
                 self.num_results_sent += len(json_results)
+                RESULTS_SENT.labels(self.ranking_type_str).inc(len(json_results))
                 logger.info(f"Sent {len(json_results)} results, total sent: {self.num_results_sent}")
             except (BrokenPipeError, ConnectionResetError) as e:
                 logger.error(f"Client disconnected while sending answers: {str(e)}")
@@ -195,15 +367,51 @@ The user's question is: {request.query}. The item's description is {item.descrip
                 print("Client disconnected when sending sites message")
                 self.handler.connection_alive_event.clear()
     
+    def rankInOrder(self, units, rank):
+        """
+        Start tasks that rank `units` (items or batches) in retrieval order, at most
+        max_concurrency at a time, until ranking stops early.
+        """
+        pending = iter(units)
+
+        async def worker():
+            for unit in pending:
+                if self.stopped_early or not self.handler.connection_alive_event.is_set():
+                    return
+                await rank(unit)
+
+        return [self.handler.create_task(worker()) for _ in range(min(self.max_concurrency, len(units)))]
+
     async def do(self):
         logger.info(f"Starting ranking process with {len(self.items)} items")
+        with tracing.span("ranking.shortlist", items=len(self.items), track=self.ranking_type_str) as shortlist_span:
+            items = shortlist(self.items, self.handler.decontextualized_query or self.handler.query)
+            shortlist_span.set(kept=len(items))
+        if len(items) < len(self.items):
+            logger.info(f"First stage kept {len(items)} of {len(self.items)} items for LLM ranking")
+            RANKED_ITEMS.labels(self.ranking_type_str, "pruned").inc(len(self.items) - len(items))
+            self.items = items
+
+        if self.batch_size > 1:
+            logger.debug(f"Ranking in batches of {self.batch_size}")
+            units = [self.items[i:i + self.batch_size] for i in range(0, len(self.items), self.batch_size)]
+            rank = self.rankBatch
+        else:
+            units = self.items
+
+            def rank(item):
+                return self.rankItem(*item)
+
         tasks = []
-        for url, json_str, name, site in self.items:
-            if self.handler.connection_alive_event.is_set():  # Only add new tasks if connection is still alive
-                tasks.append(asyncio.create_task(self.rankItem(url, json_str, name, site)))
-            else:
-                logger.warning("Connection lost, not creating new ranking tasks")
-       
+        if self.early_stop:
+            tasks = self.rankInOrder(units, rank)
+        else:
+            for unit in units:
+                if self.handler.connection_alive_event.is_set():  # Only add new tasks if connection is still alive
+                    tasks.append(self.handler.create_task(rank(unit)))
+                else:
+                    logger.warning("Connection lost, not creating new ranking tasks")
+
         await self.sendMessageOnSitesBeingAsked(self.items)
 
         try:
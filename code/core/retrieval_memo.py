@@ -0,0 +1,82 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Per-request memo of vector database lookups. FastTrack, the regular retrieval in
+prepare(), GenerateAnswer and the decontextualizers all go through the handler's
+memo, so a single request never embeds and searches the same text twice. Callers
+asking for a lookup that is already in flight share its result. The first
+lookup answered from the memo is marked in the request trace as
+retrieval.memo_hit, and the query's root span carries the retrieval_round_trips
+and retrieval_saved_round_trips counts.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from retrieval.retriever import get_vector_db_client
+from utils import tracing
+from utils.logging_config_helper import get_configured_logger
+from utils.logger import LogLevel
+
+logger = get_configured_logger("retrieval_memo")
+
+
+class RetrievalMemo:
+    def __init__(self, handler):
+        self.handler = handler
+        self._entries: Dict[tuple, asyncio.Task] = {}
+        self.round_trips = 0
+        # One record per lookup answered from the memo instead of the database
+        self.saved_round_trips: List[Dict[str, Any]] = []
+
+    def _client(self):
+        return get_vector_db_client(query_params=self.handler.query_params)
+
+    async def _lookup(self, key: tuple, fetch):
+        task = self._entries.get(key)
+        if task is None:
+            self.round_trips += 1
+            task = self.handler.create_task(fetch())
+            self._entries[key] = task
+            task.add_done_callback(lambda t: self._lookup_done(key, t))
+        else:
+            saved = {"operation": key[0], "text": key[1][:100], "site": str(key[2]),
+                     "endpoint": key[3], "in_flight": not task.done()}
+            self.saved_round_trips.append(saved)
+            tracing.mark("retrieval.memo_hit", **saved)
+            logger.log_with_context(
+                LogLevel.INFO,
+                "Retrieval served from request memo",
+                dict(saved, query_id=self.handler.query_id, saved_total=len(self.saved_round_trips))
+            )
+        tracing.set_query_attributes(retrieval_round_trips=self.round_trips,
+                                     retrieval_saved_round_trips=len(self.saved_round_trips))
+        # Shielded so that a caller being cancelled (e.g. fast track aborting) does not fail the others
+        return await asyncio.shield(task)
+
+    def _lookup_done(self, key: tuple, task: asyncio.Task):
+        # Failed lookups are not memoized, the next caller retries
+        if (task.cancelled() or task.exception() is not None) and self._entries.get(key) is task:
+            del self._entries[key]
+
+    async def search(self, query: str, site, num_results: int = 50) -> List[List[str]]:
+        """Search the vector database, reusing any earlier identical search in this request."""
+        client = self._client()
+        key = ("search", query, str(site), client.endpoint_name, num_results)
+        return await self._lookup(key, lambda: client.search(query, site, num_results))
+
+    async def search_by_url(self, url: str) -> Optional[List[str]]:
+        """Fetch a single item by URL, reusing any earlier lookup of the same URL in this request."""
+        client = self._client()
+        key = ("search_by_url", url, "", client.endpoint_name, 1)
+        return await self._lookup(key, lambda: client.search_by_url(url))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "round_trips": self.round_trips,
+            "saved_round_trips": len(self.saved_round_trips),
+        }
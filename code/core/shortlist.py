@@ -0,0 +1,89 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+First stage of the ranking cascade. Before the LLM ranks the retrieved items, a
+cheap scorer keeps the best `shortlist_size` items of each site, as configured
+under ranking.cascade in config_nlweb.yaml (with per-site overrides):
+
+    none       every item goes to the LLM
+    retrieval  the items the vector database ranked highest, by the similarity
+               score it returned with them when there is one
+    bm25       the items whose schema.org JSON best matches the query's words (Okapi BM25)
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import List, Sequence
+
+from config.config import CONFIG
+from retrieval.search_result import result_score
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.lower() for token in _TOKEN.findall(text)]
+
+
+def bm25_scores(query: str, documents: Sequence[str], k1: float = BM25_K1, b: float = BM25_B) -> List[float]:
+    """BM25 score of each document for `query`, with term statistics taken from `documents` themselves."""
+    terms = set(tokenize(query))
+    counts = [Counter(tokenize(document)) for document in documents]
+    if not terms or not counts:
+        return [0.0] * len(documents)
+    lengths = [sum(count.values()) for count in counts]
+    average_length = sum(lengths) / len(lengths) or 1.0
+    idf = {}
+    for term in terms:
+        frequency = sum(1 for count in counts if term in count)
+        idf[term] = math.log(1 + (len(counts) - frequency + 0.5) / (frequency + 0.5))
+    scores = []
+    for count, length in zip(counts, lengths):
+        score = 0.0
+        norm = k1 * (1 - b + b * length / average_length)
+        for term in terms:
+            tf = count.get(term)
+            if tf:
+                score += idf[term] * tf * (k1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def shortlist(items: List[list], query: str) -> List[list]:
+    """
+    The retrieved items ([url, json_str, name, site]) to rank with the LLM: for each
+    site, the shortlist_size best of its items by the site's first-stage scorer.
+    Items are returned in retrieval order.
+    """
+    positions_by_site = {}
+    for position, item in enumerate(items):
+        positions_by_site.setdefault(item[3], []).append(position)
+
+    keep = set()
+    for site, positions in positions_by_site.items():
+        cascade = CONFIG.nlweb.ranking.get_cascade(site)
+        if cascade.scorer == "none" or len(positions) <= cascade.shortlist_size:
+            keep.update(positions)
+        elif cascade.scorer == "bm25":
+            scores = bm25_scores(query, [items[position][1] for position in positions])
+            # Ties, e.g. items matching none of the query's words, keep their retrieval order
+            best = sorted(range(len(positions)), key=lambda i: (-scores[i], i))[:cascade.shortlist_size]
+            keep.update(positions[i] for i in best)
+        else:
+            scores = [result_score(items[position]) for position in positions]
+            if None in scores:
+                keep.update(positions[:cascade.shortlist_size])
+            else:
+                best = sorted(range(len(positions)), key=lambda i: (-scores[i], i))[:cascade.shortlist_size]
+                keep.update(positions[i] for i in best)
+    if len(keep) == len(items):
+        return items
+    return [item for position, item in enumerate(items) if position in keep]
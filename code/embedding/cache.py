@@ -0,0 +1,202 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Cache for text embeddings, keyed on (provider, model, normalized text).
+Vectors are stored as compact float32 arrays in an in-memory LRU tier and,
+optionally, in a persistent SQLite tier. Concurrent requests for the same key
+are coalesced so that they share a single provider call.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+
+from config.config import CONFIG
+from utils import metrics
+from utils.logging_config_helper import get_configured_logger
+
+logger = get_configured_logger("embedding_cache")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize unicode and collapse whitespace so trivially different queries share an entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_cache_key(provider: str, model: str, text: str) -> str:
+    payload = "\x1f".join([provider, model, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskTier:
+    """SQLite-backed tier holding float32 vectors as blobs."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        # A SQLite connection must not be used across fork(); worker processes
+        # forked by webserver.prefork open their own
+        os.register_at_fork(after_in_child=self._reopen_after_fork)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, rowtime INTEGER NOT NULL)"
+            )
+            self._conn.commit()
+        logger.info(f"Embedding disk cache opened at {path}")
+
+    def _reopen_after_fork(self):
+        self._lock = threading.Lock()
+        self._inherited_conn = self._conn  # kept open: closing it could release the parent's locks
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+
+    def get(self, key: str) -> Optional[array]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector
+
+    def put(self, key: str, vector: array):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, rowtime) "
+                "VALUES (?, ?, strftime('%s','now'))",
+                (key, vector.tobytes())
+            )
+            self._writes_since_trim += 1
+            if self._writes_since_trim >= 100:
+                self._writes_since_trim = 0
+                count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM embedding_cache WHERE key IN "
+                        "(SELECT key FROM embedding_cache ORDER BY rowtime ASC LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    def __init__(self):
+        cache_config = CONFIG.embedding_cache
+        self.enabled = cache_config.enabled
+        self.max_entries = cache_config.max_entries
+        self._memory = OrderedDict()  # key -> array('f')
+        self._in_flight: Dict[str, asyncio.Future] = {}  # key -> task loading it
+        self.disk = None
+        if self.enabled and cache_config.disk_enabled and cache_config.disk_path:
+            try:
+                self.disk = DiskTier(cache_config.disk_path, cache_config.disk_max_entries)
+            except Exception as e:
+                logger.error(f"Could not open embedding disk cache at {cache_config.disk_path}: {e}")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key: str, vector: array):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[List[float]]]) -> List[float]:
+        """
+        Return the cached vector for `key`, or run `compute` once for all concurrent
+        callers asking for the same key and cache its result.
+        """
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector.tolist()
+
+        task = self._in_flight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            # The load runs as its own task so that a cancelled caller does not fail the others
+            task = asyncio.ensure_future(self._load(key, compute))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._load_done(key, t))
+        return (await asyncio.shield(task)).tolist()
+
+    def _load_done(self, key: str, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller has gone away
+
+    async def _load(self, key: str, compute: Callable[[], Awaitable[List[float]]]) -> array:
+        vector = None
+        if self.disk is not None:
+            try:
+                vector = await asyncio.to_thread(self.disk.get, key)
+            except Exception as e:
+                logger.warning(f"Embedding disk cache read failed: {e}")
+        if vector is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            vector = array("f", await compute())
+            if self.disk is not None:
+                try:
+                    await asyncio.to_thread(self.disk.put, key, vector)
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache write failed: {e}")
+        self._remember(key, vector)
+        return vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.coalesced + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "evictions": self.evictions,
+            "disk_enabled": self.disk is not None,
+        }
+
+
+# Global singleton
+embedding_cache = EmbeddingCache()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return embedding_cache.get_stats()
+
+
+def _collect_cache_metrics():
+    name = "nlweb_embedding_cache_lookups_total"
+    return [(name, ("result",), ("memory_hit",), embedding_cache.memory_hits),
+            (name, ("result",), ("disk_hit",), embedding_cache.disk_hits),
+            (name, ("result",), ("coalesced",), embedding_cache.coalesced),
+            (name, ("result",), ("miss",), embedding_cache.misses)]
+
+
+metrics.add_collector("nlweb_embedding_cache_lookups_total", "counter",
+                      "Embedding cache lookups by result; coalesced lookups shared a computation in flight",
+                      _collect_cache_metrics)
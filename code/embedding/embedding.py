@@ -11,12 +11,21 @@ Backwards compatibility is not guaranteed at this time.
 from typing import Optional, List
 import asyncio
 import threading
+import time
 
 from config.config import CONFIG
+from embedding.cache import embedding_cache, make_cache_key
+from utils import metrics, tracing
 from utils.logging_config_helper import get_configured_logger, LogLevel
 
 logger = get_configured_logger("embedding_wrapper")
 
+EMBEDDING_REQUESTS = metrics.counter("nlweb_embedding_requests_total",
+                                     "Embedding provider calls by outcome (ok, timeout, cancelled, error); cache hits are not included",
+                                     ("provider", "outcome"))
+EMBEDDING_LATENCY = metrics.histogram("nlweb_embedding_request_duration_seconds",
+                                      "Duration of embedding provider calls", ("provider",))
+
 # Add locks for thread-safe provider access
 _provider_locks = {
     "openai": threading.Lock(),
@@ -25,6 +34,14 @@ _provider_locks = {
     "snowflake": threading.Lock()
 }
 
+# Providers added at runtime, such as the benchmark harness's stand-in, called as
+# `await get_embeddings(text, model=model_id)` like the built-in ones
+_registered_providers = {}
+
+def register_embedding_provider(name: str, get_embeddings):
+    """Make `name` usable as an embedding provider, served by the coroutine function `get_embeddings`."""
+    _registered_providers[name] = get_embeddings
+
 async def get_embedding(
     text: str,
     provider: Optional[str] = None,
@@ -68,8 +85,41 @@ async def get_embedding(
     
     logger.debug(f"Using embedding model: {model_id}")
 
+    with tracing.span("embedding", provider=provider, model=model_id, text_length=len(text)):
+        if embedding_cache.enabled:
+            key = make_cache_key(provider, model_id, text)
+            return await embedding_cache.get_or_compute(
+                key, lambda: _compute_embedding(text, provider, model_id, timeout)
+            )
+        return await _compute_embedding(text, provider, model_id, timeout)
+
+async def _compute_embedding(text: str, provider: str, model_id: str, timeout: int) -> List[float]:
+    """Call the embedding provider directly, bypassing the cache."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await _call_embedding_provider(text, provider, model_id, timeout)
+        outcome = "ok"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        EMBEDDING_REQUESTS.labels(provider, outcome).inc()
+        EMBEDDING_LATENCY.labels(provider).observe(time.perf_counter() - start)
+
+async def _call_embedding_provider(text: str, provider: str, model_id: str, timeout: int) -> List[float]:
     try:
         # Use a timeout wrapper for all embedding calls
+        if provider in _registered_providers:
+            return await asyncio.wait_for(
+                _registered_providers[provider](text, model=model_id),
+                timeout=timeout
+            )
+
         if provider == "openai":
             logger.debug("Getting OpenAI embeddings")
             # Import here to avoid potential circular imports
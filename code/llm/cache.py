@@ -0,0 +1,221 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Response cache for ask_llm. Responses are keyed on (provider, model, prompt, schema)
+and kept in an in-memory LRU tier, optionally backed by a persistent SQLite tier.
+Entries expire after a TTL that can be set per prompt name.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from config.config import CONFIG
+from utils import metrics
+from utils.logging_config_helper import get_configured_logger
+
+logger = get_configured_logger("llm_cache")
+
+
+def make_cache_key(provider_name: str, model: str, prompt: str, schema: Any) -> str:
+    payload = json.dumps([provider_name, model, prompt, schema], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """Size-bounded LRU of serialized responses with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value_json)
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskTier:
+    """SQLite-backed tier. Safe to share between processes on the same host."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        # A SQLite connection must not be used across fork(); worker processes
+        # forked by webserver.prefork open their own
+        os.register_at_fork(after_in_child=self._reopen_after_fork)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, prompt_name TEXT, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_access ON llm_cache(last_access)")
+            self._conn.commit()
+        logger.info(f"LLM disk cache opened at {path}")
+
+    def _reopen_after_fork(self):
+        self._lock = threading.Lock()
+        self._inherited_conn = self._conn  # kept open: closing it could release the parent's locks
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+
+    def get(self, key: str) -> Optional[tuple]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0], row[1]
+
+    def put(self, key: str, prompt_name: Optional[str], value: str, expires_at: float) -> int:
+        """Store an entry; returns the number of entries evicted to stay within max_entries."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, prompt_name, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, prompt_name, value, expires_at, time.time())
+            )
+            evicted = 0
+            self._writes_since_trim += 1
+            # Trimming needs a COUNT(*), so only do it every so often
+            if self._writes_since_trim >= 100:
+                self._writes_since_trim = 0
+                self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+                count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                if count > self.max_entries:
+                    evicted = count - self.max_entries
+                    self._conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN "
+                        "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)", (evicted,)
+                    )
+            self._conn.commit()
+            return evicted
+
+
+class LLMResponseCache:
+    def __init__(self):
+        cache_config = CONFIG.llm_cache
+        self.memory = MemoryTier(cache_config.max_entries)
+        self.disk = None
+        if cache_config.enabled and cache_config.disk_enabled and cache_config.disk_path:
+            try:
+                self.disk = DiskTier(cache_config.disk_path, cache_config.disk_max_entries)
+            except Exception as e:
+                logger.error(f"Could not open LLM disk cache at {cache_config.disk_path}: {e}")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.disk_evictions = 0
+
+    def ttl_for(self, prompt_name: Optional[str]) -> int:
+        if not CONFIG.llm_cache.enabled:
+            return 0
+        return CONFIG.llm_cache.get_ttl(prompt_name)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return json.loads(value)
+        if self.disk is not None:
+            try:
+                row = await asyncio.to_thread(self.disk.get, key)
+            except Exception as e:
+                logger.warning(f"LLM disk cache read failed: {e}")
+                row = None
+            if row is not None:
+                value, expires_at = row
+                self.memory.put(key, value, expires_at)
+                self.disk_hits += 1
+                return json.loads(value)
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, prompt_name: Optional[str], response: Dict[str, Any], ttl: int):
+        try:
+            value = json.dumps(response)
+        except (TypeError, ValueError):
+            logger.debug("LLM response is not JSON serializable, not caching")
+            return
+        expires_at = time.time() + ttl
+        self.memory.put(key, value, expires_at)
+        self.stores += 1
+        if self.disk is not None:
+            try:
+                self.disk_evictions += await asyncio.to_thread(self.disk.put, key, prompt_name, value, expires_at)
+            except Exception as e:
+                logger.warning(f"LLM disk cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+            "disk_evictions": self.disk_evictions,
+            "disk_enabled": self.disk is not None,
+        }
+
+
+# Global singleton
+llm_cache = LLMResponseCache()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    return llm_cache.get_stats()
+
+
+def _collect_cache_metrics():
+    name = "nlweb_llm_cache_lookups_total"
+    return [(name, ("result",), ("memory_hit",), llm_cache.memory_hits),
+            (name, ("result",), ("disk_hit",), llm_cache.disk_hits),
+            (name, ("result",), ("miss",), llm_cache.misses)]
+
+
+metrics.add_collector("nlweb_llm_cache_lookups_total", "counter",
+                      "LLM response cache lookups by result", _collect_cache_metrics)
@@ -13,6 +13,7 @@ from typing import Optional, Dict, Any
 from config.config import CONFIG
 import asyncio
 import threading
+import time
 
 
 # Import provider instances
@@ -24,10 +25,19 @@ from llm.azure_llama import provider as llama_provider
 from llm.azure_deepseek import provider as deepseek_provider
 from llm.inception import provider as inception_provider
 from llm.snowflake import provider as snowflake_provider
+from llm.scheduler import scheduler, SchedulerTimeoutError, PRIORITY_NORMAL
+from llm.cache import llm_cache, make_cache_key
 
+from utils import metrics
 from utils.logging_config_helper import get_configured_logger, LogLevel
 logger = get_configured_logger("llm_wrapper")
 
+LLM_REQUESTS = metrics.counter("nlweb_llm_requests_total", "LLM calls by outcome (ok, cache_hit, rejected, timeout, cancelled, error)",
+                               ("provider", "level", "outcome"))
+LLM_LATENCY = metrics.histogram("nlweb_llm_request_duration_seconds",
+                                "Duration of LLM calls that reached the provider, including scheduler wait",
+                                ("provider", "level"))
+
 # Provider mapping
 _providers = {
     "openai": openai_provider,
@@ -45,7 +55,9 @@ async def ask_llm(
     schema: Dict[str, Any],
     provider: Optional[str] = None,
     level: str = "low",
-    timeout: int = 8
+    timeout: int = 8,
+    priority: str = PRIORITY_NORMAL,
+    prompt_name: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Route an LLM request to the specified provider.
@@ -55,13 +67,16 @@ async def ask_llm(
         schema: JSON schema that the response should conform to
         provider: The LLM provider to use (if None, use preferred provider from config)
         level: The model tier to use ('low' or 'high')
-        timeout: Request timeout in seconds
+        timeout: Request timeout in seconds, including the wait for a scheduler slot
+        priority: Admission priority class ('interactive', 'normal' or 'background')
+        prompt_name: Name of the prompt, used to pick the response cache TTL
         
     Returns:
         Parsed JSON response from the LLM
         
     Raises:
         ValueError: If the provider is unknown or response cannot be parsed
+        SchedulerTimeoutError: If no scheduler slot is granted in time; the provider was not called
         TimeoutError: If the request times out
     """
     provider_name = provider or CONFIG.preferred_llm_provider
@@ -85,6 +100,18 @@ async def ask_llm(
     model_id = getattr(provider_config.models, level)
     logger.debug(f"Using model: {model_id}")
 
+    cache_key = None
+    cache_ttl = llm_cache.ttl_for(prompt_name)
+    if cache_ttl > 0:
+        cache_key = make_cache_key(provider_name, model_id, prompt, schema)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for prompt '{prompt_name}'")
+            LLM_REQUESTS.labels(provider_name, level, "cache_hit").inc()
+            return cached
+
+    start = time.perf_counter()
+    outcome = "error"
     try:
 
         # Get the provider instance
@@ -95,19 +122,36 @@ async def ask_llm(
             
         provider_instance = _providers[provider_name]
         
-        # Simply call the provider's get_completion method without locking
-        # Each provider should handle thread-safety internally
-        logger.debug(f"Calling {provider_name} completion")
-        result = await asyncio.wait_for(
-            provider_instance.get_completion(prompt, schema, model=model_id),
-            timeout=timeout
-        )
+        # The scheduler bounds concurrency and request/token rates per provider and model;
+        # each provider still handles thread-safety internally. The wait for a slot counts
+        # against the caller's timeout
+        queue_timeout = min(CONFIG.llm_scheduler.queue_timeout, timeout)
+        async with scheduler.slot(provider_name, model_id, prompt, priority=priority, timeout=queue_timeout):
+            logger.debug(f"Calling {provider_name} completion")
+            result = await asyncio.wait_for(
+                provider_instance.get_completion(prompt, schema, model=model_id),
+                timeout=max(0.0, timeout - (time.perf_counter() - start))
+            )
         logger.debug(f"{provider_name} response received, size: {len(str(result))} chars")
+        outcome = "ok"
+        if cache_key is not None and result:
+            await llm_cache.put(cache_key, prompt_name, result, cache_ttl)
         return result
         
+    except SchedulerTimeoutError:
+        # Rejected by the scheduler before reaching the provider
+        outcome = "rejected"
+        logger.warning(f"LLM call with provider {provider_name} rejected: no scheduler slot "
+                       f"within {queue_timeout:.1f}s")
+        raise
     except asyncio.TimeoutError:
+        outcome = "timeout"
         logger.error(f"LLM call timed out after {timeout}s with provider {provider_name}")
         raise
+    except asyncio.CancelledError:
+        # The query was abandoned, e.g. the client disconnected
+        outcome = "cancelled"
+        raise
     except Exception as e:
         logger.exception(f"Error during LLM call with provider {provider_name}")
         logger.log_with_context(
@@ -123,3 +167,7 @@ async def ask_llm(
         )
 
         raise
+    finally:
+        LLM_REQUESTS.labels(provider_name, level, outcome).inc()
+        if outcome != "rejected":
+            LLM_LATENCY.labels(provider_name, level).observe(time.perf_counter() - start)
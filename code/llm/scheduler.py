@@ -0,0 +1,234 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Process-wide admission control for LLM calls. Every call made through ask_llm
+acquires a slot from the lane for its (provider, model) pair. A lane enforces a
+concurrency cap plus token buckets for requests-per-minute and tokens-per-minute,
+and admits waiting calls strictly by priority class, then in arrival order.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Tuple
+
+from config.config import CONFIG, LLMRateLimits
+from utils import metrics
+from utils.logging_config_helper import get_configured_logger
+
+logger = get_configured_logger("llm_scheduler")
+
+# Priority classes, lowest value is admitted first.
+PRIORITY_INTERACTIVE = "interactive"   # on the critical path of the first results, e.g. decontextualization
+PRIORITY_NORMAL = "normal"
+PRIORITY_BACKGROUND = "background"     # nice-to-have work, e.g. memory detection, item descriptions
+
+PRIORITIES = {
+    PRIORITY_INTERACTIVE: 0,
+    PRIORITY_NORMAL: 1,
+    PRIORITY_BACKGROUND: 2,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for tokens-per-minute accounting."""
+    return max(1, len(text) // 4)
+
+
+class SchedulerTimeoutError(asyncio.TimeoutError):
+    """Raised when a call is not granted a slot within its queue timeout; no provider was called."""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute. A rate of 0 disables it."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        # A single request larger than the bucket is admitted once the bucket is full.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if not self.unlimited:
+            self.tokens -= min(amount, self.capacity)
+
+
+class _Lane:
+    """Queue and limits for one (provider, model) pair."""
+
+    def __init__(self, key: Tuple[str, str], limits: LLMRateLimits):
+        self.key = key
+        self.limits = limits
+        self.loop = asyncio.get_running_loop()
+        self.in_flight = 0
+        self.waiters = []  # heap of [priority, seq, future, tokens, enqueued_at]
+        self.requests = TokenBucket(limits.requests_per_minute)
+        self.tokens = TokenBucket(limits.tokens_per_minute)
+        self._timer = None
+        # Metrics
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.queued_by_priority = {name: 0 for name in PRIORITIES}
+
+    def _has_slot(self) -> bool:
+        return self.limits.max_concurrency <= 0 or self.in_flight < self.limits.max_concurrency
+
+    def dispatch(self):
+        """Admit as many waiters as the limits allow, highest priority first."""
+        self._timer = None
+        while self.waiters and self._has_slot():
+            priority, _seq, future, tokens, enqueued_at = self.waiters[0]
+            if future.done():  # cancelled or timed out while queued
+                heapq.heappop(self.waiters)
+                continue
+            delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if delay > 0:
+                self._timer = self.loop.call_later(delay, self.dispatch)
+                return
+            heapq.heappop(self.waiters)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self.in_flight += 1
+            future.set_result(time.monotonic() - enqueued_at)
+
+    def release(self):
+        self.in_flight -= 1
+        if self._timer is None:
+            self.dispatch()
+
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self.waiters if not waiter[2].done())
+
+
+class LLMScheduler:
+    """Holds one lane per (provider, model) and hands out admission slots."""
+
+    def __init__(self):
+        self._lanes: Dict[Tuple[str, str], _Lane] = {}
+        self._seq = itertools.count()
+
+    def _get_lane(self, provider_name: str, model: str) -> _Lane:
+        key = (provider_name, model)
+        lane = self._lanes.get(key)
+        # Lanes are bound to the event loop that created them (tools may run several loops in sequence).
+        if lane is None or lane.loop is not asyncio.get_running_loop():
+            lane = _Lane(key, CONFIG.llm_scheduler.get_limits(provider_name, model))
+            self._lanes[key] = lane
+        return lane
+
+    @asynccontextmanager
+    async def slot(self, provider_name: str, model: str, prompt: str,
+                   priority: str = PRIORITY_NORMAL, timeout: Optional[float] = None):
+        """
+        Wait for an admission slot for a call to `provider_name`/`model`.
+
+        Raises:
+            SchedulerTimeoutError: If no slot is granted within `timeout` seconds
+        """
+        if not CONFIG.llm_scheduler.enabled:
+            yield
+            return
+
+        lane = self._get_lane(provider_name, model)
+        if priority not in PRIORITIES:
+            logger.warning(f"Unknown LLM priority '{priority}', using '{PRIORITY_NORMAL}'")
+            priority = PRIORITY_NORMAL
+        timeout = CONFIG.llm_scheduler.queue_timeout if timeout is None else timeout
+
+        future = lane.loop.create_future()
+        heapq.heappush(lane.waiters, [PRIORITIES[priority], next(self._seq), future,
+                                      estimate_tokens(prompt), time.monotonic()])
+        lane.queued_by_priority[priority] += 1
+        if lane._timer is None:
+            lane.dispatch()
+
+        try:
+            waited = await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            lane.queued_by_priority[priority] -= 1
+            if future.done() and not future.cancelled():
+                # Granted at the same moment we gave up; hand the slot back.
+                lane.release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                # The caller was cancelled, e.g. its client disconnected; not a rejection
+                logger.debug(f"LLM call to {provider_name}/{model} cancelled while waiting for a slot")
+                raise
+            lane.rejected += 1
+            logger.warning(f"LLM call to {provider_name}/{model} gave up waiting for a slot "
+                           f"(priority={priority}, queue_depth={lane.queue_depth()})")
+            raise SchedulerTimeoutError(f"No slot for {provider_name}/{model} within {timeout:.1f}s") from e
+
+        lane.queued_by_priority[priority] -= 1
+        lane.admitted += 1
+        lane.total_wait += waited
+        lane.max_wait = max(lane.max_wait, waited)
+        if waited > 1.0:
+            logger.info(f"LLM call to {provider_name}/{model} waited {waited:.2f}s for a slot (priority={priority})")
+        try:
+            yield
+        finally:
+            lane.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight calls and admission wait times per lane."""
+        stats = {}
+        for (provider_name, model), lane in self._lanes.items():
+            stats[f"{provider_name}/{model}"] = {
+                "in_flight": lane.in_flight,
+                "queue_depth": lane.queue_depth(),
+                "queued_by_priority": dict(lane.queued_by_priority),
+                "admitted": lane.admitted,
+                "rejected": lane.rejected,
+                "avg_wait": lane.total_wait / lane.admitted if lane.admitted else 0.0,
+                "max_wait": lane.max_wait,
+                "max_concurrency": lane.limits.max_concurrency,
+            }
+        return stats
+
+
+# Global singleton
+scheduler = LLMScheduler()
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    return scheduler.get_stats()
+
+
+def _lane_gauge(name, value):
+    return lambda: [(name, ("provider", "model"), key, value(lane)) for key, lane in scheduler._lanes.items()]
+
+
+metrics.add_collector("nlweb_llm_scheduler_in_flight", "gauge", "LLM calls running per provider and model",
+                      _lane_gauge("nlweb_llm_scheduler_in_flight", lambda lane: lane.in_flight))
+metrics.add_collector("nlweb_llm_scheduler_queue_depth", "gauge", "LLM calls waiting for a slot per provider and model",
+                      _lane_gauge("nlweb_llm_scheduler_queue_depth", lambda lane: lane.queue_depth()))
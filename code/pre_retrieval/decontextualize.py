@@ -8,10 +8,10 @@ WARNING: This code is under development and may undergo changes in future releas
 Backwards compatibility is not guaranteed at this time.
 """
 
-import retrieval.retriever as retriever
 from utils.trim import trim_json
 import json
 from prompts.prompt_runner import PromptRunner
+from llm.scheduler import PRIORITY_INTERACTIVE
 from utils.logger import get_logger
 
 logger = get_logger("Decontextualizer")
@@ -40,7 +40,7 @@ class PrevQueryDecontextualizer(NoOpDecontextualizer):
         super().__init__(handler)
 
     async def do(self):
-        response = await self.run_prompt(self.DECONTEXTUALIZE_QUERY_PROMPT_NAME, level="high")
+        response = await self.run_prompt(self.DECONTEXTUALIZE_QUERY_PROMPT_NAME, level="high", priority=PRIORITY_INTERACTIVE)
         logger.info(f"response: {response}")
         if response is None:
             logger.info("No response from decontextualizer")
@@ -72,19 +72,14 @@ class ContextUrlDecontextualizer(PrevQueryDecontextualizer):
     def __init__(self, handler):    
         super().__init__(handler)
         self.context_url = handler.context_url
-        self.retriever = self.retriever()
-
-    def retriever(self):
-        return retriever.DBItemRetriever(self.handler)  
 
     async def do(self):
-        response = await self.run_prompt(self.DECONTEXTUALIZE_QUERY_PROMPT_NAME, level="high")
+        response = await self.run_prompt(self.DECONTEXTUALIZE_QUERY_PROMPT_NAME, level="high", priority=PRIORITY_INTERACTIVE)
         if response is None:
             self.handler.requires_decontextualization = False
             await self.handler.state.precheck_step_done(self.STEP_NAME)
             return
-        await self.retriever.do()
-        item = self.retriever.handler.context_item
+        item = await self.handler.retrieval_memo.search_by_url(self.context_url)
         if (item is None):
             self.handler.requires_decontextualization = False
             await self.handler.state.precheck_step_done(self.STEP_NAME)
@@ -93,7 +88,7 @@ class ContextUrlDecontextualizer(PrevQueryDecontextualizer):
             (url, schema_json, name, site) = item
             self.context_description = json.dumps(trim_json(schema_json))
             self.handler.context_description = self.context_description
-            response = await self.run_prompt(self.DECONTEXTUALIZE_QUERY_PROMPT_NAME, verbose=True)
+            response = await self.run_prompt(self.DECONTEXTUALIZE_QUERY_PROMPT_NAME, verbose=True, priority=PRIORITY_INTERACTIVE)
             self.handler.requires_decontextualization = True
             self.handler.abort_fast_track_event.set()  # Use event instead of flag
             self.handler.decontextualized_query = response["decontextualized_query"]
@@ -10,6 +10,7 @@ Backwards compatibility is not guaranteed at this time.
 """
 
 from prompts.prompt_runner import PromptRunner
+from llm.scheduler import PRIORITY_BACKGROUND
 import asyncio
 
 class Memory(PromptRunner):
@@ -22,7 +23,7 @@ class Memory(PromptRunner):
         self.handler.state.start_precheck_step(self.STEP_NAME)
 
     async def do(self):
-        response = await self.run_prompt(self.MEMORY_PROMPT_NAME, level="high")
+        response = await self.run_prompt(self.MEMORY_PROMPT_NAME, level="high", priority=PRIORITY_BACKGROUND)
         if (not response):
             await self.handler.state.precheck_step_done(self.STEP_NAME)
             return
@@ -10,6 +10,8 @@ Backwards compatibility is not guaranteed at this time.
 
 from prompts.prompts import find_prompt, fill_prompt
 from llm.llm import ask_llm
+from llm.scheduler import PRIORITY_NORMAL
+from utils import tracing
 from utils.logging_config_helper import get_configured_logger
 
 logger = get_configured_logger("prompt_runner")
@@ -35,8 +37,8 @@ class PromptRunner:
         self.handler = handler
         logger.debug(f"PromptRunner initialized with handler for site: {handler.site}")
 
-    async def run_prompt(self, prompt_name, level="low", verbose=False, timeout=8):
-        logger.info(f"Running prompt: {prompt_name} with level={level}, timeout={timeout}s")
+    async def run_prompt(self, prompt_name, level="low", verbose=False, timeout=8, priority=PRIORITY_NORMAL):
+        logger.info(f"Running prompt: {prompt_name} with level={level}, timeout={timeout}s, priority={priority}")
         
         try:
             prompt_str, ans_struc = self.get_prompt(prompt_name)
@@ -53,7 +55,9 @@ class PromptRunner:
             logger.debug(f"Filled prompt length: {len(prompt)} chars")
             
             logger.info(f"Calling LLM with level={level}")
-            response = await ask_llm(prompt, ans_struc, level=level, timeout=timeout)
+            with tracing.span("llm", prompt=prompt_name, level=level):
+                response = await ask_llm(prompt, ans_struc, level=level, timeout=timeout, priority=priority,
+                                         prompt_name=prompt_name)
             
             if response is None:
                 logger.warning(f"LLM returned None for prompt '{prompt_name}'")
@@ -12,6 +12,9 @@ Backwards compatibility is not guaranteed at this time.
 from xml.etree import ElementTree as ET
 import json 
 import os  # Add this import
+import time
+from collections import OrderedDict
+from config.config import CONFIG
 from utils.logging_config_helper import get_configured_logger
 
 logger = get_configured_logger("prompts")
@@ -24,25 +27,83 @@ BASE_NS = "http://nlweb.ai/base"
 # Also deals with filling in the prompt.
 # #Yet to do the subclass check.
 
+SITE_TAG = "{" + BASE_NS + "}Site"
+THING_TAG = "{" + BASE_NS + "}Thing"
+PROMPT_TAG = "{" + BASE_NS + "}Prompt"
+PROMPT_STRING_TAG = "{" + BASE_NS + "}promptString"
+RETURN_STRUC_TAG = "{" + BASE_NS + "}returnStruc"
+
+PROMPT_FILES = ["site_type.xml"]
+
 prompt_roots = []
-def init_prompts(files=["site_type.xml"]):
-    global prompt_roots
+# (site, type, prompt name) -> (prompt text, return structure). Prompts outside a
+# Site element are indexed with site None
+prompt_index = {}
+# Full path of each loaded prompt file -> its modification time
+prompt_file_mtimes = {}
+_next_reload_check = 0.0
+
+def init_prompts(files=PROMPT_FILES):
+    """Parse the prompt files and build the prompt index; replaces any index loaded before."""
+    global prompt_roots, prompt_index, prompt_file_mtimes
     logger.info(f"Initializing prompts from files: {files}")
     
     # Get the directory where prompts.py is located
     current_dir = os.path.dirname(os.path.abspath(__file__))
     
+    roots = []
+    mtimes = {}
     for file in files:
         # Create full path by joining the directory of prompts.py with the filename
         file_path = os.path.join(current_dir, file)
         try:
             logger.debug(f"Loading prompt file: {file_path}")
-            prompt_roots.append(ET.parse(file_path).getroot())
+            mtimes[file_path] = os.stat(file_path).st_mtime_ns
+            roots.append(ET.parse(file_path).getroot())
             logger.debug(f"Successfully loaded prompt file: {file}")
         except Exception as e:
             logger.error(f"Failed to load prompt file '{file}': {str(e)}")
             raise
 
+    index = build_prompt_index(roots)
+    compiled_prompts.clear()
+    for prompt_text, _ in index.values():
+        if prompt_text:
+            compile_prompt(prompt_text)
+
+    # Swapped in whole, so requests in flight see either the old or the new prompts
+    prompt_roots = roots
+    prompt_index = index
+    prompt_file_mtimes = mtimes
+    cached_prompts.clear()
+    logger.info(f"Indexed {len(index)} prompts")
+
+
+def ensure_prompts_loaded():
+    if not prompt_index:
+        init_prompts()
+
+
+def reload_prompts_if_changed():
+    """Rebuild the prompt index if a prompt file changed; checked at most once per configured interval."""
+    global _next_reload_check
+    now = time.monotonic()
+    if now < _next_reload_check:
+        return
+    _next_reload_check = now + CONFIG.nlweb.prompts.reload_check_interval
+    try:
+        changed = any(os.stat(path).st_mtime_ns != mtime for path, mtime in prompt_file_mtimes.items())
+    except OSError:
+        # The file is being replaced; look again at the next check
+        return
+    if changed:
+        logger.info("Prompt file changed, reloading prompts")
+        try:
+            init_prompts([os.path.basename(path) for path in prompt_file_mtimes])
+        except Exception as e:
+            # Keep serving the prompts that were loaded before
+            logger.error(f"Prompt reload failed, keeping the previous prompts: {str(e)}")
+
 
 def super_class_of(child_class, parent_class):
     if parent_class == child_class:
@@ -54,17 +115,153 @@ def super_class_of(child_class, parent_class):
     logger.debug(f"No class relationship: {child_class} is not a subclass of {parent_class}")
     return False
 
-prompt_var_cache = {}
+# Variables whose values are supplied per item by the caller rather than read from the handler
+ITEM_VARIABLES = ("item.description", "item.descriptions")
+
+
+def _query_value(handler):
+    if (handler.state.is_decontextualization_done()):
+        return handler.decontextualized_query
+    elif (len(handler.prev_queries) > 0):
+        return handler.query + " previous queries: " + str(handler.prev_queries)
+    return handler.query
+
+
+# Variable name -> function reading its value from the handler
+PROMPT_VARIABLES = {
+    "request.site": lambda handler: handler.site,
+    "site.itemType": lambda handler: handler.item_type.split("}")[1],
+    "request.query": _query_value,
+    "request.previousQueries": lambda handler: str(handler.prev_queries),
+    "request.contextUrl": lambda handler: handler.context_url,
+    "request.itemType": lambda handler: handler.item_type,
+    "request.contextDescription": lambda handler: handler.context_description,
+    "request.rawQuery": lambda handler: handler.query,
+    "request.answers": lambda handler: str(handler.final_ranked_answers),
+}
+
+
+def _unknown_variable(handler):
+    return ""
+
+
+class PromptTemplate:
+    """
+    A prompt string split once into literal segments and variables. Filling it is
+    a single join over the segments, with each variable's value read through an
+    accessor that was looked up when the template was compiled.
+    """
+
+    # Number of partially filled templates kept per template, see `bind`
+    MAX_BOUND = 16
+
+    def __init__(self, text, parts=None):
+        self.text = text
+        # Literals at even indices, variable names at odd indices
+        self._parts = parts if parts is not None else self._split(text)
+        self._slots = [(i, self._parts[i], PROMPT_VARIABLES.get(self._parts[i], _unknown_variable))
+                       for i in range(1, len(self._parts), 2)]
+        self.variables = set(self._parts[1::2])
+        self._bound = OrderedDict()  # shared variable values -> partially filled template
+
+    @staticmethod
+    def _split(text):
+        parts = []
+        literal_start = 0
+        start = 0
+        while True:
+            # Find next opening brace
+            start = text.find('{', start)
+            if start == -1:
+                break
+            # Find matching closing brace
+            end = text.find('}', start)
+            if end == -1:
+                break
+            var = text[start+1:end]
+            if var and var == var.strip():
+                parts.append(text[literal_start:start])
+                parts.append(var)
+                literal_start = end + 1
+            start = end + 1
+        parts.append(text[literal_start:])
+        for var in parts[1::2]:
+            if var not in PROMPT_VARIABLES and var not in ITEM_VARIABLES:
+                logger.warning(f"Unknown variable: {var}")
+        return parts
+
+    def _resolve(self, handler, values, strict, skip=()):
+        resolved = {}
+        for _, variable, accessor in self._slots:
+            if variable in resolved or variable in skip:
+                continue
+            try:
+                if values is not None and variable in values:
+                    value = values[variable]
+                else:
+                    value = accessor(handler)
+                if not isinstance(value, str):
+                    raise TypeError(f"value of {{{variable}}} must be str, not {type(value).__name__}")
+            except Exception as e:
+                if strict:
+                    raise
+                logger.error(f"Error processing variable '{variable}': {str(e)}")
+                # Use a placeholder to indicate error
+                value = f"[ERROR: {str(e)}]"
+            resolved[variable] = value
+        return resolved
+
+    def fill(self, handler, values=None, strict=True):
+        """
+        Fill the template. `values` overrides the handler for the variables it contains.
+        With strict=False, a variable whose value cannot be read is replaced by an error
+        placeholder instead of raising.
+        """
+        resolved = self._resolve(handler, values, strict)
+        parts = list(self._parts)
+        for i, variable, _ in self._slots:
+            parts[i] = resolved[variable]
+        return "".join(parts)
+
+    def bind(self, handler, keep=ITEM_VARIABLES, strict=True):
+        """
+        Return a template with every variable except those in `keep` filled from the
+        handler. The result is remembered for the values it was built from, so filling
+        the same prompt for many items of one query builds the shared part once.
+        """
+        resolved = self._resolve(handler, None, strict, skip=keep)
+        key = tuple(resolved.items())
+        bound = self._bound.get(key)
+        if bound is not None:
+            self._bound.move_to_end(key)
+            return bound
+
+        parts = [self._parts[0]]
+        for i in range(1, len(self._parts), 2):
+            variable = self._parts[i]
+            if variable in resolved:
+                parts[-1] += resolved[variable] + self._parts[i + 1]
+            else:
+                parts.extend((variable, self._parts[i + 1]))
+        bound = PromptTemplate(self.text, parts)
+        self._bound[key] = bound
+        if len(self._bound) > self.MAX_BOUND:
+            self._bound.popitem(last=False)
+        return bound
+
+
+compiled_prompts = {}
+def compile_prompt(prompt_str):
+    """Return the compiled template for a prompt string, compiling it on first use."""
+    template = compiled_prompts.get(prompt_str)
+    if template is None:
+        logger.debug(f"Compiling prompt (length: {len(prompt_str)})")
+        template = PromptTemplate(prompt_str)
+        compiled_prompts[prompt_str] = template
+    return template
+
 def get_prompt_variables_from_prompt(prompt):
-    if prompt in prompt_var_cache:
-        logger.debug(f"Using cached variables for prompt (length: {len(prompt)})")
-        return prompt_var_cache[prompt]
-    
-    logger.debug(f"Extracting variables from prompt (length: {len(prompt)})")
-    variables = extract_variables_from_prompt(prompt)
-    prompt_var_cache[prompt] = variables
-    logger.debug(f"Found {len(variables)} variables: {variables}")
-    return variables
+    return compile_prompt(prompt).variables
 
 def extract_variables_from_prompt(prompt):
     # Find all strings between { and }
@@ -92,88 +289,23 @@ def extract_variables_from_prompt(prompt):
     return variables
 
 def get_prompt_variable_value(variable, handler):
-    logger.debug(f"Getting value for variable: {variable}")
-    
-    site = handler.site
-    query = handler.query
-    prev_queries = handler.prev_queries
-    value = ""
-
-    if variable == "request.site":
-        value = site
-    elif variable == "site.itemType":
-        item_type = handler.item_type
-        value = item_type.split("}")[1]
-    elif variable == "request.query":
-        if (handler.state.is_decontextualization_done()):
-            value = handler.decontextualized_query
-        elif (len(prev_queries) > 0):
-            value = query + " previous queries: " + str(prev_queries)
-        else:
-            value = query
-    elif variable == "request.previousQueries":
-        value = str(prev_queries)
-    elif variable == "request.contextUrl":
-        value = handler.context_url
-    elif variable == "request.itemType":
-        value = handler.item_type
-    elif variable == "request.contextDescription":
-        value = handler.context_description
-    elif variable == "request.rawQuery":
-        value = query
-    elif variable == "request.answers":
-        value = str(handler.final_ranked_answers)
-    else:
-        logger.warning(f"Unknown variable: {variable}")
-        value = ""
-    
+    value = PROMPT_VARIABLES.get(variable, _unknown_variable)(handler)
     logger.debug(f"Variable '{variable}' = '{str(value)[:100]}{'...' if len(str(value)) > 100 else ''}'")
     return value
 
 def fill_prompt(prompt_str, handler):
-    logger.debug(f"Filling prompt template (length: {len(prompt_str)})")
-    
     try:
-        variables = get_prompt_variables_from_prompt(prompt_str)
-        logger.debug(f"Found {len(variables)} variables to fill")
-        
-        for variable in variables:
-            value = get_prompt_variable_value(variable, handler)        
-            prompt_str = prompt_str.replace("{" + variable + "}", value)
-        
-        logger.debug(f"Prompt filled successfully (final length: {len(prompt_str)})")
-        return prompt_str
+        return compile_prompt(prompt_str).fill(handler)
     except Exception as e:
         logger.error(f"Error filling prompt: {str(e)}")
         logger.debug("Error details:", exc_info=True)
         raise
 
 def fill_ranking_prompt(prompt_str, handler, description):
-    logger.debug(f"Filling ranking prompt template (length: {len(prompt_str)})")
-    
     try:
-        variables = get_prompt_variables_from_prompt(prompt_str)
-        logger.debug(f"Found {len(variables)} variables to fill for ranking prompt")
-        
-        for variable in variables:
-            try:
-                if (variable == "item.description"):
-                    value = json.dumps(description)
-                    logger.debug(f"Filling item.description with JSON (length: {len(value)})")
-                else:
-                    value = get_prompt_variable_value(variable, handler)
-                
-                prompt_str = prompt_str.replace("{" + variable + "}", value)
-                
-            except Exception as e:
-                logger.error(f"Error processing variable '{variable}': {str(e)}")
-                print(f"Error processing variable '{variable}': {str(e)}")
-                # Use a placeholder to indicate error
-                prompt_str = prompt_str.replace("{" + variable + "}", f"[ERROR: {str(e)}]")
-        
-        logger.debug(f"Ranking prompt filled successfully (final length: {len(prompt_str)})")
-        return prompt_str
-        
+        # The query-dependent part is built once per query and shared by all its items
+        template = compile_prompt(prompt_str).bind(handler, strict=False)
+        return template.fill(handler, {"item.description": json.dumps(description)}, strict=False)
     except Exception as e:
         logger.error(f"Error in fill_ranking_prompt: {str(e)}")
         logger.debug("Error details:", exc_info=True)
@@ -181,92 +313,102 @@ def fill_ranking_prompt(prompt_str, handler, description):
         # Return original prompt string with error message
         return f"{prompt_str}\n[ERROR in fill_ranking_prompt: {str(e)}]"
 
-cached_prompts = {}
-def get_cached_values(site, item_type, prompt_name):
-    cache_key = (site, item_type, prompt_name)
-    if cache_key in cached_prompts:
-        logger.debug(f"Cache hit for prompt: {cache_key}")
-        return cached_prompts[cache_key]
-    logger.debug(f"Cache miss for prompt: {cache_key}")
-    return None
+def fill_batch_ranking_prompt(prompt_str, handler, descriptions):
+    """
+    Fill a batched ranking prompt. `descriptions` is a list of (item_id, description)
+    pairs that is serialized into the {item.descriptions} variable, so the shared
+    part of the prompt is sent once for the whole batch.
+    """
+    logger.debug(f"Filling batch ranking prompt template for {len(descriptions)} items")
+    items_value = json.dumps([{"id": item_id, "description": description}
+                              for item_id, description in descriptions])
+    try:
+        template = compile_prompt(prompt_str).bind(handler)
+        return template.fill(handler, {"item.descriptions": items_value})
+    except Exception as e:
+        logger.error(f"Error in fill_batch_ranking_prompt: {str(e)}")
+        logger.debug("Error details:", exc_info=True)
+        raise
 
-def find_prompt(site, item_type, prompt_name):  
-    logger.info(f"Finding prompt: '{prompt_name}' for site='{site}', item_type='{item_type}'")
-    
-    if (prompt_roots == []):
-        logger.debug("Prompt roots not initialized, initializing now")
-        init_prompts()
+def _parse_prompt(prompt_element):
+    prompt_name = prompt_element.get("ref")
+    prompt_text = prompt_element.find(PROMPT_STRING_TAG).text
+    return_struc_element = prompt_element.find(RETURN_STRUC_TAG)
     
-    cached_values = get_cached_values(site, item_type, prompt_name)
+    if return_struc_element is not None and return_struc_element.text:
+        return_struc_text = return_struc_element.text.strip()
+        if return_struc_text == "":
+            return_struc = None
+        else:
+            try:
+                return_struc = json.loads(return_struc_text)
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to parse return structure JSON for prompt '{prompt_name}': {e}")
+                return_struc = None
+    else:
+        return_struc = None
+    return prompt_text, return_struc
+
+
+def _index_type_element(index, site, type_element):
+    for prompt_element in type_element.findall(PROMPT_TAG):
+        # A later definition of the same prompt replaces an earlier one
+        index[(site, type_element.tag, prompt_element.get("ref"))] = _parse_prompt(prompt_element)
+
+
+def build_prompt_index(roots):
+    """Index every prompt under the given XML roots by (site, type, prompt name)."""
+    index = {}
+    for root_element in roots:
+        for child in root_element:
+            if child.tag == SITE_TAG:
+                for type_element in child:
+                    _index_type_element(index, child.get("ref"), type_element)
+            else:
+                _index_type_element(index, None, child)
+    return index
+
+
+def type_hierarchy(item_type):
+    """Types whose prompts apply to `item_type`, most specific first."""
+    if item_type == THING_TAG:
+        return (item_type,)
+    return (item_type, THING_TAG)
+
+
+# (site, item_type, prompt name) -> resolved (prompt text, return structure)
+cached_prompts = {}
+
+def find_prompt(site, item_type, prompt_name):
+    """
+    Return (prompt text, return structure) for a prompt, or (None, None). A prompt
+    under the site's Site element wins over one outside it, and one for the item
+    type itself wins over one for a parent type.
+    """
+    if CONFIG.nlweb.prompts.hot_reload and prompt_index:
+        reload_prompts_if_changed()
+
+    cache_key = (site, item_type, prompt_name)
+    cached_values = cached_prompts.get(cache_key)
     if cached_values is not None:
-        logger.debug(f"Returning cached prompt for '{prompt_name}'")
         return cached_values
 
-    BASE_NS = "http://nlweb.ai/base"
-    SITE_TAG = "{" + BASE_NS + "}Site"
-    PROMPT_TAG = "{" + BASE_NS + "}Prompt"
-    PROMPT_STRING_TAG = "{" + BASE_NS + "}promptString"
-    RETURN_STRUC_TAG = "{" + BASE_NS + "}returnStruc"
-    
-    # First, try to find a Site element matching the site parameter
-    site_element = None
-    prompt_element = None
-    
-    logger.debug(f"Searching for site element with ref='{site}'")
-    for root_element in prompt_roots:
-        for site_element in root_element.findall(SITE_TAG):
-            if site_element.get("ref") == site:
-                logger.debug(f"Found matching site element: {site}")
-                break
-    
-    candidate_roots = []
-    if site_element is not None:
-        candidate_roots.append(site_element)
-        logger.debug(f"Using site-specific search for prompts")
-    else:
-        candidate_roots = prompt_roots
-        logger.debug(f"No site-specific element found, searching all roots")
-    
-    # If site element found, search for matching Type element within it
-    for candidate_root in candidate_roots:
-        for child in candidate_root:
-            if (super_class_of(item_type, child.tag)):
-                logger.debug(f"Found matching type element: {child.tag}")
-                children = child.findall(PROMPT_TAG)
-                logger.debug(f"Found {len(children)} prompt elements under type")
-                
-                for pe in children:
-                    if pe.get("ref") == prompt_name:
-                        prompt_element = pe
-                        logger.debug(f"Found matching prompt element: {prompt_name}")
-                        break
-    
-    if prompt_element is not None:
-        prompt_text = prompt_element.find(PROMPT_STRING_TAG).text
-        return_struc_element = prompt_element.find(RETURN_STRUC_TAG)
-        
-        if return_struc_element is not None and return_struc_element.text:
-            return_struc_text = return_struc_element.text.strip()
-            if return_struc_text == "":
-                return_struc = None
-            else:
-                try:
-                    return_struc = json.loads(return_struc_text)
-                    logger.debug(f"Parsed return structure for prompt '{prompt_name}'")
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse return structure JSON: {e}")
-                    return_struc = None
-        else:
-            return_struc = None
-            logger.debug(f"No return structure defined for prompt '{prompt_name}'")
-        
-        cached_prompts[(site, item_type, prompt_name)] = (prompt_text, return_struc)
-        logger.info(f"Successfully found and cached prompt '{prompt_name}'")
-        return prompt_text, return_struc
-    else:
+    ensure_prompts_loaded()
+    result = _lookup_prompt(site, item_type, prompt_name)
+    if result is None:
         logger.warning(f"Prompt '{prompt_name}' not found for site='{site}', item_type='{item_type}'")
-        cached_prompts[(site, item_type, prompt_name)] = (None, None)
-        return None, None
+        result = (None, None)
+    cached_prompts[cache_key] = result
+    return result
+
+
+def _lookup_prompt(site, item_type, prompt_name):
+    for scope in (site, None):
+        for type_tag in type_hierarchy(item_type):
+            entry = prompt_index.get((scope, type_tag, prompt_name))
+            if entry is not None:
+                return entry
+    return None
 
 
 def get_prompt_variables_from_file(xml_file_path):
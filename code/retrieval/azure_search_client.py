@@ -30,6 +30,7 @@ from azure.search.documents.indexes.models import (
 
 from config.config import CONFIG
 from embedding.embedding import get_embedding
+from retrieval.search_result import SearchResult
 from utils.logging_config_helper import get_configured_logger
 from utils.logger import LogLevel
 
@@ -325,6 +326,42 @@ class AzureSearchClient:
             logger.error(f"Error deleting documents for site {site_value}: {str(e)}")
             return 0
     
+    async def delete_documents_by_url(self, urls: List[str],
+                                      index_name: Optional[str] = None) -> int:
+        """
+        Delete the documents with the given URLs from the index.
+        
+        Args:
+            urls: URLs of the documents to delete
+            index_name: Optional index name (defaults to configured index name)
+            
+        Returns:
+            int: Number of documents deleted
+        """
+        index_name = index_name or self.default_index_name
+        search_client = self._get_search_client(index_name)
+        deleted_count = 0
+        
+        for i in range(0, len(urls), 100):
+            # search.in takes a delimited list; a space cannot appear in a URL
+            values = " ".join(url.replace("'", "''") for url in urls[i:i+100])
+            filter_expression = f"search.in(url, '{values}', ' ')"
+            
+            def search_sync():
+                return [{"id": result["id"]} for result in
+                        search_client.search("*", filter=filter_expression, select="id")]
+            
+            doc_ids = await asyncio.get_event_loop().run_in_executor(None, search_sync)
+            if doc_ids:
+                def delete_sync():
+                    return search_client.delete_documents(doc_ids)
+                
+                await asyncio.get_event_loop().run_in_executor(None, delete_sync)
+                deleted_count += len(doc_ids)
+        
+        logger.info(f"Deleted {deleted_count} documents by URL from '{index_name}'")
+        return deleted_count
+    
     async def upload_documents(self, documents: List[Dict[str, Any]], 
                              index_name: Optional[str] = None) -> int:
         """
@@ -376,7 +413,8 @@ class AzureSearchClient:
     
     async def search(self, query: str, site: Union[str, List[str]], 
                    num_results: int = 50, index_name: Optional[str] = None, 
-                   query_params: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+                   query_params: Optional[Dict[str, Any]] = None,
+                   with_vectors: bool = False) -> List[SearchResult]:
         """
         Search the Azure AI Search index for records filtered by site and ranked by vector similarity
         
@@ -386,9 +424,10 @@ class AzureSearchClient:
             num_results: Maximum number of results to return
             index_name: Optional index name (defaults to configured index name)
             query_params: Additional query parameters
+            with_vectors: Also return each document's stored embedding
             
         Returns:
-            List[List[str]]: List of search results
+            List[SearchResult]: List of search results
         """
         index_name = index_name or self.default_index_name
         logger.info(f"Starting Azure Search - index: {index_name}, site: {site}, num_results: {num_results}")
@@ -402,7 +441,7 @@ class AzureSearchClient:
         
         # Perform the search
         start_retrieve = time.time()
-        results = await self._retrieve_by_site_and_vector(site, embedding, num_results, index_name)
+        results = await self._retrieve_by_site_and_vector(site, embedding, num_results, index_name, with_vectors)
         retrieve_time = time.time() - start_retrieve
         
         logger.log_with_context(
@@ -417,10 +456,22 @@ class AzureSearchClient:
         )
         return results
     
+    @staticmethod
+    def _select_fields(with_vectors: bool) -> str:
+        return "url,name,site,schema_json,embedding" if with_vectors else "url,name,site,schema_json"
+
+    @staticmethod
+    def _format_results(results) -> List[SearchResult]:
+        """[url, schema_json, name, site] rows carrying each document's @search.score and rank"""
+        return [SearchResult(result["url"], result["schema_json"], result["name"], result["site"],
+                             result.get("@search.score"), rank, result.get("embedding"))
+                for rank, result in enumerate(results)]
+
     async def _retrieve_by_site_and_vector(self, sites: Union[str, List[str]], 
                                          vector_embedding: List[float], 
                                          top_n: int = 10, 
-                                         index_name: Optional[str] = None) -> List[List[str]]:
+                                         index_name: Optional[str] = None,
+                                         with_vectors: bool = False) -> List[SearchResult]:
         """
         Internal method to retrieve top n records filtered by site and ranked by vector similarity
         
@@ -429,9 +480,10 @@ class AzureSearchClient:
             vector_embedding: The embedding vector to search with
             top_n: Maximum number of results to return
             index_name: Optional index name (defaults to configured index name)
+            with_vectors: Also return each document's stored embedding
             
         Returns:
-            List[List[str]]: List of search results
+            List[SearchResult]: List of search results
         """
         index_name = index_name or self.default_index_name
         logger.debug(f"Retrieving by site and vector - sites: {sites}, top_n: {top_n}")
@@ -468,7 +520,7 @@ class AzureSearchClient:
                 }
             ],
             "top": top_n,
-            "select": "url,name,site,schema_json"
+            "select": self._select_fields(with_vectors)
         }
         
         try:
@@ -479,10 +531,7 @@ class AzureSearchClient:
             results = await asyncio.get_event_loop().run_in_executor(None, search_sync)
             
             # Process results into a more convenient format
-            processed_results = []
-            for result in results:
-                processed_result = [result["url"], result["schema_json"], result["name"], result["site"]]
-                processed_results.append(processed_result)
+            processed_results = self._format_results(results)
             
             logger.debug(f"Retrieved {len(processed_results)} results")
             return processed_results
@@ -555,7 +604,8 @@ class AzureSearchClient:
     
     async def search_all_sites(self, query: str, top_n: int = 10, 
                              index_name: Optional[str] = None,
-                             query_params: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+                             query_params: Optional[Dict[str, Any]] = None,
+                             with_vectors: bool = False) -> List[SearchResult]:
         """
         Search across all sites using vector similarity
         
@@ -564,9 +614,10 @@ class AzureSearchClient:
             top_n: Maximum number of results to return
             index_name: Optional index name (defaults to configured index name)
             query_params: Additional query parameters
+            with_vectors: Also return each document's stored embedding
             
         Returns:
-            List[List[str]]: List of search results
+            List[SearchResult]: List of search results
         """
         index_name = index_name or self.default_index_name
         logger.info(f"Starting global Azure Search (all sites) - index: {index_name}, top_n: {top_n}")
@@ -595,7 +646,7 @@ class AzureSearchClient:
                     }
                 ],
                 "top": top_n,
-                "select": "url,name,site,schema_json"
+                "select": self._select_fields(with_vectors)
             }
             
             # Execute the search asynchronously
@@ -605,10 +656,7 @@ class AzureSearchClient:
             results = await asyncio.get_event_loop().run_in_executor(None, search_sync)
             
             # Process results into a more convenient format
-            processed_results = []
-            for result in results:
-                processed_result = [result["url"], result["schema_json"], result["name"], result["site"]]
-                processed_results.append(processed_result)
+            processed_results = self._format_results(results)
             
             logger.info(f"Global search completed, found {len(processed_results)} results")
             return processed_results
@@ -0,0 +1,611 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+In-process vector index for small and medium corpora. Embeddings are kept in a
+memory-mapped float32 (or float16) matrix on disk and searched with vectorized
+dot products, optionally through an IVF (inverted file) index. Payloads live in a
+side file of JSON lines that is read by offset only for the rows returned.
+
+On-disk layout for an index, under <database_path>/<index_name>/:
+    meta.json       dimension and dtype
+    vectors.bin     raw row-major matrix of L2-normalized vectors
+    payloads.jsonl  one {"url", "name", "site", "schema_json"} line per row
+
+Both data files are append-only. A later row for the same URL supersedes earlier
+ones; superseded and deleted rows are dropped when the files are compacted.
+Appended rows extend the in-memory snapshot rather than reloading it, so a
+streamed load costs time proportional to its size.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import weakref
+from typing import List, Dict, Union, Optional, Any
+
+import numpy as np
+
+from config.config import CONFIG
+from embedding.embedding import get_embedding
+from retrieval.search_result import SearchResult
+from utils.logging_config_helper import get_configured_logger
+from utils.logger import LogLevel
+
+logger = get_configured_logger("local_index")
+
+# Searches over more candidate rows than this run in a worker thread
+INLINE_SEARCH_ROWS = 20000
+# Rows converted to float32 at a time when scanning a float16 matrix
+SCAN_BLOCK_ROWS = 65536
+# Compact the files once this fraction of rows is dead
+COMPACTION_THRESHOLD = 0.3
+# Rows sampled to train IVF centroids
+IVF_TRAINING_SAMPLE = 50000
+# Retrain IVF centroids once the live rows have grown by this factor since the last training
+IVF_RETRAIN_GROWTH = 2.0
+
+
+def _reserve(array: np.ndarray, size: int, copy: bool = False) -> np.ndarray:
+    """
+    The buffer behind `array` if it has room for `size` entries, else a new one of
+    at least twice the size holding the same entries (always new with `copy`).
+    """
+    buffer = array.base if isinstance(array.base, np.ndarray) else array
+    if size <= len(buffer) and not copy:
+        return buffer
+    grown = np.empty(max(size, 2 * len(buffer)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _PayloadFile:
+    """Open descriptor of one payloads.jsonl file, closed once no snapshot uses it."""
+
+    def __init__(self, path: str):
+        self.fd = os.open(path, os.O_RDONLY)
+        weakref.finalize(self, os.close, self.fd)
+
+    def is_file(self, path: str) -> bool:
+        """Whether `path` still names this file, i.e. it has not been replaced by a compaction."""
+        try:
+            return os.path.samestat(os.fstat(self.fd), os.stat(path))
+        except FileNotFoundError:
+            return False
+
+
+class _IndexState:
+    """
+    Snapshot of an index. Writers build a new snapshot and swap it in, so searches
+    running in worker threads never see a half-updated index. Appending rows may
+    write into the arrays' buffers past the end of an older snapshot, and adds to the
+    shared `urls` and `url_rows`, but never changes what an older snapshot sees.
+    """
+
+    def __init__(self, vectors, offsets, urls, url_rows, site_codes, live, sites, payloads,
+                 live_count=None, centroids=None, assignments=None, trained_rows=0):
+        self.vectors = vectors          # (n, dim) memmap
+        self.offsets = offsets          # (n + 1,) int64 byte offsets into `payloads`
+        self.urls = urls                # urls of the rows, at least n
+        self.url_rows = url_rows        # url -> row of its latest version; rows may be >= n
+        self.site_codes = site_codes    # (n,) int32 index into `sites`
+        self.live = live                # (n,) bool, False for superseded/deleted rows
+        self.sites = sites              # list of site names
+        self.payloads = payloads        # _PayloadFile the offsets refer to
+        self.live_count = int(live.sum()) if live_count is None else live_count
+        self.centroids = centroids      # (lists, dim) float32 or None
+        self.assignments = assignments  # (n,) int32 list id per row or None
+        self.trained_rows = trained_rows  # live rows when the centroids were trained
+
+    @property
+    def count(self) -> int:
+        return len(self.offsets) - 1
+
+    def with_live(self, live: np.ndarray) -> "_IndexState":
+        """The snapshot with some rows marked dead, as input to a compaction."""
+        return _IndexState(self.vectors, self.offsets, self.urls, self.url_rows, self.site_codes, live,
+                           self.sites, self.payloads)
+
+
+class LocalIndexClient:
+    """
+    Client for the local memory-mapped vector index, implementing the same
+    interface as the external vector database clients.
+    """
+
+    def __init__(self, endpoint_name: Optional[str] = None):
+        """
+        Initialize the local index client.
+
+        Args:
+            endpoint_name: Name of the endpoint to use (defaults to preferred endpoint in CONFIG)
+        """
+        self.endpoint_name = endpoint_name or CONFIG.preferred_retrieval_endpoint
+        self.endpoint_config = self._get_endpoint_config()
+        self.database_path = self._resolve_path(self.endpoint_config.database_path or "../data/local_index")
+        self.default_index_name = self.endpoint_config.index_name or "nlweb_collection"
+        self.vector_dtype = np.dtype(self.endpoint_config.vector_dtype or "float32")
+        if self.vector_dtype not in (np.dtype("float32"), np.dtype("float16")):
+            raise ValueError(f"Unsupported vector_dtype for local index: {self.vector_dtype}")
+        self.ivf_lists = self.endpoint_config.ivf_lists
+        self.ivf_probes = max(1, self.endpoint_config.ivf_probes)
+        self._states: Dict[str, _IndexState] = {}
+        self._load_lock = threading.Lock()
+        # Uploads extend the latest snapshot in place, so writes must not interleave
+        self._write_lock = threading.Lock()
+        logger.info(f"Initialized LocalIndexClient for endpoint: {self.endpoint_name} at {self.database_path}")
+
+    def _get_endpoint_config(self):
+        endpoint_config = CONFIG.retrieval_endpoints.get(self.endpoint_name)
+        if not endpoint_config:
+            error_msg = f"No configuration found for endpoint {self.endpoint_name}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        if endpoint_config.db_type != "local_index":
+            error_msg = f"Endpoint {self.endpoint_name} is not a local index endpoint (type: {endpoint_config.db_type})"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        return endpoint_config
+
+    def _resolve_path(self, path: str) -> str:
+        """Resolve paths relative to the project root, as the Qdrant client does."""
+        if os.path.isabs(path):
+            return path
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if path.startswith('./'):
+            return os.path.join(project_root, path[2:])
+        if path.startswith('../'):
+            return os.path.join(os.path.dirname(project_root), path[3:])
+        return os.path.join(project_root, path)
+
+    def _index_dir(self, index_name: str) -> str:
+        return os.path.join(self.database_path, index_name)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _read_meta(self, index_dir: str) -> Optional[Dict[str, Any]]:
+        meta_path = os.path.join(index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+
+    def _open_vectors(self, index_dir: str, meta: Dict[str, Any], count: int):
+        if count == 0:
+            return np.zeros((0, meta["dimension"]), dtype=meta["dtype"])
+        return np.memmap(os.path.join(index_dir, "vectors.bin"), dtype=meta["dtype"],
+                         mode="r", shape=(count, meta["dimension"]))
+
+    def _load_state(self, index_name: str) -> Optional[_IndexState]:
+        """Load an index from disk; returns None if it does not exist."""
+        index_dir = self._index_dir(index_name)
+        meta = self._read_meta(index_dir)
+        if meta is None:
+            return None
+
+        offsets = [0]
+        urls = []
+        site_names = []
+        # Searches read payloads through this descriptor, so they keep reading the file
+        # these offsets were taken from even after a compaction replaces it
+        payloads = _PayloadFile(os.path.join(index_dir, "payloads.jsonl"))
+        with open(payloads.fd, "rb", closefd=False) as f:
+            for line in f:
+                payload = json.loads(line)
+                urls.append(payload.get("url"))
+                site_names.append(payload.get("site") or "")
+                offsets.append(offsets[-1] + len(line))
+
+        # vectors.bin may be ahead of payloads.jsonl after an interrupted write; trust the payloads
+        count = len(urls)
+        vectors = self._open_vectors(index_dir, meta, count)
+
+        sites = sorted(set(site_names))
+        site_lookup = {site: i for i, site in enumerate(sites)}
+        site_codes = np.fromiter((site_lookup[s] for s in site_names), dtype=np.int32, count=count)
+
+        url_rows = {url: row for row, url in enumerate(urls)}
+        live = np.zeros(count, dtype=bool)
+        if url_rows:
+            live[np.fromiter(url_rows.values(), dtype=np.int64, count=len(url_rows))] = True
+
+        state = _IndexState(vectors, np.asarray(offsets, dtype=np.int64), urls, url_rows, site_codes, live, sites,
+                            payloads)
+        logger.info(f"Loaded local index '{index_name}': {state.live_count} live rows of {count}, "
+                    f"dimension {meta['dimension']}, dtype {meta['dtype']}")
+        return self._with_ivf(state)
+
+    def _get_state(self, index_name: str) -> Optional[_IndexState]:
+        state = self._states.get(index_name)
+        if state is None:
+            with self._load_lock:
+                state = self._states.get(index_name)
+                if state is None:
+                    state = self._load_state(index_name)
+                    if state is not None:
+                        self._states[index_name] = state
+        return state
+
+    # ------------------------------------------------------------------
+    # IVF
+    # ------------------------------------------------------------------
+
+    def _with_ivf(self, state: _IndexState) -> _IndexState:
+        """Train IVF centroids for the snapshot if configured and there are enough rows."""
+        if self.ivf_lists <= 0 or state.live_count < self.ivf_lists * 40:
+            return state
+        live_rows = np.flatnonzero(state.live)
+        rng = np.random.default_rng(0)
+        sample = rng.choice(live_rows, size=min(len(live_rows), IVF_TRAINING_SAMPLE), replace=False)
+        sample.sort()
+        data = np.asarray(state.vectors[sample], dtype=np.float32)
+
+        # Spherical k-means on the sample
+        centroids = data[rng.choice(len(data), size=self.ivf_lists, replace=False)].copy()
+        for _ in range(10):
+            nearest = np.argmax(data @ centroids.T, axis=1)
+            for k in range(self.ivf_lists):
+                members = data[nearest == k]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[k] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        state.centroids = centroids
+        state.assignments = self._assign(centroids, state.vectors)
+        state.trained_rows = state.live_count
+        logger.info(f"Trained IVF index with {self.ivf_lists} lists on {len(data)} rows")
+        return state
+
+    def _assign(self, centroids: np.ndarray, vectors) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def _site_mask(self, state: _IndexState, site: Union[str, List[str]]) -> np.ndarray:
+        if site == "all":
+            return state.live
+        sites = site if isinstance(site, list) else [site]
+        codes = [i for i, name in enumerate(state.sites) if name in sites]
+        if not codes:
+            return np.zeros(state.count, dtype=bool)
+        return state.live & np.isin(state.site_codes, codes)
+
+    def _top_k(self, state: _IndexState, query_vector: np.ndarray, mask: np.ndarray, k: int) -> np.ndarray:
+        """Row ids of the k best-scoring rows among those selected by `mask`, best first."""
+        if state.centroids is not None:
+            probes = min(self.ivf_probes, len(state.centroids))
+            nearest_lists = np.argpartition(-(state.centroids @ query_vector), probes - 1)[:probes]
+            mask = mask & np.isin(state.assignments, nearest_lists)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return candidates
+
+        if len(candidates) == state.count and state.vectors.dtype == np.float32:
+            scores = state.vectors @ query_vector
+        else:
+            scores = np.empty(len(candidates), dtype=np.float32)
+            for start in range(0, len(candidates), SCAN_BLOCK_ROWS):
+                rows = candidates[start:start + SCAN_BLOCK_ROWS]
+                scores[start:start + len(rows)] = np.asarray(state.vectors[rows], dtype=np.float32) @ query_vector
+
+        k = min(k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return candidates[best]
+
+    def _read_payloads(self, state: _IndexState, rows,
+                       query_vector: Optional[np.ndarray] = None, with_vectors: bool = False) -> List[SearchResult]:
+        """
+        The rows' payloads, in order. Given the query vector, each result carries its
+        cosine similarity to it and its rank.
+        """
+        results = []
+        for rank, row in enumerate(rows):
+            start, end = state.offsets[row], state.offsets[row + 1]
+            payload = json.loads(os.pread(state.payloads.fd, int(end - start), int(start)))
+            result = SearchResult(payload.get("url", ""), payload.get("schema_json", ""),
+                                  payload.get("name", ""), payload.get("site", ""))
+            if query_vector is not None or with_vectors:
+                vector = np.asarray(state.vectors[row], dtype=np.float32)
+                if query_vector is not None:
+                    result.score = float(vector @ query_vector)
+                    result.rank = rank
+                if with_vectors:
+                    result.vector = vector.tolist()
+            results.append(result)
+        return results
+
+    def _search_sync(self, index_name: str, state: _IndexState, query_vector: np.ndarray,
+                     site: Union[str, List[str]], num_results: int, with_vectors: bool = False) -> List[SearchResult]:
+        mask = self._site_mask(state, site)
+        rows = self._top_k(state, query_vector, mask, num_results)
+        return self._read_payloads(state, rows, query_vector, with_vectors)
+
+    async def search(self, query: str, site: Union[str, List[str]],
+                     num_results: int = 50, index_name: Optional[str] = None,
+                     query_params: Optional[Dict[str, Any]] = None,
+                     with_vectors: bool = False) -> List[SearchResult]:
+        """
+        Search the local index for records filtered by site and ranked by cosine similarity.
+
+        Args:
+            query: The search query to embed and search with
+            site: Site to filter by (string or list of strings)
+            num_results: Maximum number of results to return
+            index_name: Optional index name (defaults to configured name)
+            query_params: Additional query parameters
+            with_vectors: Also return each row's stored (normalized) vector
+
+        Returns:
+            List[SearchResult]: List of search results [url, schema_json, name, site]
+        """
+        index_name = index_name or self.default_index_name
+        try:
+            state = self._get_state(index_name)
+            if state is None:
+                logger.warning(f"Local index '{index_name}' does not exist")
+                return []
+            embedding = await get_embedding(query)
+            query_vector = np.asarray(embedding, dtype=np.float32)
+            query_vector /= max(np.linalg.norm(query_vector), 1e-12)
+
+            if state.count > INLINE_SEARCH_ROWS:
+                return await asyncio.to_thread(self._search_sync, index_name, state, query_vector, site, num_results,
+                                               with_vectors)
+            return self._search_sync(index_name, state, query_vector, site, num_results, with_vectors)
+        except Exception as e:
+            logger.exception(f"Error in local index search: {str(e)}")
+            logger.log_with_context(
+                LogLevel.ERROR,
+                "Local index search failed",
+                {
+                    "error_type": type(e).__name__,
+                    "error_message": str(e),
+                    "index": index_name,
+                    "site": site,
+                }
+            )
+            raise
+
+    async def search_all_sites(self, query: str, num_results: int = 50,
+                               index_name: Optional[str] = None,
+                               query_params: Optional[Dict[str, Any]] = None,
+                               with_vectors: bool = False) -> List[SearchResult]:
+        """Search across all sites using vector similarity."""
+        return await self.search(query, "all", num_results, index_name, query_params, with_vectors)
+
+    async def search_by_url(self, url: str, index_name: Optional[str] = None) -> Optional[List[str]]:
+        """
+        Retrieve a specific item by URL.
+
+        Args:
+            url: URL to search for
+            index_name: Optional index name (defaults to configured name)
+
+        Returns:
+            Optional[List[str]]: Search result or None if not found
+        """
+        index_name = index_name or self.default_index_name
+        state = self._get_state(index_name)
+        if state is None:
+            return None
+        row = state.url_rows.get(url)
+        if row is not None and row < state.count and state.live[row]:
+            return self._read_payloads(state, [row])[0]
+        logger.warning(f"No item found for URL: {url}")
+        return None
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _write_meta(self, index_dir: str, dimension: int):
+        os.makedirs(index_dir, exist_ok=True)
+        with open(os.path.join(index_dir, "meta.json"), "w") as f:
+            json.dump({"dimension": dimension, "dtype": self.vector_dtype.name}, f)
+        open(os.path.join(index_dir, "vectors.bin"), "ab").close()
+        open(os.path.join(index_dir, "payloads.jsonl"), "ab").close()
+
+    def _upload_sync(self, index_name: str, documents: List[Dict[str, Any]]) -> int:
+        documents = [doc for doc in documents if doc.get("embedding")]
+        if not documents:
+            return 0
+        index_dir = self._index_dir(index_name)
+        meta = self._read_meta(index_dir)
+        if meta is None:
+            self._write_meta(index_dir, len(documents[0]["embedding"]))
+            meta = self._read_meta(index_dir)
+        dimension = meta["dimension"]
+
+        matrix = np.asarray([doc["embedding"] for doc in documents], dtype=np.float32)
+        if matrix.shape[1] != dimension:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match index dimension {dimension}")
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        lines = [(json.dumps({"url": doc.get("url"), "name": doc.get("name"), "site": doc.get("site"),
+                              "schema_json": doc.get("schema_json")}) + "\n").encode("utf-8")
+                 for doc in documents]
+
+        with self._write_lock:
+            # Vectors first: rows without a payload line are ignored on load, and are
+            # cut off here so the files line up again after an interrupted write
+            state = self._get_state(index_name)
+            stored = matrix.astype(meta["dtype"])
+            row_bytes = dimension * np.dtype(meta["dtype"]).itemsize
+            with open(os.path.join(index_dir, "vectors.bin"), "ab") as f:
+                f.truncate(state.count * row_bytes)
+                f.write(stored.tobytes())
+            payload_path = os.path.join(index_dir, "payloads.jsonl")
+            with open(payload_path, "ab") as f:
+                start = f.tell()
+                f.write(b"".join(lines))
+
+            if start == state.offsets[-1] and state.payloads.is_file(payload_path):
+                state = self._extend(index_dir, meta, state, documents, lines, stored)
+                with self._load_lock:
+                    self._states[index_name] = state
+            else:
+                # The files changed under the snapshot (e.g. another process compacted them)
+                with self._load_lock:
+                    self._states.pop(index_name, None)
+                state = self._get_state(index_name)
+            if state.count and 1 - state.live_count / state.count > COMPACTION_THRESHOLD:
+                self._compact(index_name, state)
+        return len(documents)
+
+    def _extend(self, index_dir: str, meta: Dict[str, Any], state: _IndexState,
+                documents: List[Dict[str, Any]], lines: List[bytes], stored: np.ndarray) -> _IndexState:
+        """A snapshot with the rows just appended to the files added to `state`."""
+        n, m = state.count, len(documents)
+        url_rows = state.url_rows
+        replaces_rows = any(url_rows.get(doc.get("url"), n) < n for doc in documents)
+
+        offsets = _reserve(state.offsets, n + m + 1)
+        offsets[n + 1:n + m + 1] = state.offsets[n] + np.cumsum([len(line) for line in lines])
+        sites = list(state.sites)
+        site_lookup = {site: i for i, site in enumerate(sites)}
+        site_codes = _reserve(state.site_codes, n + m)
+        # Rows of older snapshots that become dead must not change under their readers
+        live = _reserve(state.live, n + m, copy=replaces_rows)
+        live[n:n + m] = False
+        live_count = state.live_count
+        for i, doc in enumerate(documents):
+            site = doc.get("site") or ""
+            if site not in site_lookup:
+                site_lookup[site] = len(sites)
+                sites.append(site)
+            site_codes[n + i] = site_lookup[site]
+            url = doc.get("url")
+            previous = url_rows.get(url)
+            if previous is not None and live[previous]:
+                live[previous] = False
+                live_count -= 1
+            state.urls.append(url)
+            url_rows[url] = n + i
+            live[n + i] = True
+            live_count += 1
+
+        assignments = None
+        if state.centroids is not None:
+            assignments = _reserve(state.assignments, n + m)
+            assignments[n:n + m] = self._assign(state.centroids, stored)
+            assignments = assignments[:n + m]
+
+        extended = _IndexState(self._open_vectors(index_dir, meta, n + m), offsets[:n + m + 1], state.urls,
+                               url_rows, site_codes[:n + m], live[:n + m], sites, state.payloads, live_count,
+                               state.centroids, assignments, state.trained_rows)
+        if state.centroids is None or live_count >= state.trained_rows * IVF_RETRAIN_GROWTH:
+            extended = self._with_ivf(extended)
+        return extended
+
+    def _compact(self, index_name: str, state: _IndexState):
+        index_dir = self._index_dir(index_name)
+        rows = np.flatnonzero(state.live)
+        logger.info(f"Compacting local index '{index_name}': keeping {len(rows)} of {state.count} rows")
+        with open(os.path.join(index_dir, "vectors.bin.tmp"), "wb") as f:
+            for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+                f.write(np.asarray(state.vectors[rows[start:start + SCAN_BLOCK_ROWS]]).tobytes())
+        with open(os.path.join(index_dir, "payloads.jsonl.tmp"), "wb") as dst:
+            for row in rows:
+                start, end = state.offsets[row], state.offsets[row + 1]
+                dst.write(os.pread(state.payloads.fd, int(end - start), int(start)))
+        # Open memmaps and readers keep the old inodes alive
+        os.replace(os.path.join(index_dir, "vectors.bin.tmp"), os.path.join(index_dir, "vectors.bin"))
+        os.replace(os.path.join(index_dir, "payloads.jsonl.tmp"), os.path.join(index_dir, "payloads.jsonl"))
+        with self._load_lock:
+            self._states.pop(index_name, None)
+        self._get_state(index_name)
+
+    def _delete_sync(self, index_name: str, site: str) -> int:
+        with self._write_lock:
+            state = self._get_state(index_name)
+            if state is None:
+                return 0
+            doomed = self._site_mask(state, site)
+            count = int(doomed.sum())
+            if count:
+                self._compact(index_name, state.with_live(state.live & ~doomed))
+            return count
+
+    def _delete_urls_sync(self, index_name: str, urls: List[str]) -> int:
+        with self._write_lock:
+            state = self._get_state(index_name)
+            if state is None:
+                return 0
+            live = state.live.copy()
+            count = 0
+            for url in urls:
+                row = state.url_rows.get(url)
+                if row is not None and row < state.count and live[row]:
+                    live[row] = False
+                    count += 1
+            if count:
+                self._compact(index_name, state.with_live(live))
+            return count
+
+    async def delete_documents_by_url(self, urls: List[str], index_name: Optional[str] = None) -> int:
+        """
+        Delete the documents with the given URLs.
+
+        Args:
+            urls: URLs of the documents to delete
+            index_name: Optional index name (defaults to configured name)
+
+        Returns:
+            int: Number of documents deleted
+        """
+        index_name = index_name or self.default_index_name
+        count = await asyncio.to_thread(self._delete_urls_sync, index_name, urls)
+        logger.info(f"Deleted {count} documents by URL from local index '{index_name}'")
+        return count
+
+    async def upload_documents(self, documents: List[Dict[str, Any]],
+                               index_name: Optional[str] = None) -> int:
+        """
+        Upload a batch of documents. Documents whose URL is already indexed replace the old entry.
+
+        Args:
+            documents: List of document objects with embedding, schema_json, etc.
+            index_name: Optional index name (defaults to configured name)
+
+        Returns:
+            int: Number of documents uploaded
+        """
+        if not documents:
+            logger.info("No documents to upload")
+            return 0
+        index_name = index_name or self.default_index_name
+        try:
+            count = await asyncio.to_thread(self._upload_sync, index_name, documents)
+            logger.info(f"Uploaded {count} documents to local index '{index_name}'")
+            return count
+        except Exception as e:
+            logger.exception(f"Error uploading documents to local index '{index_name}': {str(e)}")
+            raise
+
+    async def delete_documents_by_site(self, site: str, index_name: Optional[str] = None) -> int:
+        """
+        Delete all documents that match a specific site value.
+
+        Args:
+            site: The site value to filter by
+            index_name: Optional index name (defaults to configured name)
+
+        Returns:
+            int: Number of documents deleted
+        """
+        index_name = index_name or self.default_index_name
+        count = await asyncio.to_thread(self._delete_sync, index_name, site)
+        logger.info(f"Deleted {count} documents for site '{site}' from local index '{index_name}'")
+        return count
@@ -16,6 +16,7 @@ import numpy as np
 
 from config.config import CONFIG
 from embedding.embedding import get_embedding
+from retrieval.search_result import SearchResult
 from utils.logging_config_helper import get_configured_logger
 from utils.logger import LogLevel
 
@@ -37,6 +38,7 @@ class MilvusVectorClient:
         self.endpoint_name = endpoint_name or CONFIG.preferred_retrieval_endpoint
         self._client_lock = threading.Lock()
         self._milvus_clients = {}  # Cache for Milvus clients
+        self._metric_types = {}  # collection name -> metric type of its vector index
         
         # Get endpoint configuration
         self.endpoint_config = self._get_endpoint_config()
@@ -145,6 +147,7 @@ class MilvusVectorClient:
         if drop_existing and client.has_collection(collection_name):
             logger.info(f"Dropping existing collection '{collection_name}'")
             client.drop_collection(collection_name)
+            self._metric_types.pop(collection_name, None)
         
         # Create collection if it doesn't exist
         if not client.has_collection(collection_name):
@@ -246,6 +249,39 @@ class MilvusVectorClient:
             logger.error(f"Error in _delete_documents_by_site_sync for site {site}: {str(e)}")
             raise
     
+    async def delete_documents_by_url(self, urls: List[str],
+                                      collection_name: Optional[str] = None,
+                                      embedding_size: str = "small") -> int:
+        """
+        Delete the documents with the given URLs from the collection.
+        
+        Args:
+            urls: URLs of the documents to delete
+            collection_name: Optional collection name (defaults to configured name)
+            embedding_size: Size of embeddings ("small"=1536 or "large"=3072)
+            
+        Returns:
+            int: Number of documents deleted
+        """
+        collection_name = collection_name or self.default_collection_name
+        client = self._get_milvus_client(embedding_size)
+        
+        if not urls or not client.has_collection(collection_name):
+            return 0
+        
+        def delete_sync():
+            deleted = 0
+            for i in range(0, len(urls), 500):
+                expr = f"url in {json.dumps(urls[i:i+500])}"
+                ids = [entity["id"] for entity in
+                       client.query(collection_name=collection_name, filter=expr, output_fields=["id"])]
+                if ids:
+                    client.delete(collection_name=collection_name, ids=ids)
+                    deleted += len(ids)
+            return deleted
+        
+        return await asyncio.get_event_loop().run_in_executor(None, delete_sync)
+    
     async def upload_documents(self, documents: List[Dict[str, Any]], 
                              collection_name: Optional[str] = None,
                              embedding_size: str = "small") -> int:
@@ -303,7 +339,8 @@ class MilvusVectorClient:
     
     async def search(self, query: str, site: Union[str, List[str]], 
                    num_results: int = 50, collection_name: Optional[str] = None,
-                   query_params: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+                   query_params: Optional[Dict[str, Any]] = None,
+                   with_vectors: bool = False) -> List[SearchResult]:
         """
         Search the Milvus collection for records filtered by site and ranked by vector similarity.
         
@@ -313,9 +350,10 @@ class MilvusVectorClient:
             num_results: Maximum number of results to return
             collection_name: Optional collection name (defaults to configured name)
             query_params: Additional query parameters
+            with_vectors: Also return each entity's stored vector
             
         Returns:
-            List[List[str]]: List of search results in format [url, text_json, name, site]
+            List[SearchResult]: List of search results in format [url, text_json, name, site]
         """
         collection_name = collection_name or self.default_collection_name
         logger.info(f"Starting Milvus search - collection: {collection_name}, site: {site}, num_results: {num_results}")
@@ -328,7 +366,8 @@ class MilvusVectorClient:
             
             # Run the search operation asynchronously
             results = await asyncio.get_event_loop().run_in_executor(
-                None, self._search_sync, query, site, num_results, embedding, collection_name, query_params
+                None, self._search_sync, query, site, num_results, embedding, collection_name, query_params,
+                with_vectors
             )
             
             logger.info(f"Milvus search completed successfully, found {len(results)} results")
@@ -349,14 +388,43 @@ class MilvusVectorClient:
             )
             raise
     
+    def _metric_type(self, client: MilvusClient, collection_name: str) -> Optional[str]:
+        """Metric type (COSINE, IP, L2, ...) of the collection's vector index, or None if unknown."""
+        if collection_name not in self._metric_types:
+            metric_type = None
+            try:
+                for index_name in client.list_indexes(collection_name=collection_name):
+                    index = client.describe_index(collection_name=collection_name, index_name=index_name)
+                    if index.get("metric_type"):
+                        metric_type = str(index["metric_type"]).upper()
+                        break
+            except Exception as e:
+                logger.warning(f"Could not read the metric type of Milvus collection '{collection_name}': {e}")
+            self._metric_types[collection_name] = metric_type
+        return self._metric_types[collection_name]
+
+    @staticmethod
+    def _similarity(distance: Optional[float], metric_type: Optional[str]) -> Optional[float]:
+        """A hit's distance as a score where higher is closer, or None for metrics without one."""
+        if distance is None:
+            return None
+        if metric_type in ("COSINE", "IP"):
+            return distance
+        if metric_type == "L2":
+            return -distance
+        return None
+
     def _search_sync(self, query: str, site: Union[str, List[str]], num_results: int, 
                    embedding: List[float], collection_name: str, 
-                   query_params: Optional[Dict[str, Any]]) -> List[List[str]]:
+                   query_params: Optional[Dict[str, Any]], with_vectors: bool = False) -> List[SearchResult]:
         """Synchronous implementation of search for thread execution"""
         logger.debug(f"Executing synchronous search - site: {site}, num_results: {num_results}")
         
         try:
             client = self._get_milvus_client()
+            output_fields = ["url", "text", "name", "site"]
+            if with_vectors:
+                output_fields.append("vector")
             
             # Perform the search based on the site parameter
             if site == "all":
@@ -365,7 +433,7 @@ class MilvusVectorClient:
                     collection_name=collection_name,
                     data=[embedding],
                     limit=num_results,
-                    output_fields=["url", "text", "name", "site"],
+                    output_fields=output_fields,
                 )
             elif isinstance(site, list):
                 site_filter = " || ".join([f"site == '{s}'" for s in site])
@@ -375,7 +443,7 @@ class MilvusVectorClient:
                     data=[embedding],
                     filter=site_filter,
                     limit=num_results,
-                    output_fields=["url", "text", "name", "site"],
+                    output_fields=output_fields,
                 )
             else:
                 logger.debug(f"Searching site: {site} in collection: {collection_name}")
@@ -384,16 +452,21 @@ class MilvusVectorClient:
                     data=[embedding],
                     filter=f"site == '{site}'",
                     limit=num_results,
-                    output_fields=["url", "text", "name", "site"],
+                    output_fields=output_fields,
                 )
 
             # Format the results
             retval = []
             if res and len(res) > 0:
-                for item in res[0]:
+                # The "distance" of a hit is a similarity for COSINE and IP but grows with
+                # the distance for L2, so scores depend on the index's metric
+                metric_type = self._metric_type(client, collection_name)
+                for rank, item in enumerate(res[0]):
                     ent = item["entity"]
                     txt = json.dumps(ent["text"])
-                    retval.append([ent["url"], txt, ent["name"], ent["site"]])
+                    retval.append(SearchResult(ent["url"], txt, ent["name"], ent["site"],
+                                               self._similarity(item.get("distance"), metric_type), rank,
+                                               ent.get("vector")))
             
             logger.info(f"Retrieved {len(retval)} items from Milvus")
             logger.debug(f"First result URL: {retval[0][0] if retval else 'No results'}")
@@ -459,7 +532,8 @@ class MilvusVectorClient:
     
     async def search_all_sites(self, query: str, num_results: int = 50, 
                              collection_name: Optional[str] = None,
-                             query_params: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+                             query_params: Optional[Dict[str, Any]] = None,
+                             with_vectors: bool = False) -> List[SearchResult]:
         """
         Search across all sites using vector similarity.
         
@@ -468,9 +542,10 @@ class MilvusVectorClient:
             num_results: Maximum number of results to return
             collection_name: Optional collection name (defaults to configured name)
             query_params: Additional query parameters
+            with_vectors: Also return each entity's stored vector
             
         Returns:
-            List[List[str]]: List of search results
+            List[SearchResult]: List of search results
         """
         # This is just a convenience wrapper around the regular search method with site="all"
-        return await self.search(query, "all", num_results, collection_name, query_params)
\ No newline at end of file
+        return await self.search(query, "all", num_results, collection_name, query_params, with_vectors)
\ No newline at end of file
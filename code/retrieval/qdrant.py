@@ -19,6 +19,7 @@ from qdrant_client.http.exceptions import UnexpectedResponse
 
 from config.config import CONFIG
 from embedding.embedding import get_embedding
+from retrieval.search_result import SearchResult
 from utils.logging_config_helper import get_configured_logger
 from utils.logger import LogLevel
 
@@ -369,6 +370,44 @@ class QdrantVectorClient:
 
         return count
 
+    async def delete_documents_by_url(
+        self, urls: List[str], collection_name: Optional[str] = None
+    ) -> int:
+        """
+        Delete the documents with the given URLs from a collection.
+
+        Args:
+            urls: URLs of the documents to delete
+            collection_name: Optional collection name (defaults to configured name)
+
+        Returns:
+            int: Number of documents deleted
+        """
+        collection_name = collection_name or self.default_collection_name
+        client = await self._get_qdrant_client()
+
+        if not urls or not await client.collection_exists(collection_name):
+            return 0
+
+        count = 0
+        for i in range(0, len(urls), 256):
+            filter_condition = models.Filter(
+                must=[
+                    models.FieldCondition(key="url", match=models.MatchAny(any=urls[i:i + 256]))
+                ]
+            )
+            count += (
+                await client.count(
+                    collection_name=collection_name, count_filter=filter_condition
+                )
+            ).count
+            await client.delete(
+                collection_name=collection_name, points_selector=filter_condition
+            )
+        logger.info(f"Deleted {count} points by URL")
+
+        return count
+
     async def upload_documents(self, documents: List[Dict[str, Any]], 
                              collection_name: Optional[str] = None) -> int:
         """
@@ -485,31 +524,33 @@ class QdrantVectorClient:
             must=[models.FieldCondition(key="site", match=models.MatchAny(any=sites))]
         )
     
-    def _format_results(self, search_result: List[models.ScoredPoint]) -> List[List[str]]:
+    def _format_results(self, search_result: List[models.ScoredPoint]) -> List[SearchResult]:
         """
-        Format Qdrant search results to match expected API: [url, text_json, name, site].
+        Format Qdrant search results to match expected API: [url, text_json, name, site],
+        carrying each point's similarity score, rank and (if fetched) vector.
         
         Args:
             search_result: Qdrant search results
             
         Returns:
-            List[List[str]]: Formatted results
+            List[SearchResult]: Formatted results
         """
         results = []
-        for item in search_result:
+        for rank, item in enumerate(search_result):
             payload = item.payload
             url = payload.get("url", "")
             schema = payload.get("schema_json", "")
             name = payload.get("name", "")
             site_name = payload.get("site", "")
 
-            results.append([url, schema, name, site_name])
+            results.append(SearchResult(url, schema, name, site_name, item.score, rank, item.vector))
 
         return results
     
     async def search(self, query: str, site: Union[str, List[str]], 
                    num_results: int = 50, collection_name: Optional[str] = None,
-                   query_params: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+                   query_params: Optional[Dict[str, Any]] = None,
+                   with_vectors: bool = False) -> List[SearchResult]:
         """
         Search the Qdrant collection for records filtered by site and ranked by vector similarity.
         
@@ -519,9 +560,10 @@ class QdrantVectorClient:
             num_results: Maximum number of results to return
             collection_name: Optional collection name (defaults to configured name)
             query_params: Additional query parameters
+            with_vectors: Also return each point's stored vector
             
         Returns:
-            List[List[str]]: List of search results in format [url, text_json, name, site]
+            List[SearchResult]: List of search results in format [url, text_json, name, site]
         """
         collection_name = collection_name or self.default_collection_name
         logger.info(f"Starting Qdrant search - collection: {collection_name}, site: {site}, num_results: {num_results}")
@@ -548,6 +590,7 @@ class QdrantVectorClient:
                         limit=num_results,
                         query_filter=filter_condition,
                         with_payload=True,
+                        with_vectors=with_vectors,
                     )
                 )
                 
@@ -594,7 +637,7 @@ class QdrantVectorClient:
                     self._qdrant_clients = {}
                     
                 # Try search again with new local client
-                return await self.search(query, site, num_results, collection_name, query_params)
+                return await self.search(query, site, num_results, collection_name, query_params, with_vectors)
             
             logger.log_with_context(
                 LogLevel.ERROR,
@@ -691,7 +734,8 @@ class QdrantVectorClient:
     
     async def search_all_sites(self, query: str, num_results: int = 50, 
                              collection_name: Optional[str] = None,
-                             query_params: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+                             query_params: Optional[Dict[str, Any]] = None,
+                             with_vectors: bool = False) -> List[SearchResult]:
         """
         Search across all sites using vector similarity.
         
@@ -700,9 +744,10 @@ class QdrantVectorClient:
             num_results: Maximum number of results to return
             collection_name: Optional collection name (defaults to configured name)
             query_params: Additional query parameters
+            with_vectors: Also return each point's stored vector
             
         Returns:
-            List[List[str]]: List of search results
+            List[SearchResult]: List of search results
         """
         # This is just a convenience wrapper around the regular search method with site="all"
-        return await self.search(query, "all", num_results, collection_name, query_params)
\ No newline at end of file
+        return await self.search(query, "all", num_results, collection_name, query_params, with_vectors)
\ No newline at end of file
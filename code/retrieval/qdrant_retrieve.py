@@ -14,6 +14,7 @@ import time
 import threading
 from llm.llm import get_embedding
 from config.config import CONFIG
+from retrieval.search_result import SearchResult
 from utils.logging_config_helper import get_configured_logger
 from utils.logger import LogLevel
 
@@ -102,16 +103,16 @@ def create_site_filter(site):
 
 
 def format_results(search_result):
-    """Format Qdrant search results to match expected API: [url, text_json, name, site]."""
+    """Format Qdrant search results to match expected API: [url, text_json, name, site], with score and rank."""
     results = []
-    for item in search_result:
+    for rank, item in enumerate(search_result):
         payload = item.payload
         url = payload.get("url", "")
         schema = payload.get("schema_json", "")
         name = payload.get("name", "")
         site_name = payload.get("site", "")
 
-        results.append([url, schema, name, site_name])
+        results.append(SearchResult(url, schema, name, site_name, item.score, rank))
 
     return results
 
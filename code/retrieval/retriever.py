@@ -2,7 +2,8 @@
 # Licensed under the MIT License
 
 """
-Unified vector database interface with support for Azure AI Search, Milvus, and Qdrant.
+Unified vector database interface with support for Azure AI Search, Milvus, Qdrant,
+Snowflake Cortex Search and the in-process local index.
 This module provides abstract base classes and concrete implementations for database operations.
 """
 
@@ -12,6 +13,7 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional, Union, Tuple, Type
 
 from config.config import CONFIG
+from utils import metrics, tracing
 from utils.utils import get_param
 from utils.logging_config_helper import get_configured_logger
 from utils.logger import LogLevel
@@ -20,14 +22,37 @@ from utils.logger import LogLevel
 from retrieval.azure_search_client import AzureSearchClient
 from retrieval.milvus_client import MilvusVectorClient
 from retrieval.qdrant import QdrantVectorClient
+from retrieval.local_index import LocalIndexClient
 from retrieval.snowflake_client import SnowflakeCortexSearchClient
+from retrieval.search_result import SearchResult, as_search_results
 
 logger = get_configured_logger("retriever")
 
+VECTOR_SEARCHES = metrics.counter("nlweb_vector_searches_total", "Vector database searches by outcome (ok, error)",
+                                  ("db_type", "outcome"))
+VECTOR_SEARCH_LATENCY = metrics.histogram("nlweb_vector_search_duration_seconds",
+                                          "Duration of vector database searches, including embedding the query",
+                                          ("db_type",))
+
 # Client cache for reusing instances
 _client_cache = {}
 _client_cache_lock = asyncio.Lock()
 
+# Per-endpoint concurrency control, shared by all VectorDBClient instances in the process.
+# Searches are bounded by a semaphore; writes (upload/delete) are serialized by a lock.
+# Each entry is (event_loop, primitive) so a new loop gets fresh primitives.
+_search_semaphores = {}
+_write_locks = {}
+
+
+def _get_endpoint_primitive(registry, endpoint_name, factory):
+    loop = asyncio.get_running_loop()
+    entry = registry.get(endpoint_name)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, factory())
+        registry[endpoint_name] = entry
+    return entry[1]
+
 
 class VectorDBClientInterface(ABC):
     """
@@ -65,7 +90,7 @@ class VectorDBClientInterface(ABC):
     
     @abstractmethod
     async def search(self, query: str, site: Union[str, List[str]], 
-                    num_results: int = 50, **kwargs) -> List[List[str]]:
+                    num_results: int = 50, **kwargs) -> List[SearchResult]:
         """
         Search for documents matching the query and site.
         
@@ -73,10 +98,10 @@ class VectorDBClientInterface(ABC):
             query: Search query string
             site: Site identifier or list of sites
             num_results: Maximum number of results to return
-            **kwargs: Additional parameters
+            **kwargs: Additional parameters, e.g. with_vectors to also return stored vectors
             
         Returns:
-            List of search results
+            List of search results, best first, carrying their similarity score and rank
         """
         pass
     
@@ -95,20 +120,34 @@ class VectorDBClientInterface(ABC):
         pass
     
     @abstractmethod
-    async def search_all_sites(self, query: str, num_results: int = 50, **kwargs) -> List[List[str]]:
+    async def search_all_sites(self, query: str, num_results: int = 50, **kwargs) -> List[SearchResult]:
         """
         Search across all sites.
         
         Args:
             query: Search query string
             num_results: Maximum number of results to return
-            **kwargs: Additional parameters
+            **kwargs: Additional parameters, e.g. with_vectors to also return stored vectors
             
         Returns:
-            List of search results
+            List of search results, best first, carrying their similarity score and rank
         """
         pass
 
+    async def delete_documents_by_url(self, urls: List[str], **kwargs) -> int:
+        """
+        Delete the documents with the given URLs. Optional: backends that do not
+        support it raise NotImplementedError.
+        
+        Args:
+            urls: URLs of the documents to delete
+            **kwargs: Additional parameters
+            
+        Returns:
+            Number of documents deleted
+        """
+        raise NotImplementedError
+
 
 class VectorDBClient:
     """
@@ -143,7 +182,7 @@ class VectorDBClient:
         # Get endpoint config and extract db_type
         self.endpoint_config = CONFIG.retrieval_endpoints[self.endpoint_name]
         self.db_type = self.endpoint_config.db_type
-        self._retrieval_lock = asyncio.Lock()
+        self.max_concurrency = max(1, self.endpoint_config.max_concurrency or 1)
         
         logger.info(f"VectorDBClient initialized - endpoint: {self.endpoint_name}, db_type: {self.db_type}")
     
@@ -172,6 +211,8 @@ class VectorDBClient:
                 client = MilvusVectorClient(self.endpoint_name)
             elif self.db_type == "qdrant":
                 client = QdrantVectorClient(self.endpoint_name)
+            elif self.db_type == "local_index":
+                client = LocalIndexClient(self.endpoint_name)
             elif self.db_type == "snowflake_cortex_search":
                 client = SnowflakeCortexSearchClient(self.endpoint_name)
             else:
@@ -182,6 +223,15 @@ class VectorDBClient:
             # Store in cache and return
             _client_cache[cache_key] = client
             return client
+
+    def _search_semaphore(self) -> asyncio.Semaphore:
+        """Bounded semaphore limiting concurrent searches against this endpoint."""
+        return _get_endpoint_primitive(_search_semaphores, self.endpoint_name,
+                                       lambda: asyncio.BoundedSemaphore(self.max_concurrency))
+
+    def _write_lock(self) -> asyncio.Lock:
+        """Lock serializing writes (uploads and deletes) to this endpoint."""
+        return _get_endpoint_primitive(_write_locks, self.endpoint_name, asyncio.Lock)
     
     async def delete_documents_by_site(self, site: str, **kwargs) -> int:
         """
@@ -194,7 +244,7 @@ class VectorDBClient:
         Returns:
             Number of documents deleted
         """
-        async with self._retrieval_lock:
+        async with self._write_lock():
             logger.info(f"Deleting documents for site: {site}")
             
             try:
@@ -217,6 +267,47 @@ class VectorDBClient:
                 )
                 raise
     
+    async def delete_documents_by_url(self, urls: List[str], **kwargs) -> int:
+        """
+        Delete the documents with the given URLs.
+        
+        Args:
+            urls: URLs of the documents to delete
+            **kwargs: Additional parameters
+            
+        Returns:
+            Number of documents deleted
+            
+        Raises:
+            NotImplementedError: If the backend cannot delete by URL
+        """
+        async with self._write_lock():
+            logger.info(f"Deleting {len(urls)} documents by URL")
+            
+            try:
+                client = await self.get_client()
+                if not hasattr(client, "delete_documents_by_url"):
+                    raise NotImplementedError(f"{self.db_type} does not support deleting documents by URL")
+                count = await client.delete_documents_by_url(urls, **kwargs)
+                logger.info(f"Successfully deleted {count} documents by URL")
+                return count
+            except NotImplementedError:
+                raise
+            except Exception as e:
+                logger.exception(f"Error deleting documents by URL: {e}")
+                logger.log_with_context(
+                    LogLevel.ERROR,
+                    "Document deletion by URL failed",
+                    {
+                        "error_type": type(e).__name__,
+                        "error_message": str(e),
+                        "url_count": len(urls),
+                        "db_type": self.db_type,
+                        "endpoint": self.endpoint_name
+                    }
+                )
+                raise
+    
     async def upload_documents(self, documents: List[Dict[str, Any]], **kwargs) -> int:
         """
         Upload documents to the database.
@@ -228,7 +319,7 @@ class VectorDBClient:
         Returns:
             Number of documents uploaded
         """
-        async with self._retrieval_lock:
+        async with self._write_lock():
             logger.info(f"Uploading {len(documents)} documents")
             
             try:
@@ -252,7 +343,8 @@ class VectorDBClient:
                 raise
     
     async def search(self, query: str, site: Union[str, List[str]], 
-                    num_results: int = 50, endpoint_name: Optional[str] = None, **kwargs) -> List[List[str]]:
+                    num_results: int = 50, endpoint_name: Optional[str] = None,
+                    with_vectors: bool = False, **kwargs) -> List[SearchResult]:
         """
         Search for documents matching the query and site.
         
@@ -261,11 +353,15 @@ class VectorDBClient:
             site: Site identifier or list of sites
             num_results: Maximum number of results to return
             endpoint_name: Optional endpoint name override
+            with_vectors: Also return the items' stored vectors, where the backend can
             **kwargs: Additional parameters
             
         Returns:
-            List of search results
+            List of search results. Each is an [url, schema_json, name, site] list that
+            also carries the backend's similarity score and its rank (see SearchResult).
         """
+        if with_vectors:
+            kwargs["with_vectors"] = True
 
         if (site == "all"):
             sites = CONFIG.nlweb.sites
@@ -286,16 +382,20 @@ class VectorDBClient:
         elif isinstance(site, str):
             site = site.replace(" ", "_")
 
-        async with self._retrieval_lock:
+        async with self._search_semaphore():
             logger.info(f"Searching for '{query[:50]}...' in site: {site}, num_results: {num_results}")
             start_time = time.time()
             
             try:
                 client = await self.get_client()
-                results = await client.search(query, site, num_results, **kwargs)
+                with tracing.span("vector_search", db_type=self.db_type, site=str(site)) as search_span:
+                    results = as_search_results(await client.search(query, site, num_results, **kwargs))
+                    search_span.set(results=len(results))
                 
                 end_time = time.time()
                 search_duration = end_time - start_time
+                VECTOR_SEARCHES.labels(self.db_type, "ok").inc()
+                VECTOR_SEARCH_LATENCY.labels(self.db_type).observe(search_duration)
                 
                 logger.log_with_context(
                     LogLevel.INFO,
@@ -309,6 +409,7 @@ class VectorDBClient:
                 )
                 return results
             except Exception as e:
+                VECTOR_SEARCHES.labels(self.db_type, "error").inc()
                 logger.exception(f"Error in search: {e}")
                 logger.log_with_context(
                     LogLevel.ERROR,
@@ -341,7 +442,7 @@ class VectorDBClient:
             temp_client = VectorDBClient(endpoint_name=endpoint_name)
             return await temp_client.search_by_url(url, **kwargs)
         
-        async with self._retrieval_lock:
+        async with self._search_semaphore():
             logger.info(f"Retrieving item with URL: {url}")
             
             try:
@@ -370,7 +471,8 @@ class VectorDBClient:
                 raise
     
     async def search_all_sites(self, query: str, num_results: int = 50, 
-                             endpoint_name: Optional[str] = None, **kwargs) -> List[List[str]]:
+                             endpoint_name: Optional[str] = None,
+                             with_vectors: bool = False, **kwargs) -> List[SearchResult]:
         """
         Search across all sites.
         
@@ -378,26 +480,33 @@ class VectorDBClient:
             query: Search query string
             num_results: Maximum number of results to return
             endpoint_name: Optional endpoint name override
+            with_vectors: Also return the items' stored vectors, where the backend can
             **kwargs: Additional parameters
             
         Returns:
-            List of search results
+            List of search results, carrying their similarity score and rank
         """
+        if with_vectors:
+            kwargs["with_vectors"] = True
         # If endpoint is specified, create a new client for that endpoint
         if endpoint_name and endpoint_name != self.endpoint_name:
             temp_client = VectorDBClient(endpoint_name=endpoint_name)
             return await temp_client.search_all_sites(query, num_results, **kwargs)
         
-        async with self._retrieval_lock:
+        async with self._search_semaphore():
             logger.info(f"Searching across all sites for '{query[:50]}...', num_results: {num_results}")
             start_time = time.time()
             
             try:
                 client = await self.get_client()
-                results = await client.search_all_sites(query, num_results, **kwargs)
+                with tracing.span("vector_search", db_type=self.db_type, site="all") as search_span:
+                    results = as_search_results(await client.search_all_sites(query, num_results, **kwargs))
+                    search_span.set(results=len(results))
                 
                 end_time = time.time()
                 search_duration = end_time - start_time
+                VECTOR_SEARCHES.labels(self.db_type, "ok").inc()
+                VECTOR_SEARCH_LATENCY.labels(self.db_type).observe(search_duration)
                 
                 logger.log_with_context(
                     LogLevel.INFO,
@@ -410,6 +519,7 @@ class VectorDBClient:
                 )
                 return results
             except Exception as e:
+                VECTOR_SEARCHES.labels(self.db_type, "error").inc()
                 logger.exception(f"Error in search_all_sites: {e}")
                 logger.log_with_context(
                     LogLevel.ERROR,
@@ -0,0 +1,64 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Row returned by the vector database backends' searches. A SearchResult is the
+usual [url, schema_json, name, site] list, so existing code that indexes or
+unpacks results is unaffected, and also carries what the backend knew about
+the match:
+
+    score   similarity of the item to the query as reported by the backend,
+            higher is more similar (cosine similarity for the local index and
+            Qdrant; for Milvus the hit distance of COSINE and IP indexes, the
+            negated distance of L2 indexes and None for other metrics;
+            @search.score for Azure AI Search; cosine_similarity for Snowflake
+            Cortex Search)
+    rank    0-based position of the item in the backend's result list
+    vector  the item's stored embedding, only when the search was made with
+            with_vectors=True and the backend can return it
+
+Scores are only comparable between results of the same backend and index.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+from typing import List, Optional, Sequence
+
+
+class SearchResult(list):
+    __slots__ = ("score", "rank", "vector")
+
+    def __init__(self, url: str, schema_json: str, name: str, site: str,
+                 score: Optional[float] = None, rank: Optional[int] = None,
+                 vector: Optional[Sequence[float]] = None):
+        super().__init__((url, schema_json, name, site))
+        self.score = score
+        self.rank = rank
+        self.vector = vector
+
+    def __reduce__(self):
+        return (SearchResult, tuple(self) + (self.score, self.rank, self.vector))
+
+    def __repr__(self):
+        return f"SearchResult({list.__repr__(self)}, score={self.score}, rank={self.rank})"
+
+
+def result_score(item: List[str]) -> Optional[float]:
+    """The backend score of a retrieved item, or None for a plain [url, schema_json, name, site] list."""
+    return getattr(item, "score", None)
+
+
+def as_search_results(results: List[List[str]]) -> List[SearchResult]:
+    """
+    `results` as SearchResults, in order. Plain lists, from backends that report no
+    score, are converted; results without a rank are given their position.
+    """
+    converted = []
+    for rank, result in enumerate(results):
+        if not isinstance(result, SearchResult):
+            result = SearchResult(*result[:4], rank=rank)
+        elif result.rank is None:
+            result.rank = rank
+        converted.append(result)
+    return converted
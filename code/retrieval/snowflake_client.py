@@ -1,12 +1,14 @@
 import httpx
 import json
 from config.config import CONFIG, RetrievalProviderConfig
+from retrieval.search_result import SearchResult
 from typing import Any, Dict, List, Optional, Tuple, Union
 from utils import snowflake
 
 class SnowflakeCortexSearchClient:
     """
     Adapts the Snowflake Cortex Search API to the VectorDBClientInterface.
+    Cortex Search does not return the stored vectors, so with_vectors is ignored.
 
     See: https://docs.snowflake.com/en/user-guide/snowflake-cortex/cortex-search/query-cortex-search-service#rest-api
     """
@@ -89,14 +91,15 @@ async def search(query: str, site: str|List[str]|None=None, url: str|None=None,
             raise Exception(response.json())
         response.raise_for_status()
         results = response.json().get("results", [])
-        return list(map(_process_result, results))
+        return [_process_result(r, rank) for rank, r in enumerate(results)]
 
-def _process_result(r: Dict[str, str]) -> List[str]:
+def _process_result(r: Dict[str, Any], rank: int | None = None) -> SearchResult:
     url = r.get("url", "")
     schema_json = r.get("schema_json", "{}")
     name = _name_from_schema_json(schema_json)
     site = r.get("site", "")
-    return [url, schema_json, name, site]
+    score = (r.get("@scores") or {}).get("cosine_similarity")
+    return SearchResult(url, schema_json, name, site, score, rank)
 
 def _name_from_schema_json(schema_json: str) -> str:
     try:
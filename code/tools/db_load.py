@@ -8,6 +8,7 @@ Now with support for CSV files, URLs, and RSS feeds.
 
 import asyncio
 import csv
+import itertools
 import json
 import os
 import sys
@@ -18,7 +19,6 @@ from urllib.parse import urlparse
 
 import aiohttp
 from config.config import CONFIG
-from embedding.embedding import batch_get_embeddings
 
 # Import vector database client directly
 from retrieval.retriever import get_vector_db_client
@@ -30,6 +30,8 @@ from tools.db_load_utils import (
     prepare_documents_from_json,
     read_file_lines,
 )
+from tools.ingest_manifest import PRECOMPUTED_MODEL, IngestManifest, source_id
+from tools.ingest_pipeline import Checkpoint, IngestPipeline, iter_file_lines
 
 
 # Define URL extractor function since json_url_extractor module is not available
@@ -127,6 +129,9 @@ async def delete_site_from_database(site: str, database: str = None):
     # Use the client's delete_documents_by_site method
     deleted_count = await client.delete_documents_by_site(site)
 
+    # Nothing of the site is loaded any more, so the next load starts from scratch
+    IngestManifest(endpoint_name, site).clear()
+
     print(f"Deleted {deleted_count} documents for site '{site}'")
     return deleted_count
 
@@ -634,6 +639,8 @@ async def loadJsonWithEmbeddingsToDB(
     batch_size: int = 100,
     delete_existing: bool = False,
     database: str = None,
+    remove_missing: bool = False,
+    source: str = None,
 ):
     """
     Load data from a file with precomputed embeddings into the database.
@@ -649,7 +656,11 @@ async def loadJsonWithEmbeddingsToDB(
         batch_size: Number of documents to process and upload in each batch
         delete_existing: Whether to delete existing entries for this site before loading
         database: Specific database endpoint to use (if None, uses preferred endpoint)
+        remove_missing: Whether documents previously loaded from this file that are no longer in it are deleted
+        source: Input the documents are attributed to in the manifest (defaults to file_path)
     """
+    source = source or source_id(file_path)
+
     # Check if this is a URL
     is_url_path = await is_url(file_path)
     temp_path = None
@@ -707,50 +718,39 @@ async def loadJsonWithEmbeddingsToDB(
         if not os.path.exists(resolved_path):
             raise FileNotFoundError(f"File not found: {resolved_path}")
 
-        # Delete existing entries for this site if requested
-        if delete_existing:
+        # Resume a previous interrupted load of this file, if any
+        checkpoint = Checkpoint(resolved_path, site)
+        resuming = checkpoint.load()
+        if resuming:
+            print(
+                f"Resuming after line {checkpoint.line} ({checkpoint.documents} documents already loaded). "
+                f"Delete {checkpoint.path} to start over."
+            )
+        elif delete_existing:
+            # Delete existing entries for this site if requested
             await delete_site_from_database(site, endpoint_name)
 
-        # Read all lines from the file
-        lines = await read_file_lines(resolved_path)
-        total_lines = len(lines)
-
-        print(f"Found {total_lines} lines in the file")
-
         # Get client for the specified retrieval endpoint
         client = get_vector_db_client(endpoint_name)
 
-        # Process lines in batches
-        batch_documents = []
-        total_documents = 0
-
-        for i, line in enumerate(lines):
-            try:
-                # Use documents_from_csv_line utility to process the line
-                documents = documents_from_csv_line(line, site)
-                batch_documents.extend(documents)
-
-                # When batch is full or we've reached the end, upload to database
-                if len(batch_documents) >= batch_size or i == total_lines - 1:
-                    if batch_documents:
-                        batch_idx = i // batch_size
-                        total_batches = (total_lines + batch_size - 1) // batch_size
-
-                        # Upload directly using the client interface
-                        print(
-                            f"Uploading batch {batch_idx + 1} of {total_batches} ({len(batch_documents)} documents)"
-                        )
-                        await client.upload_documents(batch_documents)
-                        print(f"Successfully uploaded batch {batch_idx + 1}")
-
-                        total_documents += len(batch_documents)
-                        batch_documents = []
-            except Exception as e:
-                print(f"Error processing line {i + 1}: {str(e)}")
-
-            # Print progress
-            if (i + 1) % 1000 == 0 or i == total_lines - 1:
-                print(f"Processed {i + 1}/{total_lines} lines")
+        # Stream lines through parse -> upload; the file is never held in memory.
+        # Documents unchanged since the last load of this site are skipped.
+        pipeline = IngestPipeline(
+            client,
+            batch_size,
+            embed=False,
+            checkpoint=checkpoint,
+            manifest=IngestManifest(endpoint_name, site, source=source),
+            model_tag=PRECOMPUTED_MODEL,
+        )
+        total_documents = await pipeline.run(
+            iter_file_lines(resolved_path, checkpoint.line),
+            lambda line: documents_from_csv_line(line, site),
+        )
+        if remove_missing:
+            await pipeline.remove_missing()
+        if pipeline.failed_batches == 0:
+            checkpoint.clear()
 
         print(f"Loading completed. Added {total_documents} documents to the database.")
         return total_documents
@@ -771,6 +771,8 @@ async def loadJsonToDB(
     delete_existing: bool = False,
     force_recompute: bool = False,
     database: str = None,
+    remove_missing: bool = False,
+    source: str = None,
 ):
     """
     Load data from a file, compute embeddings, and store in the database.
@@ -789,6 +791,8 @@ async def loadJsonToDB(
         delete_existing: Whether to delete existing entries for this site before loading
         force_recompute: Whether to force recomputation of embeddings
         database: Specific database endpoint to use (if None, uses preferred endpoint)
+        remove_missing: Whether documents previously loaded from this file that are no longer in it are deleted
+        source: Input the documents are attributed to in the manifest (defaults to file_path)
     """
     # Check if this is a URL
     is_url_path = await is_url(file_path)
@@ -800,6 +804,7 @@ async def loadJsonToDB(
         file_path = temp_path
     else:
         original_path = file_path  # Use original path for non-URLs
+    source = source or source_id(original_path)
 
     try:
         # First, check if the file exists at the given path
@@ -833,13 +838,22 @@ async def loadJsonToDB(
                 "File already contains embeddings, switching to direct loading mode..."
             )
             return await loadJsonWithEmbeddingsToDB(
-                resolved_path, site, batch_size, delete_existing, endpoint_name
+                resolved_path, site, batch_size, delete_existing, endpoint_name, remove_missing, source
             )
 
+        # Documents whose content and embedding model are unchanged since the last load
+        # are not re-embedded, unless recomputation is forced
+        manifest = IngestManifest(endpoint_name, site, source=source)
+        incremental = not force_recompute and not delete_existing and manifest.count() > 0
+
         # Check for existing embeddings file if not forcing recomputation
         embeddings_path = get_embeddings_file_path(os.path.basename(original_path))
 
-        if os.path.exists(embeddings_path) and not force_recompute:
+        if incremental and os.path.exists(embeddings_path):
+            # Incremental loads do not rewrite the file, so it only reflects the first full
+            # load; the input itself is compared against the manifest instead
+            print(f"Site '{site}' was loaded before, not using the possibly outdated {embeddings_path}")
+        elif os.path.exists(embeddings_path) and not force_recompute:
             # In interactive mode, ask the user what to do
             if sys.stdin.isatty():
                 response = input(
@@ -854,15 +868,11 @@ async def loadJsonToDB(
             if use_existing:
                 # Use the existing file with embeddings
                 return await loadJsonWithEmbeddingsToDB(
-                    embeddings_path, site, batch_size, delete_existing, endpoint_name
+                    embeddings_path, site, batch_size, delete_existing, endpoint_name, remove_missing, source
                 )
 
         # If we get here, we need to process the file based on its type and compute embeddings
 
-        # Delete existing entries for this site if requested
-        if delete_existing:
-            await delete_site_from_database(site, endpoint_name)
-
         # Get client for the specified retrieval endpoint - using the new interface directly
         client = get_vector_db_client(endpoint_name)
 
@@ -873,9 +883,6 @@ async def loadJsonToDB(
 
         print(f"Using embedding provider: {provider}, model: {model}")
 
-        # Initialize documents list
-        all_documents = []
-
         # IMPORTANT FIX:
         # For XML files with RSS-like content, force it to be processed as RSS
         # even if it wasn't explicitly detected as RSS
@@ -894,10 +901,16 @@ async def loadJsonToDB(
             )
             file_type = "rss"
 
-        # Process based on file type
+        # Every input is read as `items`, a stream of (line_number, item), with a parser turning an item into documents.
+        # Only line-oriented JSON files are checkpointed; CSV and RSS inputs are parsed up front.
+        checkpoint = None
         if file_type == "csv":
             # Process standard CSV file
             all_documents = await process_csv_file(resolved_path, site)
+            items = enumerate(all_documents, start=1)
+
+            def parse(doc):
+                return [doc]
         elif file_type == "rss" or (
             file_type == "xml"
             and ("/feed" in original_path.lower() or "/rss" in original_path.lower())
@@ -905,19 +918,22 @@ async def loadJsonToDB(
             # Process RSS/Atom feed
             print("Processing as RSS feed...")
             all_documents = await process_rss_feed(resolved_path, site)
-        else:
-            # Default to JSON processing
-            # Read all lines from the file
-            lines = await read_file_lines(resolved_path)
-            total_lines = len(lines)
+            items = enumerate(all_documents, start=1)
 
-            print(f"Found {total_lines} lines in the file")
+            def parse(doc):
+                return [doc]
+        else:
+            # Default to JSON processing, streaming the file line by line
+            checkpoint = Checkpoint(resolved_path, site)
+            if checkpoint.load():
+                print(
+                    f"Resuming after line {checkpoint.line} ({checkpoint.documents} documents already loaded). "
+                    f"Delete {checkpoint.path} to start over."
+                )
 
             # Check the first few lines to detect if this is a JSON-only file
-            sample_lines = lines[: min(5, len(lines))]
             json_only_format = True
-
-            for line in sample_lines:
+            for _, line in itertools.islice(iter_file_lines(resolved_path), 5):
                 parts = line.strip().split("\t")
                 if len(parts) >= 2:
                     json_only_format = False
@@ -928,109 +944,67 @@ async def loadJsonToDB(
                     "Detected JSON-only format. URLs will be extracted from within the JSON data."
                 )
 
-            # Process each line to extract documents
-            for line in lines:
-                try:
-                    # Process the line, handling JSON-only format if needed
-                    url, json_data = process_line(line)
+            def parse(line):
+                # Process the line, handling JSON-only format if needed
+                url, json_data = process_line(line)
+                if url is None or json_data is None:
+                    return []
+                documents, _ = prepare_documents_from_json(url, json_data, site)
+                return documents
 
-                    if url is None or json_data is None:
-                        continue
-
-                    # Prepare documents
-                    documents, _ = prepare_documents_from_json(url, json_data, site)
-                    all_documents.extend(documents)
-                except Exception as e:
-                    print(f"Error processing line: {str(e)}")
-                    continue
+            items = iter_file_lines(resolved_path, checkpoint.line)
 
-        # If we have documents to process
-        if all_documents:
-            # Ensure the directory exists for the embeddings file
-            os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
+        resuming = checkpoint is not None and checkpoint.line > 0
 
-            # Open file to write documents with embeddings
-            with open(embeddings_path, "w", encoding="utf-8") as embed_file:
-                # Extract texts for embedding
-                texts = [doc["schema_json"] for doc in all_documents]
-
-                # Process in batches
-                total_documents = 0
-
-                for i in range(0, len(all_documents), batch_size):
-                    batch_docs = all_documents[i : i + batch_size]
-                    batch_texts = texts[i : i + batch_size]
-
-                    if batch_docs and batch_texts:
-                        try:
-                            print(
-                                f"Computing embeddings for batch of {len(batch_texts)} texts"
-                            )
-
-                            # Compute embeddings for the batch
-                            embeddings = await batch_get_embeddings(
-                                batch_texts, provider, model
-                            )
-
-                            # Add embeddings to documents
-                            docs_with_embeddings = []
-
-                            for j, embedding in enumerate(embeddings):
-                                if j < len(batch_docs):
-                                    doc = batch_docs[
-                                        j
-                                    ].copy()  # Create a copy of the document
-
-                                    # Add embedding to document
-                                    doc["embedding"] = embedding
-
-                                    # Format embedding as string - ensure no newlines
-                                    embedding_str = (
-                                        str(embedding)
-                                        .replace(" ", "")
-                                        .replace("\n", "")
-                                    )
-
-                                    # Ensure JSON has no newlines
-                                    doc_json = doc["schema_json"].replace("\n", " ")
-
-                                    # Write to embeddings file
-                                    embed_file.write(
-                                        f"{doc['url']}\t{doc_json}\t{embedding_str}\n"
-                                    )
-
-                                    docs_with_embeddings.append(doc)
-
-                            # Upload batch using the client directly
-                            batch_idx = i // batch_size
-                            total_batches = (
-                                len(all_documents) + batch_size - 1
-                            ) // batch_size
+        # Delete existing entries for this site if requested (not when resuming a partial load)
+        if delete_existing and not resuming:
+            await delete_site_from_database(site, endpoint_name)
 
-                            print(
-                                f"Uploading batch {batch_idx + 1} of {total_batches} ({len(docs_with_embeddings)} documents)"
-                            )
-                            await client.upload_documents(docs_with_embeddings)
-                            print(f"Successfully uploaded batch {batch_idx + 1}")
+        if incremental:
+            print(
+                f"Found {manifest.count()} previously loaded documents for site '{site}', "
+                "only new and changed documents will be embedded"
+            )
 
-                            total_documents += len(docs_with_embeddings)
-                        except Exception as e:
-                            print(f"Error processing batch: {str(e)}")
-                            traceback.print_exc()
+        # Ensure the directory exists for the embeddings file
+        os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
+
+        # Open file to write documents with embeddings; a resumed load appends to it.
+        # An incremental load only sees the changed documents, so it does not write the file.
+        with open(
+            os.devnull if incremental else embeddings_path,
+            "a" if resuming else "w",
+            encoding="utf-8",
+        ) as embed_file:
+            pipeline = IngestPipeline(
+                client,
+                batch_size,
+                embed=True,
+                provider=provider,
+                model=model,
+                embeddings_file=embed_file,
+                checkpoint=checkpoint,
+                manifest=manifest,
+                model_tag=f"{provider}/{model}",
+                skip_unchanged=not force_recompute,
+            )
+            total_documents = await pipeline.run(items, parse)
 
-                    # Print progress
-                    print(
-                        f"Processed {min(i + batch_size, len(all_documents))}/{len(all_documents)} documents"
-                    )
+        if remove_missing:
+            await pipeline.remove_missing()
+        if checkpoint is not None and pipeline.failed_batches == 0:
+            checkpoint.clear()
 
-            print(
-                f"Loading completed. Added {total_documents} documents to the database."
-            )
-            print(f"Saved file with embeddings to {embeddings_path}")
-            return total_documents
-        else:
+        if total_documents == 0 and pipeline.unchanged_documents == 0:
             print("No documents were extracted from the file.")
             return 0
+
+        print(
+            f"Loading completed. Added {total_documents} documents to the database."
+        )
+        if not incremental:
+            print(f"Saved file with embeddings to {embeddings_path}")
+        return total_documents
     finally:
         # Clean up temporary file if needed
         if temp_path and os.path.exists(temp_path):
@@ -1145,37 +1119,13 @@ async def loadUrlListToDB(
                             provider_config = CONFIG.get_embedding_provider(provider)
                             model = provider_config.model if provider_config else None
 
-                            # Process in batches
-                            for j in range(0, len(docs), batch_size):
-                                batch_docs = docs[j : j + batch_size]
-                                batch_texts = [doc["schema_json"] for doc in batch_docs]
-
-                                # Compute embeddings
-                                embeddings = await batch_get_embeddings(
-                                    batch_texts, provider, model
-                                )
-
-                                # Add embeddings to documents
-                                docs_with_embeddings = []
-                                for k, embedding in enumerate(embeddings):
-                                    if k < len(batch_docs):
-                                        doc = batch_docs[k].copy()
-                                        doc["embedding"] = embedding
-                                        docs_with_embeddings.append(doc)
-
-                                # Upload batch directly with client
-                                batch_idx = j // batch_size
-                                total_batches = (
-                                    len(docs) + batch_size - 1
-                                ) // batch_size
-
-                                print(
-                                    f"Uploading batch {batch_idx + 1} of {total_batches} ({len(docs_with_embeddings)} documents)"
-                                )
-                                await client.upload_documents(docs_with_embeddings)
-                                print(f"Successfully uploaded batch {batch_idx + 1}")
-
-                                doc_count += len(docs_with_embeddings)
+                            # Embed and upload in concurrent batches
+                            pipeline = IngestPipeline(
+                                client, batch_size, embed=True, provider=provider, model=model
+                            )
+                            doc_count = await pipeline.run(
+                                enumerate(docs, start=1), lambda doc: [doc]
+                            )
                     elif file_type == "json":
                         # Process as JSON
                         # For each JSON file, we'll process it and add to the database
@@ -1186,6 +1136,7 @@ async def loadUrlListToDB(
                             False,
                             force_recompute,
                             endpoint_name,
+                            remove_missing=False,
                         )
                     else:
                         print(
@@ -1248,6 +1199,7 @@ async def main():
         python db_loader.py --delete-site site_name
         python db_loader.py file.txt site_name --database qdrant_local
         python db_loader.py --force-recompute file.txt site_name
+        python db_loader.py --remove-missing file.txt site_name
         python db_loader.py --url-list urls.txt site_name
         python db_loader.py --url-list https://example.com/feed_list.txt site_name
     """
@@ -1269,6 +1221,11 @@ async def main():
         action="store_true",
         help="Force recomputation of embeddings even if a file with embeddings exists",
     )
+    parser.add_argument(
+        "--remove-missing",
+        action="store_true",
+        help="Delete documents previously loaded from this file that are no longer in it",
+    )
     parser.add_argument(
         "--url-list",
         action="store_true",
@@ -1282,6 +1239,12 @@ async def main():
         default=100,
         help="Batch size for processing and uploading",
     )
+    parser.add_argument(
+        "--embedding-concurrency",
+        type=int,
+        default=None,
+        help="Embedding batches computed concurrently (overrides loader.concurrency in config_embedding.yaml)",
+    )
     parser.add_argument(
         "--database",
         type=str,
@@ -1297,6 +1260,9 @@ async def main():
             f"Database endpoint '{args.database}' not found in configuration. Available options: {', '.join(CONFIG.retrieval_endpoints.keys())}"
         )
 
+    if args.embedding_concurrency:
+        CONFIG.embedding_loader.concurrency = args.embedding_concurrency
+
     # Handle delete-only mode
     if args.only_delete:
         await delete_site(args.site, args.database)
@@ -1359,6 +1325,8 @@ async def main():
                     args.batch_size,
                     args.delete_site,
                     args.database,
+                    args.remove_missing,
+                    source_id(args.file_path),
                 )
             else:
                 print("Computing embeddings for file...")
@@ -1369,6 +1337,8 @@ async def main():
                     args.delete_site,
                     args.force_recompute,
                     args.database,
+                    args.remove_missing,
+                    source_id(args.file_path),
                 )
         else:
             print(f"Error: File not found at '{file_path}'")
@@ -5,6 +5,7 @@ Includes functions for document creation, transformation, and database operation
 
 import os
 import json
+import hashlib
 import asyncio
 import numpy as np
 from typing import List, Dict, Any, Optional, Tuple, Union
@@ -57,6 +58,8 @@ async def read_file_lines(file_path: str) -> List[str]:
 def int64_hash(string):
     """
     Compute a hash value for a string, ensuring it fits within int64 range.
+    The value is derived from SHA-256, so it is the same in every process
+    (Python's built-in hash() is randomized per process).
     
     Args:
         string: The string to hash
@@ -64,8 +67,8 @@ def int64_hash(string):
     Returns:
         int64 hash value
     """
-    hash_value = hash(string)
-    return np.int64(hash_value)
+    digest = hashlib.sha256(string.encode("utf-8")).digest()
+    return np.int64(int.from_bytes(digest[:8], "big", signed=True))
 
 def should_include_item(js):
     """
@@ -0,0 +1,146 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Per-site manifest of what db_load has put into each retrieval endpoint: one row
+per document URL with the hash of its content, the embedding model used and the
+input file (or URL) it was last loaded from. On a re-load, documents whose hash
+and model are unchanged are skipped, and, when asked to, documents that came from
+the same input but are missing from its new version are deleted from the database.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import hashlib
+import os
+import sqlite3
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.config import CONFIG
+
+# Embedding "model" recorded for documents loaded from files with precomputed embeddings
+PRECOMPUTED_MODEL = "precomputed"
+
+# SQLite limits the number of bound parameters, so look up URLs in chunks
+_CHUNK = 500
+
+
+def content_hash(schema_json: str) -> str:
+    return hashlib.sha256(schema_json.encode("utf-8")).hexdigest()
+
+
+def default_manifest_path() -> str:
+    return os.path.join(os.path.dirname(CONFIG.nlweb.json_with_embeddings_folder), "ingest_manifest.db")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def source_id(file_path: str) -> str:
+    """How an input is identified in the manifest: URLs as they are, files by absolute path."""
+    if "://" in file_path:
+        return file_path
+    return os.path.abspath(file_path)
+
+
+class IngestManifest:
+    """
+    Manifest rows for one (endpoint, site) pair. Documents recorded through it are
+    attributed to `source`, and only documents of that source are candidates for removal.
+    """
+
+    def __init__(self, endpoint_name: str, site: str, path: Optional[str] = None, source: str = ""):
+        self.endpoint_name = endpoint_name
+        self.site = site
+        self.source = source
+        self.path = path or default_manifest_path()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            "endpoint TEXT NOT NULL, site TEXT NOT NULL, url TEXT NOT NULL, "
+            "content_hash TEXT NOT NULL, model TEXT NOT NULL, run_id TEXT NOT NULL, "
+            "PRIMARY KEY (endpoint, site, url))"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(manifest)")]
+        if "source" not in columns:
+            # Manifests written before sources were recorded; their rows are never removed
+            self._conn.execute("ALTER TABLE manifest ADD COLUMN source TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    def count(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM manifest WHERE endpoint = ? AND site = ?",
+            (self.endpoint_name, self.site)
+        ).fetchone()[0]
+
+    def split_unchanged(self, documents: List[Dict[str, Any]], model: str
+                        ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Split documents into (changed or new documents, urls of unchanged documents)."""
+        known = {}
+        urls = [doc["url"] for doc in documents]
+        for start in range(0, len(urls), _CHUNK):
+            chunk = urls[start:start + _CHUNK]
+            rows = self._conn.execute(
+                f"SELECT url, content_hash, model FROM manifest WHERE endpoint = ? AND site = ? "
+                f"AND url IN ({','.join('?' * len(chunk))})",
+                [self.endpoint_name, self.site, *chunk]
+            )
+            known.update((url, (digest, row_model)) for url, digest, row_model in rows)
+
+        changed, unchanged = [], []
+        for doc in documents:
+            if known.get(doc["url"]) == (content_hash(doc["schema_json"]), model):
+                unchanged.append(doc["url"])
+            else:
+                changed.append(doc)
+        return changed, unchanged
+
+    def mark_seen(self, urls: List[str], run_id: str):
+        """Record that unchanged documents are still present in the input of this run."""
+        self._conn.executemany(
+            "UPDATE manifest SET run_id = ?, source = ? WHERE endpoint = ? AND site = ? AND url = ?",
+            [(run_id, self.source, self.endpoint_name, self.site, url) for url in urls]
+        )
+        self._conn.commit()
+
+    def record(self, documents: List[Dict[str, Any]], model: str, run_id: str):
+        """Record documents that have been uploaded in this run."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO manifest (endpoint, site, url, content_hash, model, run_id, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(self.endpoint_name, self.site, doc["url"], content_hash(doc["schema_json"]), model, run_id,
+              self.source)
+             for doc in documents]
+        )
+        self._conn.commit()
+
+    def removed_urls(self, run_id: str) -> List[str]:
+        """Urls of documents last loaded from this manifest's source that were not seen in this run."""
+        if not self.source:
+            return []
+        rows = self._conn.execute(
+            "SELECT url FROM manifest WHERE endpoint = ? AND site = ? AND source = ? AND run_id != ?",
+            (self.endpoint_name, self.site, self.source, run_id)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def forget(self, urls: List[str]):
+        self._conn.executemany(
+            "DELETE FROM manifest WHERE endpoint = ? AND site = ? AND url = ?",
+            [(self.endpoint_name, self.site, url) for url in urls]
+        )
+        self._conn.commit()
+
+    def clear(self):
+        """Forget every document of the site, e.g. after the site was deleted from the database."""
+        self._conn.execute("DELETE FROM manifest WHERE endpoint = ? AND site = ?",
+                           (self.endpoint_name, self.site))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,363 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Streaming ingestion pipeline used by db_load. Input lines flow through
+read -> parse/trim -> embed -> upload stages connected by bounded queues, so at
+most a few batches are held in memory at any time, whatever the input size.
+
+Progress is checkpointed after every uploaded batch as the number of input lines
+whose documents are all in the database. A failed batch stops the checkpoint from
+advancing, so re-running the same load resumes at the first line not known to be
+loaded (uploads are keyed on URL, so repeating later batches is harmless).
+
+With an IngestManifest, documents whose content and embedding model are unchanged
+since the last load are skipped, and once the whole input has been loaded,
+remove_missing() deletes the documents previously loaded from the same input
+that are no longer in it.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import codecs
+import json
+import os
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from config.config import CONFIG
+from embedding.embedding import batch_get_embeddings
+from llm.scheduler import TokenBucket, estimate_tokens
+from tools.ingest_manifest import IngestManifest, new_run_id
+
+# Batches waiting between two stages
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+def detect_file_encoding(file_path: str, encodings=("utf-8", "latin-1", "utf-16")) -> str:
+    """Return the first encoding that decodes the whole file, reading it in chunks."""
+    for encoding in encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(file_path, "rb") as f:
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        decoder.decode(b"", final=True)
+                        break
+                    decoder.decode(chunk)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Could not read file {file_path} with any of the attempted encodings")
+
+
+def iter_file_lines(file_path: str, start_line: int = 0) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (line_number, stripped_line) for the non-empty lines of a file, one at a time.
+    Line numbers are 1-based; lines up to and including `start_line` are skipped.
+    """
+    encoding = detect_file_encoding(file_path)
+    with open(file_path, "r", encoding=encoding) as file:
+        for line_number, line in enumerate(file, start=1):
+            if line_number <= start_line:
+                continue
+            line = line.strip()
+            if line:
+                yield line_number, line
+
+
+class Checkpoint:
+    """Line-level progress for one (input file, site) load, stored as a small JSON file."""
+
+    def __init__(self, input_path: str, site: str):
+        self.path = f"{input_path}.{site}.checkpoint"
+        self.input_path = os.path.abspath(input_path)
+        self.site = site
+        self.line = 0
+        self.documents = 0
+        # Identifies the load in the manifest; kept across resumes
+        self.run_id = new_run_id()
+
+    def load(self) -> bool:
+        """Load saved progress; returns True if there is progress to resume from."""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if data.get("input_path") != self.input_path or data.get("site") != self.site:
+            return False
+        self.line = data.get("line", 0)
+        self.documents = data.get("documents", 0)
+        self.run_id = data.get("run_id") or self.run_id
+        return self.line > 0
+
+    def save(self, line: int, documents: int):
+        self.line = line
+        self.documents = documents
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"input_path": self.input_path, "site": self.site,
+                       "line": line, "documents": documents, "run_id": self.run_id,
+                       "updated": time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class IngestPipeline:
+    """
+    Runs parsed documents through embed and upload stages with bounded queues in between.
+    Several embedding batches run concurrently, within the configured provider rate
+    limits, while earlier batches upload. Batch sizes adapt to the observed embedding
+    latency (see the `loader` section of config_embedding.yaml).
+
+    Args:
+        client: VectorDBClient to upload to
+        batch_size: Initial documents per batch (batches end on a line boundary)
+        embed: Whether documents need embeddings computed
+        provider, model: Embedding provider and model
+        embeddings_file: Optional open file that receives "url<TAB>json<TAB>embedding" lines
+        checkpoint: Optional Checkpoint updated after every uploaded batch
+        queue_size: Maximum batches waiting between two stages
+        concurrency: Embedding batches in flight, defaults to the configured value
+        manifest: Optional IngestManifest for skipping unchanged and removing deleted documents
+        model_tag: Embedding model recorded in the manifest
+        skip_unchanged: Whether documents unchanged according to the manifest are skipped
+    """
+
+    def __init__(self, client, batch_size: int = 100, embed: bool = True,
+                 provider: Optional[str] = None, model: Optional[str] = None,
+                 embeddings_file: Optional[TextIO] = None, checkpoint: Optional[Checkpoint] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, concurrency: Optional[int] = None,
+                 manifest: Optional[IngestManifest] = None, model_tag: Optional[str] = None,
+                 skip_unchanged: bool = True):
+        loader_config = CONFIG.embedding_loader
+        self.client = client
+        self.batch_size = batch_size
+        self.embed = embed
+        self.provider = provider
+        self.model = model
+        self.embeddings_file = embeddings_file
+        self.checkpoint = checkpoint
+        self.concurrency = max(1, concurrency or loader_config.concurrency) if embed else 1
+        self.queue_size = max(queue_size, self.concurrency)
+        self.loader_config = loader_config
+        self.adaptive = embed and loader_config.adaptive_batching
+        self.requests = TokenBucket(loader_config.requests_per_minute)
+        self.tokens = TokenBucket(loader_config.tokens_per_minute)
+        self._rate_lock = asyncio.Lock()
+        self.total_documents = checkpoint.documents if checkpoint else 0
+        self.lines_done = checkpoint.line if checkpoint else 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.new_documents = 0
+        self.unchanged_documents = 0
+        self.started = None
+        self.manifest = manifest
+        self.model_tag = model_tag or model or ""
+        self.skip_unchanged = skip_unchanged
+        self.run_id = checkpoint.run_id if checkpoint else new_run_id()
+
+    @property
+    def documents_per_second(self) -> float:
+        if self.started is None:
+            return 0.0
+        return self.new_documents / max(time.monotonic() - self.started, 1e-9)
+
+    async def run(self, source: Iterable[Tuple[int, str]],
+                  parse: Callable[[str], List[Dict[str, Any]]]) -> int:
+        """
+        Load every line from `source`, an iterable of (line_number, line), using `parse`
+        to turn a line into documents. Returns the total number of documents uploaded.
+        """
+        self.started = time.monotonic()
+        to_embed = asyncio.Queue(maxsize=self.queue_size)
+        to_upload = asyncio.Queue(maxsize=self.queue_size)
+        stages = [
+            asyncio.create_task(self._read(source, parse, to_embed)),
+            asyncio.create_task(self._embed_all(to_embed, to_upload)),
+            asyncio.create_task(self._upload(to_upload)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for stage in stages:
+                stage.cancel()
+        elapsed = time.monotonic() - self.started
+        print(f"Loaded {self.new_documents} documents in {elapsed:.1f}s "
+              f"({self.documents_per_second:.1f} docs/sec, {self.batches} batches, "
+              f"{self.failed_batches} failed, {self.unchanged_documents} unchanged and skipped)")
+        return self.total_documents
+
+    async def _read(self, source, parse, out_queue: asyncio.Queue):
+        batch: List[Dict[str, Any]] = []
+        batch_tokens = 0
+        seq = 0
+        last_line = self.lines_done
+        for line_number, line in source:
+            try:
+                documents = parse(line)
+            except Exception as e:
+                print(f"Error processing line {line_number}: {str(e)}")
+                documents = []
+            if self.manifest is not None and documents:
+                documents = self._skip_unchanged(documents)
+            batch.extend(documents)
+            batch_tokens += sum(estimate_tokens(doc["schema_json"]) for doc in documents)
+            last_line = line_number
+            if len(batch) >= self.batch_size or batch_tokens >= self.loader_config.max_batch_tokens:
+                await out_queue.put((seq, last_line, batch))
+                seq += 1
+                batch = []
+                batch_tokens = 0
+            elif line_number % 1000 == 0:
+                # Let the other stages run while long stretches of lines produce no documents
+                await asyncio.sleep(0)
+        if batch or last_line > self.lines_done:
+            await out_queue.put((seq, last_line, batch))
+        for _ in range(self.concurrency):
+            await out_queue.put(_DONE)
+
+    def _skip_unchanged(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not self.skip_unchanged:
+            return documents
+        changed, unchanged = self.manifest.split_unchanged(documents, self.model_tag)
+        if unchanged:
+            self.manifest.mark_seen(unchanged, self.run_id)
+            self.unchanged_documents += len(unchanged)
+        return changed
+
+    async def remove_missing(self) -> int:
+        """
+        Delete documents recorded in the manifest as loaded from this load's input
+        (the manifest's source) that were not in it this time.
+        """
+        if self.manifest is None:
+            return 0
+        if self.failed_batches:
+            print("Some batches failed, not removing documents missing from the input")
+            return 0
+        urls = self.manifest.removed_urls(self.run_id)
+        if not urls:
+            return 0
+        print(f"Removing {len(urls)} documents that are no longer in the input")
+        try:
+            count = await self.client.delete_documents_by_url(urls)
+        except NotImplementedError as e:
+            print(f"Warning: {e}; use --delete-site to remove stale documents")
+            return 0
+        self.manifest.forget(urls)
+        return count
+
+    async def _embed_all(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        await asyncio.gather(*[self._embed(in_queue, out_queue) for _ in range(self.concurrency)])
+        await out_queue.put(_DONE)
+
+    async def _wait_for_rate_limit(self, tokens: int):
+        # One waiter at a time keeps admission in arrival order
+        async with self._rate_lock:
+            while True:
+                delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+
+    def _adapt_batch_size(self, batch_len: int, elapsed: float, failed: bool = False):
+        if not self.adaptive:
+            return
+        config = self.loader_config
+        if failed:
+            target = self.batch_size // 2
+        else:
+            per_document = elapsed / max(batch_len, 1)
+            target = int(config.target_batch_seconds / max(per_document, 1e-6))
+        # Move halfway towards the target to smooth out noisy latencies
+        new_size = (self.batch_size + target) // 2
+        new_size = min(max(new_size, config.min_batch_size), config.max_batch_size)
+        if new_size != self.batch_size:
+            print(f"Adjusting embedding batch size from {self.batch_size} to {new_size}")
+            self.batch_size = new_size
+
+    async def _embed(self, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+            seq, last_line, batch = item
+            if self.embed and batch:
+                texts = [doc["schema_json"] for doc in batch]
+                await self._wait_for_rate_limit(sum(estimate_tokens(text) for text in texts))
+                start = time.monotonic()
+                try:
+                    print(f"Computing embeddings for batch of {len(batch)} texts")
+                    embeddings = await batch_get_embeddings(texts, self.provider, self.model)
+                    batch = [dict(doc, embedding=embedding) for doc, embedding in zip(batch, embeddings)]
+                    self._write_embeddings(batch)
+                    self._adapt_batch_size(len(texts), time.monotonic() - start)
+                except Exception as e:
+                    print(f"Error computing embeddings for batch ending at line {last_line}: {str(e)}")
+                    traceback.print_exc()
+                    self._adapt_batch_size(len(texts), time.monotonic() - start, failed=True)
+                    batch = None
+            await out_queue.put((seq, last_line, batch))
+
+    def _write_embeddings(self, batch: List[Dict[str, Any]]):
+        if self.embeddings_file is None:
+            return
+        for doc in batch:
+            # Keep each record on one line
+            embedding_str = str(doc["embedding"]).replace(" ", "").replace("\n", "")
+            doc_json = doc["schema_json"].replace("\n", " ")
+            self.embeddings_file.write(f"{doc['url']}\t{doc_json}\t{embedding_str}\n")
+        self.embeddings_file.flush()
+
+    async def _upload(self, in_queue: asyncio.Queue):
+        # Batches arrive out of order when embedding runs concurrently. The checkpoint only
+        # moves past a batch once it and every batch before it have been uploaded.
+        finished = {}  # seq -> (last_line, succeeded, documents)
+        next_seq = 0
+        checkpointed_documents = self.total_documents
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+            seq, last_line, batch = item
+            succeeded = batch is not None
+            if batch:
+                self.batches += 1
+                try:
+                    print(f"Uploading batch {seq + 1} ({len(batch)} documents, through line {last_line})")
+                    await self.client.upload_documents(batch)
+                    self.total_documents += len(batch)
+                    self.new_documents += len(batch)
+                    if self.manifest is not None:
+                        self.manifest.record(batch, self.model_tag, self.run_id)
+                except Exception as e:
+                    print(f"Error uploading batch ending at line {last_line}: {str(e)}")
+                    traceback.print_exc()
+                    succeeded = False
+            if not succeeded:
+                self.failed_batches += 1
+
+            finished[seq] = (last_line, succeeded, len(batch) if batch else 0)
+            advanced = False
+            while next_seq in finished and finished[next_seq][1]:
+                self.lines_done, _, documents = finished.pop(next_seq)
+                checkpointed_documents += documents
+                next_seq += 1
+                advanced = True
+            if self.checkpoint is not None and advanced:
+                self.checkpoint.save(self.lines_done, checkpointed_documents)
+            print(f"Processed {self.lines_done} lines, {self.total_documents} documents uploaded "
+                  f"({self.documents_per_second:.1f} docs/sec)")
@@ -187,6 +187,14 @@ class AsyncLogProcessor:
         self.shutdown_event = threading.Event()
         self.worker_thread = None
         self.real_loggers = {}  # Cache of actual LoggerUtility instances
+        self._atexit_registered = False
+        # The worker thread does not survive fork() (webserver.prefork workers), and a
+        # fork while it holds a lock can deadlock the child: stop it around the fork
+        # and start it again in both processes
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(before=self._stop_for_fork,
+                                after_in_parent=self._restart_after_fork,
+                                after_in_child=self._restart_after_fork)
         
     def start(self):
         """Start the background worker thread"""
@@ -194,7 +202,19 @@ class AsyncLogProcessor:
             self.worker_thread = threading.Thread(target=self._worker, daemon=True)
             self.worker_thread.start()
             # Register cleanup on exit
-            atexit.register(self.shutdown)
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _stop_for_fork(self):
+        self.shutdown(timeout=1.0)
+
+    def _restart_after_fork(self):
+        if self.worker_thread is None:
+            return
+        self.shutdown_event = threading.Event()
+        self.worker_thread = None
+        self.start()
     
     def _worker(self):
         """Background worker that processes queued log messages"""
@@ -0,0 +1,265 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+In-process metrics registry with counters, gauges and histograms, rendered in
+the Prometheus text exposition format by the web server's /metrics route.
+
+Metrics are declared once at module level and updated on hot paths:
+
+    LLM_REQUESTS = metrics.counter("nlweb_llm_requests_total", "LLM calls", ("provider", "outcome"))
+    LLM_REQUESTS.labels("openai", "ok").inc()
+
+labels() returns the same child object for the same label values, so an update
+is a dictionary lookup and an addition. Updates are not locked: they are made
+from the event loop thread. Values that already live elsewhere (cache hit
+counts, admission occupancy, ...) are read at scrape time by collectors
+registered with add_collector, rather than being mirrored on every update.
+
+Every process has its own registry; with several worker processes each scrape
+is answered by one of them.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import bisect
+import math
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from utils.logging_config_helper import get_configured_logger
+
+logger = get_configured_logger("metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans fast cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, label names, label values, value) produced by a collector
+Sample = Tuple[str, Sequence[str], Sequence[str], float]
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text):
+    return str(text).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The time series for these label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            values = tuple(str(value) for value in values)
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _header(self):
+        return [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            cumulative = 0
+            for upper_bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, (("le", _format_value(upper_bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        # name -> (kind, documentation, function returning samples)
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], Iterable[Sample]]]] = {}
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = cls(name, documentation, labelnames, **kwargs)
+            self._metrics[name] = metric
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already registered with a different type or labels")
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, name, kind, documentation, collect: Callable[[], Iterable[Sample]]):
+        """
+        Register a function called at every scrape that returns samples for the
+        metric family `name`, as (sample name, label names, label values, value).
+        """
+        self._collectors[name] = (kind, documentation, collect)
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        for name in sorted(self._collectors):
+            kind, documentation, collect = self._collectors[name]
+            try:
+                samples = list(collect())
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {_escape_help(documentation)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labelnames, values, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Global singleton
+registry = MetricsRegistry()
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return registry.counter(name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()) -> Gauge:
+    return registry.gauge(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return registry.histogram(name, documentation, labelnames, buckets)
+
+
+def add_collector(name, kind, documentation, collect):
+    registry.add_collector(name, kind, documentation, collect)
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,226 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Per-request latency tracing. A trace is started for each query (keyed by its
+query_id) and every pipeline stage opens a span inside it:
+
+    with tracing.span("retrieval.search", site=site):
+        ...
+
+The current trace and span are held in context variables, so tasks created
+with asyncio.create_task inherit them and their spans nest under the span that
+created the task. When no trace is active, span() returns a shared no-op
+object. Finished traces are appended to a JSON lines file, one record per span,
+using the field names of the OpenTelemetry JSON encoding (traceId, spanId,
+parentSpanId, startTimeUnixNano, ...), and can be sent back to the client as a
+debug message.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from config.config import CONFIG
+from utils.logging_config_helper import get_configured_logger
+
+logger = get_configured_logger("tracing")
+
+_current_trace = contextvars.ContextVar("nlweb_trace", default=None)
+_current_span = contextvars.ContextVar("nlweb_span", default=None)
+
+_export_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current_span.set(self.span_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace.spans.append(self)
+        return False
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+    def to_record(self):
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": dict(self.attributes, query_id=self.trace.query_id),
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """The spans recorded while handling one query."""
+
+    def __init__(self, query_id, attributes):
+        self.query_id = query_id
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self.root = Span(self, "query", None, attributes)
+        self._marks = set()
+
+    def mark(self, name, **attributes):
+        """Record a point in time, such as the first result being sent; only the first mark of a name counts."""
+        if name in self._marks:
+            return
+        self._marks.add(name)
+        marker = Span(self, name, _current_span.get() or self.root.span_id, attributes)
+        marker.end_ns = marker.start_ns
+        marker.set(since_start_ms=round((marker.start_ns - self.root.start_ns) / 1_000_000, 3))
+        self.spans.append(marker)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [span.to_record() for span in sorted(self.spans, key=lambda s: s.start_ns)]
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact form sent to the client: each span's name, offset and duration in milliseconds."""
+        start = self.root.start_ns
+        return {
+            "trace_id": self.trace_id,
+            "spans": [{"name": span.name,
+                       "start_ms": round((span.start_ns - start) / 1_000_000, 3),
+                       "duration_ms": round(span.duration_ms, 3),
+                       **({"error": span.error} if span.error else {})}
+                      for span in sorted(self.spans, key=lambda s: s.start_ns)],
+        }
+
+
+class _TraceScope:
+    def __init__(self, trace):
+        self.trace = trace
+        self._token = None
+
+    def __enter__(self):
+        if self.trace is not None:
+            self._token = _current_trace.set(self.trace)
+            self.trace.root.__enter__()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            self.trace.root.__exit__(exc_type, exc, tb)
+            _current_trace.reset(self._token)
+            if CONFIG.nlweb.tracing.enabled:
+                export(self.trace)
+        return False
+
+
+def trace_request(query_id, force=False, **attributes):
+    """
+    Context manager that traces one query. Tracing happens when it is enabled in the
+    config, or when `force` is set (a client asking for the trace in a debug message);
+    otherwise it yields None and every span() inside is a no-op.
+    """
+    trace = None
+    if CONFIG.nlweb.tracing.enabled or force:
+        trace = Trace(query_id, attributes)
+    return _TraceScope(trace)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def span(name, **attributes):
+    """Context manager timing one stage of the current query."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return Span(trace, name, _current_span.get(), attributes)
+
+
+async def traced(name, awaitable, **attributes):
+    """Await `awaitable` inside a span; for wrapping coroutines passed to create_task or gather."""
+    with span(name, **attributes):
+        return await awaitable
+
+
+def mark(name, **attributes):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(name, **attributes)
+
+
+def set_query_attributes(**attributes):
+    """Set attributes on the root span of the current query."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.root.set(**attributes)
+
+
+def _write_records(path, lines):
+    try:
+        with _export_lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(lines)
+    except OSError as e:
+        logger.warning(f"Could not export trace to {path}: {e}")
+
+
+def export(trace: Trace):
+    """Append the trace's spans to the configured JSON lines file, off the event loop when there is one."""
+    path = CONFIG.nlweb.tracing.export_path
+    if not path:
+        return
+    lines = "".join(json.dumps(record, default=str) + "\n" for record in trace.to_records())
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        loop.run_in_executor(None, _write_records, path, lines)
+    else:
+        _write_records(path, lines)
@@ -14,11 +14,29 @@ import json
 from core.baseHandler import NLWebHandler
 from core.generate_answer import GenerateAnswer
 
+def _disconnect_event(send_chunk):
+    """
+    The event the server sets when the client disconnects, attached to send_chunk
+    or to the object send_chunk is a method of; a new one if the server has none.
+    """
+    for owner in (send_chunk, getattr(send_chunk, "__self__", None)):
+        event = getattr(owner, "disconnected", None)
+        if isinstance(event, asyncio.Event):
+            return event
+    return asyncio.Event()
+
 # Add SendChunkWrapper class here
 class SendChunkWrapper:
     def __init__(self, send_chunk):
         self.send_chunk = send_chunk
         self.closed = False
+        # Set when the client goes away, by the server as soon as it notices or by
+        # the next write that fails
+        self.disconnected = _disconnect_event(send_chunk)
+
+    def _connection_lost(self):
+        self.closed = True
+        self.disconnected.set()
 
     async def write(self, chunk, end_response=False):
         if self.closed:
@@ -34,10 +52,10 @@ class SendChunkWrapper:
                 self.closed = True
         except (ConnectionResetError, BrokenPipeError) as e:
             print(f"Connection lost in write: {str(e)}")
-            self.closed = True
+            self._connection_lost()
         except Exception as e:
             print(f"Error in SendChunkWrapper.write: {str(e)}")
-            self.closed = True
+            self._connection_lost()
 
     async def write_stream(self, message, end_response=False):
         if self.closed:
@@ -50,10 +68,10 @@ class SendChunkWrapper:
                 self.closed = True
         except (ConnectionResetError, BrokenPipeError) as e:
             print(f"Connection lost in write_stream: {str(e)}")
-            self.closed = True
+            self._connection_lost()
         except Exception as e:
             print(f"Error in write_stream: {str(e)}")
-            self.closed = True
+            self._connection_lost()
 
 # simple wrapper for handling streaming. Needs to be replaced for any 'real' deployment
 class HandleRequest():
@@ -81,9 +99,12 @@ class HandleRequest():
                 print(f"[{request_id}] Connection lost before starting query handling")
                 return
             if (self.generate_mode == "generate"):
-                await GenerateAnswer(self.query_params, self).runQuery()
+                handler = GenerateAnswer(self.query_params, self)
             else:
-                await NLWebHandler(self.query_params, self).runQuery()
+                handler = NLWebHandler(self.query_params, self)
+            if not await self._run_until_disconnected(handler):
+                print(f"[{request_id}] Client disconnected, query cancelled")
+                return
             await self.write_stream({"message_type": "complete"})
         except (ssl.SSLError, BrokenPipeError, ConnectionResetError) as conn_err:
             print(f"[{request_id}] Connection error during request handling: {str(conn_err)}")
@@ -99,7 +120,28 @@ class HandleRequest():
                 print(f"[{request_id}] Error after connection was already lost: {str(inner_e)}")
             return
 
-    
+    async def _run_until_disconnected(self, handler):
+        """
+        Run the handler's query, cancelling it and every task it started as soon as
+        the client disconnects. Returns False if the query was cancelled.
+        """
+        query = asyncio.ensure_future(handler.runQuery())
+        disconnected = asyncio.ensure_future(self.send_chunk_wrapper.disconnected.wait())
+        try:
+            await asyncio.wait((query, disconnected), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnected.cancel()
+            if not query.done():
+                # The client went away (or this request is being cancelled)
+                self.connection_alive = False
+                handler.cancel()
+                query.cancel()
+                await asyncio.gather(query, return_exceptions=True)
+        if query.cancelled():
+            return False
+        query.result()
+        return True
+
     async def send_error_response(self, status_code, message):
         """Send error response to client if connection is still alive"""
         try:
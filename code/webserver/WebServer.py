@@ -15,212 +15,479 @@ import sys
 import time
 import traceback
 import urllib.parse
+from http import HTTPStatus
 
 from config.config import CONFIG
 from core.baseHandler import NLWebHandler
 from core.generate_answer import GenerateAnswer
 from core.mcp_handler import handle_mcp_request
 from core.whoHandler import WhoHandler
+from prompts.prompts import ensure_prompts_loaded
+from utils import metrics
 from utils.logging_config_helper import get_configured_logger
 from utils.utils import get_param
 
-from webserver.static_file_handler import send_static_file
+from webserver.admission import AdmissionRejected, admission_controller, classify_request
+from webserver.compression import (
+    StreamCompressor,
+    choose_encoding,
+    encode_body,
+    precompress_static_files,
+)
+from webserver.static_file_handler import APP_ROOT, FileBody, send_static_file
 from webserver.StreamingWrapper import HandleRequest, SendChunkWrapper
 
 # Initialize module logger
 logger = get_configured_logger("webserver")
 
+HTTP_REQUESTS = metrics.counter("nlweb_http_requests_total", "HTTP requests by route and response status",
+                                ("route", "status"))
+HTTP_LATENCY = metrics.histogram("nlweb_http_request_duration_seconds",
+                                 "Time to handle an HTTP request, including streaming the response", ("route",))
+HTTP_IN_FLIGHT = metrics.gauge("nlweb_http_requests_in_flight", "HTTP requests being handled")
+
+
+class _BadRequest(Exception):
+    """The client sent something that cannot be parsed as an HTTP request."""
+
+
+async def _read_request_head(reader, idle_timeout):
+    """
+    Read the request line and headers of the next request on a connection.
+    Returns None if the client closed the connection or stayed idle for too long.
+    """
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=idle_timeout)
+    except asyncio.TimeoutError:
+        return None
+    # Tolerate stray empty lines between pipelined requests
+    while request_line in (b"\r\n", b"\n"):
+        request_line = await asyncio.wait_for(reader.readline(), timeout=idle_timeout)
+    if not request_line:
+        return None
+
+    request_line = request_line.decode("utf-8", errors="replace").rstrip("\r\n")
+    words = request_line.split()
+    if len(words) < 2:
+        raise _BadRequest(request_line)
+    method, path = words[0], words[1]
+    version = words[2].upper() if len(words) > 2 else "HTTP/1.0"
+
+    headers = {}
+    while True:
+        header_line = await asyncio.wait_for(reader.readline(), timeout=CONFIG.server.timeout)
+        if not header_line:
+            return None
+        if header_line in (b"\r\n", b"\n"):
+            break
+        hdr = header_line.decode("utf-8").rstrip("\r\n")
+        if ":" not in hdr:
+            continue
+        name, value = hdr.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    return method, path, version, headers
+
+
+async def _read_request_body(reader, headers):
+    """Read the request body framed by Content-Length or chunked transfer coding."""
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = bytearray()
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise _BadRequest("invalid chunk size")
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return bytes(body)
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+    if "content-length" in headers:
+        try:
+            content_length = int(headers["content-length"])
+        except ValueError:
+            raise _BadRequest("invalid Content-Length")
+        if content_length < 0:
+            raise _BadRequest("invalid Content-Length")
+        return await reader.readexactly(content_length)
+    return None
+
+
+def add_cors_headers(request_headers, response_headers):
+    """Add CORS headers to a response if enabled."""
+    if CONFIG.server.enable_cors and "Origin" in request_headers:
+        response_headers["Access-Control-Allow-Origin"] = "*"
+        response_headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response_headers["Access-Control-Allow-Headers"] = "Content-Type"
+
+
+async def prepare_static_files():
+    """Startup step shared by the web server front ends: precompress static files."""
+    if CONFIG.server.static.gzip_enabled:
+        written = await asyncio.to_thread(precompress_static_files, APP_ROOT)
+        logger.info(f"Precompressed {written} static file variant(s) under {APP_ROOT}")
+
+
+def _wants_keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.1":
+        return "close" not in connection
+    return "keep-alive" in connection
+
+
+# Connections waiting for their next request, longest idle first (as dict keys); closed
+# at once when the server drains, or one at a time to make room for new clients
+_idle_connections = {}
+_draining = False
+
+# Seconds between checks for a client that closed its connection while its request is handled
+DISCONNECT_CHECK_INTERVAL = 0.25
+
+
+async def drain_connections(timeout):
+    """
+    Stop keeping connections alive, close the idle ones and wait up to `timeout`
+    seconds for in-flight requests to finish. Returns the number of connections
+    still open.
+    """
+    global _draining
+    _draining = True
+    for writer in list(_idle_connections):
+        writer.close()
+    deadline = time.monotonic() + timeout
+    while admission_controller.open_connections > 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    return admission_controller.open_connections
+
+
+def _close_idle_connection():
+    """Close the longest idle keep-alive connection; returns False if there is none."""
+    for writer in _idle_connections:
+        del _idle_connections[writer]
+        writer.close()
+        return True
+    return False
+
 
 async def handle_client(reader, writer, fulfill_request):
-    """Handle a client connection by parsing the HTTP request and passing it to fulfill_request."""
-    request_id = f"client_{int(time.time() * 1000)}"
-    connection_alive = True
+    """
+    Handle a client connection by parsing HTTP requests and passing each of them to
+    fulfill_request. Connections are kept alive between requests (including pipelined
+    ones) until the client asks to close, stays idle for CONFIG.server.timeout seconds,
+    or has sent CONFIG.server.max_requests_per_connection requests.
+    """
+    connection_id = f"client_{int(time.time() * 1000)}"
+    max_requests = max(1, CONFIG.server.max_requests_per_connection)
+    requests_served = 0
+    admitted = admission_controller.open_connection(_close_idle_connection)
 
     try:
-        # Read the request line
-        request_line = await reader.readline()
-        if not request_line:
-            connection_alive = False
+        if not admitted:
+            writer.write(
+                f"HTTP/1.1 503 Service Unavailable\r\nRetry-After: {CONFIG.server.admission.retry_after}\r\n"
+                "Content-Length: 0\r\nConnection: close\r\n\r\n".encode("utf-8")
+            )
             return
 
-        request_line = request_line.decode("utf-8", errors="replace").rstrip("\r\n")
-        words = request_line.split()
-        if len(words) < 2:
-            # Bad request
-            logger.warning(f"[{request_id}] Bad request: {request_line}")
-            writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        while requests_served < max_requests and not _draining:
+            request_id = f"{connection_id}#{requests_served + 1}"
+            try:
+                _idle_connections[writer] = None
+                try:
+                    head = await _read_request_head(reader, CONFIG.server.timeout)
+                finally:
+                    _idle_connections.pop(writer, None)
+                if head is None:
+                    break
+                method, path, version, headers = head
+                body = await _read_request_body(reader, headers)
+            except (_BadRequest, ValueError, asyncio.LimitOverrunError) as e:
+                logger.warning(f"[{request_id}] Bad request: {e}")
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                break
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    ConnectionResetError, BrokenPipeError):
+                break
+
+            requests_served += 1
+            keep_alive = (_wants_keep_alive(version, headers) and requests_served < max_requests
+                          and not _draining)
+            logger.debug(f"[{request_id}] {method} {path}")
+
+            keep_alive = await _serve_request(
+                reader, writer, fulfill_request, request_id, method, path, version, headers, body, keep_alive
+            )
+            if not keep_alive:
+                break
+    except Exception as e:
+        logger.error(
+            f"[{connection_id}] Critical error handling request: {str(e)}", exc_info=True
+        )
+    finally:
+        if admitted:
+            admission_controller.close_connection()
+        # Close the connection in a controlled manner
+        try:
             await writer.drain()
-            connection_alive = False
-            return
+            writer.close()
+            await writer.wait_closed()
+            logger.debug(f"[{connection_id}] Connection closed after {requests_served} request(s)")
+        except Exception as e:
+            logger.warning(f"[{connection_id}] Error closing connection: {str(e)}")
 
-        method, path = words[0], words[1]
-        logger.debug(f"[{request_id}] {method} {path}")
 
-        # Parse headers
-        headers = {}
-        while True:
-            try:
-                header_line = await reader.readline()
-                if not header_line or header_line == b"\r\n":
-                    break
+async def _watch_disconnect(reader, disconnected):
+    """Set `disconnected` once the client has closed or reset the connection."""
+    while not (reader.at_eof() or reader.exception() is not None):
+        await asyncio.sleep(DISCONNECT_CHECK_INTERVAL)
+    disconnected.set()
 
-                hdr = header_line.decode("utf-8").rstrip("\r\n")
-                if ":" not in hdr:
-                    continue
-                name, value = hdr.split(":", 1)
-                headers[name.strip().lower()] = value.strip()
-            except (ConnectionResetError, BrokenPipeError):
-                connection_alive = False
-                return
 
-        # Parse query parameters
-        if "?" in path:
-            path, query_string = path.split("?", 1)
+async def _serve_request(reader, writer, fulfill_request, request_id, method, path, version, headers, body,
+                         keep_alive):
+    """
+    Run fulfill_request for one parsed request and frame its response. Returns whether
+    the connection can be reused for the next request.
+    """
+    connection_alive = True
+    # Set when the client goes away, even while the handler is not writing; streaming
+    # handlers find it as send_chunk.disconnected and cancel their outstanding work
+    disconnected = asyncio.Event()
+    # The status line and headers are held back until the first body write, so that a
+    # complete body can be compressed and framed with an exact Content-Length. Streamed
+    # responses without a Content-Length are sent chunked to HTTP/1.1 clients; for
+    # HTTP/1.0 clients the end of the response is signalled by closing the connection
+    pending_head = None
+    chunked = False
+    encoder = None
+    declared_length = None
+    body_bytes = 0
+    # A HEAD response carries the headers, including the framing, that a GET would
+    # have, but no body; body bytes would be read as the start of the next response
+    head_only = method == "HEAD"
+
+    # Parse query parameters
+    if "?" in path:
+        path, query_string = path.split("?", 1)
+        query_params = {}
+        try:
+            # Parse query parameters into a dictionary of lists
+            for key, values in urllib.parse.parse_qs(query_string).items():
+                query_params[key] = values
+        except Exception:
             query_params = {}
-            try:
-                # Parse query parameters into a dictionary of lists
-                for key, values in urllib.parse.parse_qs(query_string).items():
-                    query_params[key] = values
-            except Exception:
-                query_params = {}
+    else:
+        query_params = {}
+
+    def write_head(status_line, response_headers):
+        response_headers["Connection"] = "keep-alive" if keep_alive else "close"
+        head = [status_line]
+        for header_name, header_value in response_headers.items():
+            head.append(f"{header_name}: {header_value}\r\n")
+        head.append("\r\n")
+        writer.write("".join(head).encode("utf-8"))
+
+    def start_body(status_code, response_headers, data, end_response):
+        """Decide encoding and framing of the body from its first piece; returns the bytes to send."""
+        nonlocal chunked, encoder, declared_length, keep_alive
+
+        encoding = choose_encoding(status_code, response_headers, headers.get("accept-encoding"))
+
+        if end_response:
+            # The whole body is known
+            data = encode_body(data, encoding, response_headers)
+            declared_length = int(response_headers["Content-Length"])
+        elif "Content-Length" in response_headers:
+            # A body of known length written in pieces is sent as is
+            declared_length = int(response_headers["Content-Length"])
         else:
-            query_params = {}
+            if encoding:
+                encoder = StreamCompressor(encoding)
+                response_headers["Content-Encoding"] = encoding
+                data = encoder.compress(data) if data else b""
+            if version == "HTTP/1.1":
+                response_headers["Transfer-Encoding"] = "chunked"
+                chunked = True
+            else:
+                keep_alive = False
+        return data
 
-        # Read request body if Content-Length is provided
-        body = None
-        if "content-length" in headers:
-            try:
-                content_length = int(headers["content-length"])
-                body = await reader.read(content_length)
-            except (ValueError, ConnectionResetError, BrokenPipeError):
-                connection_alive = False
-                return
+    # Create a streaming response handler
+    async def send_response(status_code, response_headers, end_response=False):
+        """Send HTTP status and headers to the client."""
+        nonlocal connection_alive, declared_length, keep_alive, pending_head
 
-        # Create a streaming response handler
-        async def send_response(status_code, response_headers, end_response=False):
-            """Send HTTP status and headers to the client."""
-            nonlocal connection_alive
+        if not connection_alive:
+            return
 
-            if not connection_alive:
-                return
+        if getattr(send_response, "headers_sent", False):
+            # Handlers such as HandleRequest may try to start a response that the
+            # router has already started; a second status line would corrupt the stream
+            logger.debug(f"[{request_id}] Ignoring second send_response({status_code})")
+            return
 
+        try:
+            status_code = int(status_code)
             try:
-                status_line = f"HTTP/1.1 {status_code}\r\n"
-                writer.write(status_line.encode("utf-8"))
-
-                # Add CORS headers if enabled
-                if CONFIG.server.enable_cors and "Origin" in headers:
-                    response_headers["Access-Control-Allow-Origin"] = "*"
-                    response_headers["Access-Control-Allow-Methods"] = (
-                        "GET, POST, OPTIONS"
-                    )
-                    response_headers["Access-Control-Allow-Headers"] = "Content-Type"
-
-                # Send headers
-                for header_name, header_value in response_headers.items():
-                    header_line = f"{header_name}: {header_value}\r\n"
-                    writer.write(header_line.encode("utf-8"))
-
-                # End headers
-                writer.write(b"\r\n")
+                reason = HTTPStatus(status_code).phrase
+            except ValueError:
+                reason = ""
+            status_line = f"HTTP/1.1 {status_code} {reason}".rstrip() + "\r\n"
+
+            # Connection management and framing are decided here, not by the handler
+            if str(response_headers.pop("Connection", "")).lower() == "close":
+                keep_alive = False
+            response_headers.pop("Transfer-Encoding", None)
+            for header_name in list(response_headers):
+                if header_name.lower() == "content-length" and header_name != "Content-Length":
+                    response_headers["Content-Length"] = response_headers.pop(header_name)
+
+            add_cors_headers(headers, response_headers)
+
+            if end_response or status_code in (204, 304):
+                # No body follows
+                if status_code != 304:
+                    response_headers["Content-Length"] = "0"
+                declared_length = 0
+                write_head(status_line, response_headers)
                 await writer.drain()
-                # Signal that we've sent the headers
-                send_response.headers_sent = True
-                send_response.ended = end_response
-            except (ConnectionResetError, BrokenPipeError):
-                connection_alive = False
-            except Exception:
-                connection_alive = False
-
-        # Create a streaming content sender
-        async def send_chunk(chunk, end_response=False):
-            """Send a chunk of data to the client."""
-            nonlocal connection_alive
-
-            if not connection_alive:
-                return
+            else:
+                pending_head = (status_code, status_line, response_headers)
+            # Signal that we've sent the headers
+            send_response.headers_sent = True
+            send_response.ended = end_response or status_code in (204, 304)
+        except (ConnectionResetError, BrokenPipeError):
+            connection_alive = False
+            disconnected.set()
+        except Exception:
+            connection_alive = False
+            disconnected.set()
 
-            if (
-                not hasattr(send_response, "headers_sent")
-                or not send_response.headers_sent
-            ):
-                logger.warning(f"[{request_id}] Headers must be sent before content")
-                return
+    # Create a streaming content sender
+    async def send_chunk(chunk, end_response=False):
+        """Send a chunk of data to the client."""
+        nonlocal connection_alive, body_bytes, pending_head
 
-            if hasattr(send_response, "ended") and send_response.ended:
-                logger.warning(f"[{request_id}] Response has already been ended")
-                return
+        if not connection_alive:
+            return
 
-            try:
-                chunk_size = 0
-                if chunk:
-                    if isinstance(chunk, str):
-                        data = chunk.encode("utf-8")
-                        chunk_size = len(data)
-                        writer.write(data)
-                    else:
-                        chunk_size = len(chunk)
-                        writer.write(chunk)
-                    await writer.drain()
-
-                send_response.ended = end_response
-            except (ConnectionResetError, BrokenPipeError) as e:
-                logger.warning(
-                    f"[{request_id}] Connection lost while sending chunk: {str(e)}"
-                )
-                connection_alive = False
-            except Exception as e:
-                logger.warning(f"[{request_id}] Error sending chunk: {str(e)}")
-                connection_alive = False
+        if not getattr(send_response, "headers_sent", False):
+            logger.warning(f"[{request_id}] Headers must be sent before content")
+            return
 
-        # Call the user-provided fulfill_request function with streaming capabilities
-        if connection_alive:
-            try:
-                await fulfill_request(
-                    method=method,
-                    path=urllib.parse.unquote(path),
-                    headers=headers,
-                    query_params=query_params,
-                    body=body,
-                    send_response=send_response,
-                    send_chunk=send_chunk,
-                )
-            except Exception as e:
-                logger.error(
-                    f"[{request_id}] Error in fulfill_request: {str(e)}", exc_info=True
+        if getattr(send_response, "ended", False):
+            logger.warning(f"[{request_id}] Response has already been ended")
+            return
+
+        try:
+            if isinstance(chunk, FileBody):
+                if pending_head is not None and "Content-Length" in pending_head[2]:
+                    await send_file(chunk, end_response)
+                    return
+                chunk = chunk.read()
+
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else (chunk or b"")
+            if pending_head is not None:
+                status_code, status_line, response_headers = pending_head
+                pending_head = None
+                data = start_body(status_code, response_headers, data, end_response)
+                write_head(status_line, response_headers)
+            elif encoder is not None and data:
+                data = encoder.compress(data)
+            if end_response and encoder is not None:
+                data += encoder.finish()
+
+            if data and not head_only:
+                body_bytes += len(data)
+                if chunked:
+                    writer.write(b"%x\r\n%b\r\n" % (len(data), data))
+                else:
+                    writer.write(data)
+            if end_response and chunked and not head_only:
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+            send_response.ended = end_response
+        except (ConnectionResetError, BrokenPipeError) as e:
+            logger.warning(
+                f"[{request_id}] Connection lost while sending chunk: {str(e)}"
+            )
+            connection_alive = False
+            disconnected.set()
+        except Exception as e:
+            logger.warning(f"[{request_id}] Error sending chunk: {str(e)}")
+            connection_alive = False
+            disconnected.set()
+
+    async def send_file(file_body, end_response):
+        """Send a file of known length as the whole body, without copying it through user space."""
+        nonlocal body_bytes, pending_head
+        status_code, status_line, response_headers = pending_head
+        pending_head = None
+        start_body(status_code, response_headers, b"", False)
+        write_head(status_line, response_headers)
+        await writer.drain()
+        if not head_only:
+            with open(file_body.path, "rb") as f:
+                # Falls back to buffered copies where sendfile is unavailable (e.g. TLS)
+                body_bytes += await asyncio.get_running_loop().sendfile(
+                    writer.transport, f, 0, file_body.size
                 )
+        send_response.ended = end_response
 
-                if connection_alive and not (
-                    hasattr(send_response, "headers_sent")
-                    and send_response.headers_sent
-                ):
-                    try:
-                        # Send a 500 error if headers haven't been sent yet
-                        error_headers = {
-                            "Content-Type": "text/plain",
-                            "Connection": "close",
-                        }
-                        await send_response(500, error_headers)
-                        await send_chunk(
-                            f"Internal server error: {str(e)}".encode("utf-8"),
-                            end_response=True,
-                        )
-                    except:
-                        pass
+    send_chunk.disconnected = disconnected
+    watcher = asyncio.ensure_future(_watch_disconnect(reader, disconnected))
 
+    # Call the user-provided fulfill_request function with streaming capabilities
+    try:
+        await fulfill_request(
+            method=method,
+            path=urllib.parse.unquote(path),
+            headers=headers,
+            query_params=query_params,
+            body=body,
+            send_response=send_response,
+            send_chunk=send_chunk,
+        )
     except Exception as e:
         logger.error(
-            f"[{request_id}] Critical error handling request: {str(e)}", exc_info=True
+            f"[{request_id}] Error in fulfill_request: {str(e)}", exc_info=True
         )
+
+        if connection_alive and not getattr(send_response, "headers_sent", False):
+            try:
+                # Send a 500 error if headers haven't been sent yet
+                error_headers = {
+                    "Content-Type": "text/plain",
+                    "Connection": "close",
+                }
+                await send_response(500, error_headers)
+                await send_chunk(
+                    f"Internal server error: {str(e)}".encode("utf-8"),
+                    end_response=True,
+                )
+            except:
+                pass
     finally:
-        # Close the connection in a controlled manner
-        try:
-            await writer.drain()
-            writer.close()
-            await writer.wait_closed()
-            logger.debug(f"[{request_id}] Connection closed")
-        except Exception as e:
-            logger.warning(f"[{request_id}] Error closing connection: {str(e)}")
+        watcher.cancel()
+
+    if not connection_alive or not getattr(send_response, "headers_sent", False):
+        return False
+    if not getattr(send_response, "ended", False):
+        # Streaming handlers (e.g. SSE) may return without ending the response, and
+        # handlers that sent no body still have their headers pending
+        await send_chunk(b"", end_response=True)
+    if not connection_alive:
+        return False
+    if declared_length is not None and body_bytes != declared_length and not head_only:
+        # The client cannot tell where this response ends, so the connection is unusable
+        logger.warning(f"[{request_id}] Sent {body_bytes} bytes for Content-Length {declared_length}")
+        return False
+    return keep_alive
 
 
 def handle_site_parameter(query_params):
@@ -279,9 +546,16 @@ async def start_server(
     use_https=False,
     ssl_cert_file=None,
     ssl_key_file=None,
+    sock=None,
+    prepare_static=True,
+    shutdown=None,
 ):
     """
     Start the HTTP/HTTPS server with the provided request handler.
+
+    Worker processes (see webserver.prefork) pass a listening `sock` instead of a
+    host and port, and an asyncio.Event `shutdown`: once it is set the server stops
+    accepting connections and drains the open ones before returning.
     """
     import ssl
 
@@ -322,10 +596,20 @@ async def start_server(
         except (ssl.SSLError, FileNotFoundError) as e:
             raise ValueError(f"Failed to load SSL certificate: {e}")
 
+    # Index the prompts now rather than on the first request
+    ensure_prompts_loaded()
+    if prepare_static:
+        await prepare_static_files()
+
     # Start server with or without SSL
-    server = await asyncio.start_server(
-        lambda r, w: handle_client(r, w, fulfill_request), host, port, ssl=ssl_context
-    )
+    if sock is not None:
+        server = await asyncio.start_server(
+            lambda r, w: handle_client(r, w, fulfill_request), sock=sock, ssl=ssl_context
+        )
+    else:
+        server = await asyncio.start_server(
+            lambda r, w: handle_client(r, w, fulfill_request), host, port, ssl=ssl_context
+        )
 
     addr = server.sockets[0].getsockname()
     protocol = "HTTPS" if (use_https or ssl_context) else "HTTP"
@@ -333,12 +617,94 @@ async def start_server(
     print(
         f"Serving {protocol} on {addr[0]} port {addr[1]} ({url_protocol}://{addr[0]}:{addr[1]}/) ..."
     )
-    async with server:
-        await server.serve_forever()
+    if shutdown is None:
+        async with server:
+            await server.serve_forever()
+        return
+
+    await shutdown.wait()
+    server.close()
+    remaining = await drain_connections(CONFIG.server.prefork.graceful_timeout)
+    if remaining:
+        logger.warning(f"Shutting down with {remaining} connection(s) still open")
+
+
+def route_label(path):
+    """Route name used as a metrics label, following the matching order of route_request."""
+    if path in ("/health", "/healthz", "/metrics", "/", ""):
+        return path or "/"
+    if path.find("html/") != -1 or path.find("static/") != -1 or path.find("png") != -1:
+        return "static"
+    for route in ("who", "mcp", "ask"):
+        if path.find(route) != -1:
+            return "/" + route
+    return "other"
 
 
 async def fulfill_request(
     method, path, headers, query_params, body, send_response, send_chunk
+):
+    """
+    Admit an HTTP request and route it, or reject it with 503 when the server is
+    at capacity. /health and /metrics are never queued. Every request is counted
+    in the HTTP metrics.
+    """
+    route = route_label(path)
+    status_code = None
+
+    async def send_response_recorded(code, response_headers, end_response=False):
+        nonlocal status_code
+        if status_code is None:
+            status_code = int(code)
+        await send_response(code, response_headers, end_response)
+
+    HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        await admit_request(
+            method, path, headers, query_params, body, send_response_recorded, send_chunk
+        )
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        # A request that failed before responding gets a 500 from the transport
+        HTTP_REQUESTS.labels(route, str(status_code or 500)).inc()
+        HTTP_LATENCY.labels(route).observe(time.perf_counter() - start)
+
+
+async def admit_request(
+    method, path, headers, query_params, body, send_response, send_chunk
+):
+    if path == "/metrics":
+        await send_response(200, {"Content-Type": metrics.CONTENT_TYPE, "Cache-Control": "no-cache"})
+        await send_chunk(metrics.render_metrics(), end_response=True)
+        return
+
+    if path == "/health" or path == "/healthz":
+        await send_response(200, {"Content-Type": "application/json"})
+        await send_chunk(
+            json.dumps({"status": "ok", "admission": admission_controller.get_occupancy()}),
+            end_response=True,
+        )
+        return
+
+    try:
+        async with admission_controller.admit(classify_request(path, query_params)):
+            await route_request(
+                method, path, headers, query_params, body, send_response, send_chunk
+            )
+    except AdmissionRejected as e:
+        await send_response(
+            503,
+            {"Content-Type": "application/json", "Retry-After": str(e.retry_after)},
+        )
+        await send_chunk(
+            json.dumps({"error": "Server is busy, please retry later", "reason": e.reason}),
+            end_response=True,
+        )
+
+
+async def route_request(
+    method, path, headers, query_params, body, send_response, send_chunk
 ):
     """
     Process an HTTP request and stream the response back.
@@ -366,7 +732,10 @@ async def fulfill_request(
             # Serve the news interface at the root
             try:
                 await send_static_file(
-                    "static/news_interface.html", send_response, send_chunk
+                    "static/news_interface.html",
+                    send_response,
+                    send_chunk,
+                    headers,
                 )  # Updated path
             except FileNotFoundError:
                 # If news_interface.html doesn't exist, send a 404 error
@@ -380,7 +749,7 @@ async def fulfill_request(
             or path.find("static/") != -1
             or (path.find("png") != -1)
         ):
-            await send_static_file(path, send_response, send_chunk)
+            await send_static_file(path, send_response, send_chunk, headers)
             return
         elif path.find("who") != -1:
             retval = await WhoHandler(query_params, None).runQuery()
@@ -0,0 +1,235 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Admission control for the web server. Open client connections are capped at
+CONFIG.server.max_connections (a new client takes the place of an idle keep-alive
+connection rather than being turned away while there is one), and requests are admitted per class: expensive
+requests (/ask and MCP calls, which fan out into many LLM calls) and standard
+requests (static files and other cheap traffic) each have their own in-flight
+limit and bounded wait queue. Requests that cannot be admitted are rejected so
+the server can answer 503 with Retry-After instead of falling over.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from config.config import CONFIG, AdmissionLimits
+from utils import metrics
+from utils.logging_config_helper import get_configured_logger
+
+logger = get_configured_logger("admission")
+
+# Request classes
+CLASS_EXPENSIVE = "expensive"
+CLASS_STANDARD = "standard"
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, request_class: str, reason: str, retry_after: int):
+        super().__init__(f"{request_class} request rejected: {reason}")
+        self.request_class = request_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def classify_request(path: str, query_params: Dict[str, Any]) -> str:
+    """Admission class of a request, following the routing in WebServer.route_request."""
+    if path.find("html/") != -1 or path.find("static/") != -1 or path.find("png") != -1:
+        return CLASS_STANDARD
+    if path.find("who") != -1:
+        return CLASS_STANDARD
+    if path.find("mcp") != -1:
+        return CLASS_STANDARD if path in ("/mcp/health", "/mcp/healthz") else CLASS_EXPENSIVE
+    if path.find("ask") != -1:
+        return CLASS_EXPENSIVE
+    return CLASS_STANDARD
+
+
+class _Lane:
+    """In-flight count and FIFO wait queue for one request class."""
+
+    def __init__(self, name: str, limits: AdmissionLimits):
+        self.name = name
+        self.limits = limits
+        self.in_flight = 0
+        self.waiters = deque()  # futures of queued requests, in arrival order
+        # Metrics
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_wait = 0.0
+
+    def _has_slot(self) -> bool:
+        return self.limits.max_in_flight <= 0 or self.in_flight < self.limits.max_in_flight
+
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self.waiters if not waiter.done())
+
+    def release(self):
+        self.in_flight -= 1
+        while self.waiters and self._has_slot():
+            future = self.waiters.popleft()
+            if not future.done():  # skip requests that timed out or went away while queued
+                self.in_flight += 1
+                future.set_result(None)
+
+
+class AdmissionController:
+    def __init__(self):
+        self.open_connections = 0
+        self.rejected_connections = 0
+        self.reclaimed_connections = 0
+        self._lanes: Dict[str, _Lane] = {}
+
+    def _get_lane(self, name: str) -> _Lane:
+        lane = self._lanes.get(name)
+        if lane is None:
+            lane = _Lane(name, getattr(CONFIG.server.admission, name))
+            self._lanes[name] = lane
+        return lane
+
+    def open_connection(self, close_idle: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Count a new client connection; returns False if it exceeds CONFIG.server.max_connections.
+        At the cap, `close_idle` is called to close an idle keep-alive connection, if there
+        is one, and the new connection is admitted in its place while it shuts down.
+        """
+        max_connections = CONFIG.server.max_connections
+        if CONFIG.server.admission.enabled and 0 < max_connections <= self.open_connections:
+            if close_idle is not None and close_idle():
+                self.reclaimed_connections += 1
+            else:
+                self.rejected_connections += 1
+                logger.warning(f"Rejecting connection: {self.open_connections} of {max_connections} "
+                               "connections open, none idle")
+                return False
+        self.open_connections += 1
+        return True
+
+    def close_connection(self):
+        self.open_connections -= 1
+
+    @asynccontextmanager
+    async def admit(self, request_class: str):
+        """
+        Hold a slot of `request_class` for the duration of a request, waiting in the
+        class queue if all slots are taken.
+
+        Raises:
+            AdmissionRejected: If the queue is full or no slot is granted within the queue timeout
+        """
+        config = CONFIG.server.admission
+        if not config.enabled:
+            yield
+            return
+
+        lane = self._get_lane(request_class)
+        if lane._has_slot() and lane.queue_depth() == 0:
+            lane.in_flight += 1
+        else:
+            if lane.queue_depth() >= lane.limits.max_queue:
+                lane.rejected += 1
+                logger.warning(f"Rejecting {request_class} request: {lane.in_flight} in flight, "
+                               f"{lane.queue_depth()} queued")
+                raise AdmissionRejected(request_class, "queue full", config.retry_after)
+
+            future = asyncio.get_running_loop().create_future()
+            lane.waiters.append(future)
+            lane.queued += 1
+            enqueued_at = time.monotonic()
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=config.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    # Granted at the same moment we gave up; hand the slot back.
+                    lane.release()
+                else:
+                    future.cancel()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                lane.timed_out += 1
+                logger.warning(f"Rejecting {request_class} request after waiting {config.queue_timeout}s for a slot")
+                raise AdmissionRejected(request_class, "queue timeout", config.retry_after)
+            lane.max_wait = max(lane.max_wait, time.monotonic() - enqueued_at)
+
+        lane.admitted += 1
+        try:
+            yield
+        finally:
+            lane.release()
+
+    def get_occupancy(self) -> Dict[str, Any]:
+        """Current connections, in-flight and queued requests per class, and rejection counts."""
+        occupancy = {
+            "enabled": CONFIG.server.admission.enabled,
+            "connections": {
+                "open": self.open_connections,
+                "max": CONFIG.server.max_connections,
+                "rejected": self.rejected_connections,
+                "reclaimed": self.reclaimed_connections,
+            },
+        }
+        for name in (CLASS_EXPENSIVE, CLASS_STANDARD):
+            lane = self._get_lane(name)
+            occupancy[name] = {
+                "in_flight": lane.in_flight,
+                "max_in_flight": lane.limits.max_in_flight,
+                "queue_depth": lane.queue_depth(),
+                "max_queue": lane.limits.max_queue,
+                "admitted": lane.admitted,
+                "queued": lane.queued,
+                "rejected": lane.rejected,
+                "timed_out": lane.timed_out,
+                "max_wait": lane.max_wait,
+            }
+        return occupancy
+
+
+# Global singleton
+admission_controller = AdmissionController()
+
+
+def get_admission_stats() -> Dict[str, Any]:
+    return admission_controller.get_occupancy()
+
+
+def _lane_gauge(name, field):
+    def collect():
+        occupancy = admission_controller.get_occupancy()
+        return [(name, ("request_class",), (request_class,), occupancy[request_class][field])
+                for request_class in (CLASS_EXPENSIVE, CLASS_STANDARD)]
+    return collect
+
+
+def _collect_lane_outcomes():
+    occupancy = admission_controller.get_occupancy()
+    samples = [("nlweb_admission_requests_total", ("request_class", "outcome"), ("connection", "rejected"),
+                admission_controller.rejected_connections),
+               ("nlweb_admission_requests_total", ("request_class", "outcome"), ("connection", "reclaimed"),
+                admission_controller.reclaimed_connections)]
+    for request_class in (CLASS_EXPENSIVE, CLASS_STANDARD):
+        for outcome in ("admitted", "rejected", "timed_out"):
+            samples.append(("nlweb_admission_requests_total", ("request_class", "outcome"),
+                            (request_class, outcome), occupancy[request_class][outcome]))
+    return samples
+
+
+metrics.add_collector("nlweb_open_connections", "gauge", "Open client connections",
+                      lambda: [("nlweb_open_connections", (), (), admission_controller.open_connections)])
+metrics.add_collector("nlweb_admission_in_flight", "gauge", "Requests running per request class",
+                      _lane_gauge("nlweb_admission_in_flight", "in_flight"))
+metrics.add_collector("nlweb_admission_queue_depth", "gauge", "Requests waiting for admission per request class",
+                      _lane_gauge("nlweb_admission_queue_depth", "queue_depth"))
+metrics.add_collector("nlweb_admission_requests_total", "counter",
+                      "Admission decisions per request class; connections refused at the connection limit "
+                      "are counted with request_class=\"connection\"", _collect_lane_outcomes)
@@ -0,0 +1,283 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+ASGI front end for the NLWeb web server. It serves the same routes as
+WebServer.start_server (/ask, /mcp, /who, /health, static files) by adapting each
+ASGI request to the fulfill_request(send_response, send_chunk) contract, so
+HandleRequest, SendChunkWrapper and the MCP handler run unchanged. Run it under
+an ASGI server such as uvicorn, with several worker processes to use all cores:
+
+    python -m webserver.asgi --workers 4
+    uvicorn webserver.asgi:app --workers 4 --port 8000
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import argparse
+import asyncio
+import os
+import urllib.parse
+
+from config.config import CONFIG
+from prompts.prompts import ensure_prompts_loaded
+from utils.logging_config_helper import get_configured_logger
+from webserver.compression import StreamCompressor, choose_encoding, encode_body
+from webserver.static_file_handler import FileBody
+from webserver.WebServer import add_cors_headers, fulfill_request, prepare_static_files
+
+logger = get_configured_logger("asgi")
+
+# Hop-by-hop headers are managed by the ASGI server
+_HOP_BY_HOP = ("connection", "keep-alive", "transfer-encoding")
+
+
+class _ASGIResponse:
+    """send_response/send_chunk pair that writes one response through ASGI `send`."""
+
+    def __init__(self, scope, send, request_headers):
+        self.scope = scope
+        self._send = send
+        self.request_headers = request_headers
+        # Set when the client disconnects; SendChunkWrapper picks it up to cancel the query
+        self.disconnected = asyncio.Event()
+        self.headers_sent = False
+        self.ended = False
+        self._pending_head = None
+        self._encoder = None
+
+    @property
+    def connection_alive(self):
+        return not self.disconnected.is_set()
+
+    @connection_alive.setter
+    def connection_alive(self, value):
+        if value:
+            self.disconnected.clear()
+        else:
+            self.disconnected.set()
+
+    async def _emit(self, message):
+        if not self.connection_alive:
+            return
+        try:
+            await self._send(message)
+        except (OSError, RuntimeError) as e:
+            # The client went away; the ASGI server reports it as an error on send
+            logger.debug(f"Could not send response message: {e}")
+            self.connection_alive = False
+
+    async def _start(self, status_code, response_headers):
+        headers = [(str(name).lower().encode("latin-1"), str(value).encode("latin-1"))
+                   for name, value in response_headers.items()]
+        await self._emit({"type": "http.response.start", "status": status_code, "headers": headers})
+
+    async def send_response(self, status_code, response_headers, end_response=False):
+        """Send HTTP status and headers to the client."""
+        if not self.connection_alive:
+            return
+        if self.headers_sent:
+            # HandleRequest starts the SSE response that the router has already started
+            logger.debug(f"Ignoring second send_response({status_code})")
+            return
+
+        status_code = int(status_code)
+        response_headers = {name: value for name, value in response_headers.items()
+                            if name.lower() not in _HOP_BY_HOP}
+        add_cors_headers(self.request_headers, response_headers)
+
+        self.headers_sent = True
+        if end_response or status_code in (204, 304):
+            self.ended = True
+            await self._start(status_code, response_headers)
+            await self._emit({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            # Held back until the first body write so a complete body can be compressed
+            self._pending_head = (status_code, response_headers)
+
+    async def send_chunk(self, chunk, end_response=False):
+        """Send a chunk of data to the client."""
+        if not self.connection_alive:
+            return
+        if not self.headers_sent:
+            logger.warning("Headers must be sent before content")
+            return
+        if self.ended:
+            logger.warning("Response has already been ended")
+            return
+
+        if isinstance(chunk, FileBody):
+            if self._pending_head is not None and "Content-Length" in self._pending_head[1]:
+                await self._send_file(chunk, end_response)
+                return
+            chunk = chunk.read()
+
+        data = chunk.encode("utf-8") if isinstance(chunk, str) else (chunk or b"")
+        if self._pending_head is not None:
+            status_code, response_headers = self._pending_head
+            self._pending_head = None
+            encoding = choose_encoding(status_code, response_headers,
+                                       self.request_headers.get("accept-encoding"))
+            if end_response:
+                data = encode_body(data, encoding, response_headers)
+            elif encoding and "Content-Length" not in response_headers:
+                self._encoder = StreamCompressor(encoding)
+                response_headers["Content-Encoding"] = encoding
+            await self._start(status_code, response_headers)
+            if self._encoder is not None and data:
+                data = self._encoder.compress(data)
+        elif self._encoder is not None and data:
+            data = self._encoder.compress(data)
+        if end_response and self._encoder is not None:
+            data += self._encoder.finish()
+
+        self.ended = end_response
+        await self._emit({"type": "http.response.body", "body": data, "more_body": not end_response})
+
+    async def _send_file(self, file_body, end_response):
+        status_code, response_headers = self._pending_head
+        self._pending_head = None
+        await self._start(status_code, response_headers)
+        self.ended = end_response
+        with open(file_body.path, "rb") as f:
+            if "http.response.zerocopysend" in self.scope.get("extensions", {}):
+                await self._emit({"type": "http.response.zerocopysend", "file": f,
+                                  "count": file_body.size, "more_body": not end_response})
+                return
+            remaining = file_body.size
+            while remaining > 0:
+                data = f.read(min(remaining, 256 * 1024))
+                if not data:
+                    break
+                remaining -= len(data)
+                await self._emit({"type": "http.response.body", "body": data,
+                                  "more_body": remaining > 0 or not end_response})
+
+    async def finish(self):
+        """End the response if the handler returned without ending it."""
+        if not self.headers_sent:
+            await self.send_response(500, {"Content-Type": "text/plain"})
+            await self.send_chunk(b"No response was produced", end_response=True)
+        elif not self.ended:
+            await self.send_chunk(b"", end_response=True)
+
+
+async def _read_body(receive, response):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            response.connection_alive = False
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+async def _watch_disconnect(receive, response):
+    """Mark the response dead as soon as the client disconnects, so streams stop writing."""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            response.connection_alive = False
+            return
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                ensure_prompts_loaded()
+            except Exception as e:
+                logger.error(f"Loading prompts failed: {e}")
+            try:
+                await prepare_static_files()
+            except Exception as e:
+                logger.error(f"Static file preparation failed: {e}")
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application serving the NLWeb routes."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    headers = {}
+    for name, value in scope.get("headers", []):
+        headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+    response = _ASGIResponse(scope, send, headers)
+
+    body = await _read_body(receive, response)
+    if not response.connection_alive:
+        return
+    if not body and "content-length" not in headers and "transfer-encoding" not in headers:
+        body = None
+
+    query_params = {}
+    try:
+        # Parse query parameters into a dictionary of lists
+        query_string = scope.get("query_string", b"").decode("latin-1")
+        for key, values in urllib.parse.parse_qs(query_string).items():
+            query_params[key] = values
+    except Exception:
+        query_params = {}
+
+    watcher = asyncio.ensure_future(_watch_disconnect(receive, response))
+    try:
+        await fulfill_request(
+            method=scope["method"],
+            path=scope["path"],
+            headers=headers,
+            query_params=query_params,
+            body=body,
+            send_response=response.send_response,
+            send_chunk=response.send_chunk,
+        )
+    except Exception as e:
+        logger.error(f"Error in fulfill_request: {str(e)}", exc_info=True)
+        if not response.headers_sent:
+            await response.send_response(500, {"Content-Type": "text/plain"})
+            await response.send_chunk(
+                f"Internal server error: {str(e)}".encode("utf-8"), end_response=True
+            )
+    finally:
+        watcher.cancel()
+    await response.finish()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve NLWeb through uvicorn")
+    parser.add_argument("--host", default=CONFIG.server.host)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", CONFIG.port)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="Number of worker processes (default: WEB_CONCURRENCY or the CPU count)")
+    args = parser.parse_args()
+
+    ssl_options = {}
+    if CONFIG.is_ssl_enabled():
+        ssl_options = {"ssl_certfile": CONFIG.get_ssl_cert_path(), "ssl_keyfile": CONFIG.get_ssl_key_path()}
+
+    uvicorn.run(
+        "webserver.asgi:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_keep_alive=CONFIG.server.timeout,
+        # Per worker; requests beyond it get 503 from uvicorn before reaching the admission controller
+        limit_concurrency=CONFIG.server.max_connections or None,
+        **ssl_options,
+    )
+
+
+if __name__ == "__main__":
+    main()
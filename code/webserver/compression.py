@@ -0,0 +1,195 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Response compression for the web server: Accept-Encoding negotiation, one-shot
+compression of complete bodies, per-event flushing compressors for streamed
+(SSE) responses, and precompression of static files at startup. Brotli is used
+when the optional `brotli` package is installed, otherwise only gzip is offered.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import gzip
+import os
+import zlib
+from typing import Optional
+
+from config.config import CONFIG
+from utils.logging_config_helper import get_configured_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = get_configured_logger("compression")
+
+# Preferred first when the client accepts both with the same weight
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Suffix of the precompressed variant of a static file
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Only web assets in the directories served by the static file handler are precompressed;
+# the configured static root may be the whole repository
+PRECOMPRESS_DIRECTORIES = ("static", "html")
+PRECOMPRESS_EXTENSIONS = (".html", ".css", ".js", ".json", ".svg", ".xml", ".txt")
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], offered=SUPPORTED_ENCODINGS) -> Optional[str]:
+    """Pick the best of `offered` encodings acceptable to the client, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name] = weight
+    best, best_weight = None, 0.0
+    for encoding in offered:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a complete body."""
+    if encoding == "br":
+        return brotli.compress(data, quality=CONFIG.server.compression.brotli_quality)
+    return gzip.compress(data, compresslevel=CONFIG.server.compression.gzip_level, mtime=0)
+
+
+def choose_encoding(status_code: int, response_headers: dict, accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Encoding to compress a response with, or None to send it as is. Compressible
+    responses are marked as varying on Accept-Encoding either way.
+    """
+    if (not CONFIG.server.compression.enabled or not 200 <= status_code < 300
+            or "Content-Encoding" in response_headers
+            or not is_compressible(response_headers.get("Content-Type"))):
+        return None
+    response_headers["Vary"] = "Accept-Encoding"
+    return negotiate_encoding(accept_encoding)
+
+
+def encoded_etag(etag: Optional[str], encoding: str) -> Optional[str]:
+    """ETag of the `encoding` compressed representation of a response tagged `etag`."""
+    if etag and etag.endswith('"'):
+        # A strong ETag must differ between representations
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def encode_body(data: bytes, encoding: Optional[str], response_headers: dict) -> bytes:
+    """
+    Compress a complete body if it is at least the size threshold, and set the
+    Content-Encoding, Content-Length and ETag headers to match what is sent.
+    """
+    if encoding and len(data) >= CONFIG.server.compression.min_size:
+        data = compress(data, encoding)
+        response_headers["Content-Encoding"] = encoding
+        response_headers["Content-Length"] = str(len(data))
+        if "ETag" in response_headers:
+            response_headers["ETag"] = encoded_etag(response_headers["ETag"], encoding)
+    elif "Content-Length" not in response_headers:
+        response_headers["Content-Length"] = str(len(data))
+    return data
+
+
+class StreamCompressor:
+    """
+    Compressor for a streamed body. Every call to `compress` flushes, so each
+    server-sent event reaches the client as soon as it is written.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=CONFIG.server.compression.brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(CONFIG.server.compression.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def precompress_static_files(root: str) -> int:
+    """
+    Write .gz (and .br, if brotli is available) variants next to every web asset
+    under the static and html directories of `root` that is at least the compression
+    threshold, refreshing variants older than their source. Returns the number of
+    files written.
+    """
+    if not root:
+        return 0
+    written = 0
+    min_size = CONFIG.server.compression.min_size
+    for dirpath, _dirnames, filenames in _walk_asset_directories(root):
+        for filename in filenames:
+            if not filename.lower().endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            source = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(source)
+                if stat.st_size < min_size:
+                    continue
+                data = None
+                for encoding in SUPPORTED_ENCODINGS:
+                    target = source + PRECOMPRESSED_SUFFIXES[encoding]
+                    if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                        continue
+                    if data is None:
+                        with open(source, "rb") as f:
+                            data = f.read()
+                    compressed = compress(data, encoding)
+                    if len(compressed) >= len(data):
+                        continue
+                    tmp_path = target + ".tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, target)
+                    written += 1
+            except OSError as e:
+                # A read-only static directory just means files are compressed per response
+                logger.warning(f"Could not precompress {source}: {e}")
+    return written
+
+
+def _walk_asset_directories(root: str):
+    for directory in PRECOMPRESS_DIRECTORIES:
+        path = os.path.join(root, directory)
+        if os.path.isdir(path):
+            yield from os.walk(path)
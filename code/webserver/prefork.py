@@ -0,0 +1,237 @@
+# Copyright (c) 2025 Microsoft Corporation.
+# Licensed under the MIT License
+
+"""
+Multi-process mode for the web server. A master process loads the configuration,
+the prompts and the handler modules once, then forks N workers that each run
+WebServer.start_server on their own SO_REUSEPORT socket, so the kernel spreads
+connections over all cores. Read-mostly state loaded before the fork is shared
+copy-on-write; the LLM and embedding caches are shared through their SQLite disk
+tiers.
+
+Each worker enforces its own LLM scheduler limits (max_concurrency,
+requests_per_minute, tokens_per_minute), max_connections and admission limits.
+Unless prefork.split_limits is off, the master divides them by the number of
+workers before forking, so that the configured values hold for the server as
+a whole.
+
+    python -m webserver.prefork --workers 4
+
+Signals sent to the master:
+    SIGHUP           start a new set of workers, then gracefully stop the old ones
+    SIGTERM, SIGINT  gracefully stop all workers and exit
+
+Workers that die unexpectedly are replaced.
+
+WARNING: This code is under development and may undergo changes in future releases.
+Backwards compatibility is not guaranteed at this time.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+import warnings
+
+from config.config import CONFIG
+
+
+def _enable_shared_caches():
+    """Turn on the disk tiers of the LLM and embedding caches, so that workers share entries."""
+    if CONFIG.llm_cache.enabled and CONFIG.llm_cache.disk_path:
+        CONFIG.llm_cache.disk_enabled = True
+    if CONFIG.embedding_cache.enabled and CONFIG.embedding_cache.disk_path:
+        CONFIG.embedding_cache.disk_enabled = True
+
+
+def _per_worker(limit, workers):
+    """Share of a limit for one of `workers` processes; 0 (unlimited) stays 0, others stay at least 1."""
+    return -(-limit // workers) if limit > 0 else limit
+
+
+def _split_limits(workers):
+    """Divide the limits that each worker enforces on its own among the workers."""
+    scheduler = CONFIG.llm_scheduler
+    for limits in [scheduler.default, *scheduler.providers.values(), *scheduler.models.values()]:
+        limits.max_concurrency = _per_worker(limits.max_concurrency, workers)
+        limits.requests_per_minute = _per_worker(limits.requests_per_minute, workers)
+        limits.tokens_per_minute = _per_worker(limits.tokens_per_minute, workers)
+
+    server = CONFIG.server
+    server.max_connections = _per_worker(server.max_connections, workers)
+    for limits in (server.admission.expensive, server.admission.standard):
+        limits.max_in_flight = _per_worker(limits.max_in_flight, workers)
+        limits.max_queue = _per_worker(limits.max_queue, workers)
+
+
+def _preload():
+    """Import and initialize everything the workers need before forking them."""
+    from prompts.prompts import ensure_prompts_loaded
+    from webserver.WebServer import prepare_static_files
+
+    ensure_prompts_loaded()
+    asyncio.run(prepare_static_files())
+
+
+def _listen_socket(host, port, reuse_port, listen=True):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    if listen:
+        sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+    return sock
+
+
+def _run_worker(sock, host, port, reuse_port):
+    """Body of a worker process; never returns."""
+    from webserver.WebServer import fulfill_request, start_server
+
+    exit_code = 0
+    try:
+        if reuse_port:
+            # Each worker listens on its own socket, with its own accept queue
+            sock.close()
+            sock = _listen_socket(host, port, True)
+
+        async def serve():
+            shutdown = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGTERM, shutdown.set)
+            loop.add_signal_handler(signal.SIGINT, shutdown.set)
+            await start_server(fulfill_request=fulfill_request, sock=sock,
+                               prepare_static=False, shutdown=shutdown)
+
+        asyncio.run(serve())
+    except Exception as e:
+        print(f"Worker {os.getpid()} failed: {e}", file=sys.stderr)
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+class Master:
+    def __init__(self, workers, host, port):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.reuse_port = hasattr(socket, "SO_REUSEPORT")
+        # Bound by the master so that a port conflict fails at startup. With SO_REUSEPORT
+        # it does not listen, so the kernel never hands it a connection; without it the
+        # workers share this socket's accept queue
+        self.sock = _listen_socket(host, port, self.reuse_port, listen=not self.reuse_port)
+        self.children = set()  # pids of current workers
+        self.stopping = {}  # pid -> time by which it must have exited
+        self.restart_requested = False
+        self.stop_requested = False
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "restart_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "stop_requested", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "stop_requested", True))
+
+    def spawn(self):
+        with warnings.catch_warnings():
+            # The async log writer stops its thread around fork(), but the OS may not have
+            # reaped it yet when CPython counts threads, which triggers a spurious warning
+            warnings.filterwarnings("ignore", message=".*multi-threaded.*", category=DeprecationWarning)
+            pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            _run_worker(self.sock, self.host, self.port, self.reuse_port)
+        self.children.add(pid)
+
+    def stop_workers(self, pids):
+        deadline = time.monotonic() + CONFIG.server.prefork.graceful_timeout + 5
+        for pid in pids:
+            self.children.discard(pid)
+            self.stopping[pid] = deadline
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.children:
+                self.children.discard(pid)
+                print(f"Worker {pid} exited unexpectedly (status {status}), starting a replacement")
+                if not self.stop_requested:
+                    self.spawn()
+            self.stopping.pop(pid, None)
+
+    def kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.stopping.items()):
+            if now > deadline:
+                print(f"Worker {pid} did not stop in time, killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.stopping[pid] = float("inf")
+
+    def run(self):
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"Serving HTTP on {self.host} port {self.port} with {self.workers} worker processes "
+              f"(master pid {os.getpid()}, SO_REUSEPORT {'on' if self.reuse_port else 'off'}) ...")
+
+        while not self.stop_requested:
+            if self.restart_requested:
+                self.restart_requested = False
+                old = set(self.children)
+                print(f"Restarting {len(old)} worker processes")
+                # New workers are accepting before the old ones stop, so no connection is refused
+                for _ in range(self.workers):
+                    self.spawn()
+                self.stop_workers(old)
+            self.reap()
+            self.kill_overdue()
+            time.sleep(0.2)
+
+        print("Stopping worker processes")
+        self.stop_workers(set(self.children))
+        while self.stopping:
+            self.reap()
+            self.kill_overdue()
+            time.sleep(0.1)
+        self.sock.close()
+
+
+def main():
+    if not hasattr(os, "fork"):
+        raise SystemExit("webserver.prefork needs os.fork(); use webserver.asgi with uvicorn on this platform")
+
+    parser = argparse.ArgumentParser(description="Run the NLWeb web server with several worker processes")
+    parser.add_argument("--host", default=CONFIG.server.host)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", CONFIG.port)))
+    parser.add_argument("--workers", type=int, default=CONFIG.server.prefork.workers,
+                        help="Number of worker processes (default from config; 0 means one per CPU)")
+    args = parser.parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    if CONFIG.server.prefork.share_caches:
+        _enable_shared_caches()
+    if CONFIG.server.prefork.split_limits:
+        _split_limits(workers)
+    master = Master(workers, args.host, args.port)
+    _preload()
+    master.run()
+
+
+if __name__ == "__main__":
+    main()
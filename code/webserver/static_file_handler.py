@@ -4,12 +4,23 @@
 """
 This file contains the code for the static file handler.
 
+Request paths are resolved to files once and remembered. Small files are kept in
+an in-memory cache that is invalidated when a file's mtime or size changes; large
+files are streamed with sendfile. Responses carry strong ETags and Last-Modified,
+and conditional requests are answered with 304.
+
 WARNING: This code is under development and may undergo changes in future releases.
 Backwards compatibility is not guaranteed at this time.
 """
 
+import email.utils
+import hashlib
 import os
+from collections import OrderedDict
 from config.config import CONFIG
+from utils import metrics
+from webserver.compression import (PRECOMPRESSED_SUFFIXES, SUPPORTED_ENCODINGS, choose_encoding, encoded_etag,
+                                   negotiate_encoding)
 
 # Determine the application root directory based on environment
 def get_app_root():
@@ -26,107 +37,277 @@ def get_app_root():
 # Get the app root directory
 APP_ROOT = get_app_root()
 
-async def send_static_file(path, send_response, send_chunk):
-    # Map file extensions to MIME types
-    mime_types = {
-        '.html': 'text/html',
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.css': 'text/css',
-        '.js': 'application/javascript'
-    }
+# Map file extensions to MIME types
+MIME_TYPES = {
+    '.html': 'text/html',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.css': 'text/css',
+    '.js': 'application/javascript'
+}
+
+
+class FileBody:
+    """
+    A file sent as the whole body of a response. The web server streams it with
+    loop.sendfile instead of reading it into memory.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+class _CachedFile:
+    def __init__(self, stat, content):
+        self.mtime_ns = stat.st_mtime_ns
+        self.stat_size = stat.st_size
+        self.content = content  # None for files sent with sendfile
+        self.size = len(content) if content is not None else stat.st_size
+        if content is not None:
+            self.etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+        else:
+            self.etag = f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self.last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+    def matches(self, stat):
+        return self.mtime_ns == stat.st_mtime_ns and self.stat_size == stat.st_size
+
+
+class StaticFileCache:
+    """Static file contents and validators keyed by file path, bounded by total size."""
+
+    def __init__(self):
+        self._entries = OrderedDict()  # full path -> _CachedFile
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, full_path):
+        """Return an up-to-date entry for `full_path`; raises OSError if the file is gone."""
+        stat = os.stat(full_path)
+        entry = self._entries.get(full_path)
+        if entry is not None and entry.matches(stat):
+            self._entries.move_to_end(full_path)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        self._drop(full_path)
+        if stat.st_size >= CONFIG.server.static.sendfile_min_size:
+            content = None
+        else:
+            with open(full_path, 'rb') as f:
+                content = f.read()
+        entry = _CachedFile(stat, content)
+        if content is not None and not entry.matches(os.stat(full_path)):
+            # The file changed while it was being read; serve it but do not cache it
+            return entry
+        self._entries[full_path] = entry
+        self._bytes += len(content or b'')
+        while self._bytes > CONFIG.server.static.memory_cache_max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+        return entry
+
+    def _drop(self, full_path):
+        entry = self._entries.pop(full_path, None)
+        if entry is not None:
+            self._bytes -= len(entry.content or b'')
+
+    def get_stats(self):
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+# Global singleton
+static_file_cache = StaticFileCache()
+
+metrics.add_collector(
+    "nlweb_static_cache_lookups_total", "counter", "Static file cache lookups by result",
+    lambda: [("nlweb_static_cache_lookups_total", ("result",), ("hit",), static_file_cache.hits),
+             ("nlweb_static_cache_lookups_total", ("result",), ("miss",), static_file_cache.misses)])
+
+# Request path -> resolved file path, least recently used first. Bounded, since the
+# filename fallback of _probe_roots resolves any /<anything>/<existing file name>
+_resolved_paths = OrderedDict()
+RESOLVED_PATHS_MAX_ENTRIES = 4096
+
+
+def _probe_roots(safe_path):
+    """Find the file for a sanitized request path under the possible static roots."""
+    # Try multiple possible root locations
+    possible_roots = [
+        APP_ROOT,
+        os.path.join(APP_ROOT, 'site', 'wwwroot'),
+        '/home/site/wwwroot',
+        os.environ.get('HOME', ''),
+    ]
+
+    # Remove empty paths
+    possible_roots = [root for root in possible_roots if root]
+
+    for root in possible_roots:
+        try_path = os.path.join(root, safe_path)
+        if os.path.isfile(try_path):
+            return try_path
+
+    # Special case: check if removing 'html/' prefix works
+    prefixes = ['html/', 'static/']
+    for prefix in prefixes:
+        if safe_path.startswith(prefix):
+            stripped_path = safe_path[len(prefix):]  # Remove prefix
+            for root in possible_roots:
+                try_path = os.path.join(root, stripped_path)
+                if os.path.isfile(try_path):
+                    return try_path
+
+    # Special case: check if there's no html/static directory
+    # and the files are directly in the root
+    parts = safe_path.split('/')
+    if len(parts) > 1:
+        filename = parts[-1]
+        for root in possible_roots:
+            try_path = os.path.join(root, filename)
+            if os.path.isfile(try_path):
+                return try_path
+    return None
+
+
+def resolve_static_path(path):
+    """Map a request path to a file, probing the possible roots only the first time."""
+    # Remove leading slash and sanitize path
+    safe_path = os.path.normpath(path.lstrip('/'))
+    full_path = _resolved_paths.get(safe_path)
+    if full_path is not None:
+        _resolved_paths.move_to_end(safe_path)
+    else:
+        full_path = _probe_roots(safe_path)
+        if full_path is not None:
+            _resolved_paths[safe_path] = full_path
+            if len(_resolved_paths) > RESOLVED_PATHS_MAX_ENTRIES:
+                _resolved_paths.popitem(last=False)
+    return safe_path, full_path
+
+
+def find_precompressed(full_path, accept_encoding):
+    """Return (path, encoding) of an up-to-date precompressed variant acceptable to the client, or (None, None)."""
+    if not CONFIG.server.static.gzip_enabled or not accept_encoding:
+        return None, None
+    try:
+        source_mtime = os.stat(full_path).st_mtime
+        available = []
+        for encoding in SUPPORTED_ENCODINGS:
+            variant = full_path + PRECOMPRESSED_SUFFIXES[encoding]
+            if os.path.isfile(variant) and os.stat(variant).st_mtime >= source_mtime:
+                available.append(encoding)
+    except OSError:
+        return None, None
+    encoding = negotiate_encoding(accept_encoding, tuple(available))
+    if encoding is None:
+        return None, None
+    return full_path + PRECOMPRESSED_SUFFIXES[encoding], encoding
+
+
+def _not_modified(entry, etag, request_headers):
+    """Whether the client's copy is current; `etag` is that of the representation that would be sent."""
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag == etag:
+                return True
+        return False
+    if_modified_since = request_headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return entry.mtime_ns // 1_000_000_000 <= since
+    return False
+
+
+async def send_static_file(path, send_response, send_chunk, request_headers=None):
+    request_headers = request_headers or {}
 
     # Get file extension and corresponding MIME type
     file_ext = os.path.splitext(path)[1].lower()
-    content_type = mime_types.get(file_ext, 'application/octet-stream')
-    
+    content_type = MIME_TYPES.get(file_ext, 'application/octet-stream')
+
     try:
-        # Remove leading slash and sanitize path
-        safe_path = os.path.normpath(path.lstrip('/'))
-
-        # Try multiple possible root locations
-        possible_roots = [
-            APP_ROOT,
-            os.path.join(APP_ROOT, 'site', 'wwwroot'),
-            '/home/site/wwwroot',
-            os.environ.get('HOME', ''),
-        ]
-        
-        # Remove empty paths
-        possible_roots = [root for root in possible_roots if root]
-        
-        file_found = False
-        full_path = None
-       
-        for root in possible_roots:
-            try_path = os.path.join(root, safe_path)
-            if os.path.isfile(try_path):
-                full_path = try_path
-                file_found = True
-                break
-        
-        if not file_found:
-            # Special case: check if removing 'html/' prefix works
-            prefixes = ['html/', 'static/']
-            for prefix in prefixes:
-                if safe_path.startswith(prefix):
-                    stripped_path = safe_path[len(prefix):]  # Remove prefix
-                    for root in possible_roots:
-                        try_path = os.path.join(root, stripped_path)
-                        print(try_path)
-                        if os.path.isfile(try_path):
-                            full_path = try_path
-                            file_found = True
-                            break
-        
-        if not file_found:
-            # Special case: check if there's no html/static directory
-            # and the files are directly in the root
-            parts = safe_path.split('/')
-            if len(parts) > 1:
-                filename = parts[-1]
-                for root in possible_roots:
-                    try_path = os.path.join(root, filename)
-                    if os.path.isfile(try_path):
-                        full_path = try_path
-                        file_found = True
-                        break
-        
-        if file_found:
-            # Try to open and read the file
-            with open(full_path, 'rb') as f:
-                content = f.read()
-                
-            # Send successful response with proper headers
-            response_headers = {'Content-Type': content_type, 'Content-Length': str(len(content))}
-            
+        safe_path, full_path = resolve_static_path(path)
+
+        if full_path is not None:
+            # Serve a precompressed variant if the client accepts one
+            variant_path, encoding = find_precompressed(full_path, request_headers.get('accept-encoding'))
+            try:
+                entry = static_file_cache.get(variant_path or full_path)
+            except FileNotFoundError:
+                # The file was removed since its path was resolved
+                _resolved_paths.pop(safe_path, None)
+                raise
+
+            response_headers = {'Content-Type': content_type,
+                                'ETag': entry.etag,
+                                'Last-Modified': entry.last_modified}
+            if encoding:
+                response_headers['Content-Encoding'] = encoding
+            if CONFIG.server.static.gzip_enabled:
+                response_headers['Vary'] = 'Accept-Encoding'
+
             # Add cache headers if caching is enabled
             if CONFIG.server.static.enable_cache:
                 response_headers['Cache-Control'] = f'public, max-age={CONFIG.server.static.cache_max_age}'
             else:
                 response_headers['Cache-Control'] = 'no-cache'
-                
+
+            # A body in memory without a precompressed variant is compressed by the web server,
+            # which tags it like encode_body does; a 304 must carry the ETag the 200 would have
+            etag = entry.etag
+            if encoding is None and entry.content is not None:
+                server_encoding = choose_encoding(200, response_headers, request_headers.get('accept-encoding'))
+                if server_encoding and entry.size >= CONFIG.server.compression.min_size:
+                    etag = encoded_etag(etag, server_encoding)
+
+            if _not_modified(entry, etag, request_headers):
+                response_headers.pop('Content-Type')
+                response_headers['ETag'] = etag
+                await send_response(304, response_headers)
+                return
+
+            # Send successful response with proper headers
+            response_headers['Content-Length'] = str(entry.size)
             await send_response(200, response_headers)
-            await send_chunk(content, end_response=True)
+            if entry.content is not None:
+                await send_chunk(entry.content, end_response=True)
+            else:
+                await send_chunk(FileBody(variant_path or full_path, entry.size), end_response=True)
             return
-        
+
         # If we reached here, the file was not found
-        error_msg = f"File not found (1): {path} {full_path}{possible_roots}{safe_path}"
-       
+        error_msg = f"File not found (1): {path} {safe_path}"
+
         await send_response(404, {'Content-Type': 'text/plain'})
         await send_chunk(error_msg.encode('utf-8'), end_response=True)
-        
+
     except FileNotFoundError:
         # Send 404 if file not found
         error_msg = f"File not found (2): {path}"
-       
+
         await send_response(404, {'Content-Type': 'text/plain'})
         await send_chunk(error_msg.encode('utf-8'), end_response=True)
-        
+
     except Exception as e:
         # Send 500 for other errors
         error_msg = f"Internal server error: {str(e)}"
-       
+
         await send_response(500, {'Content-Type': 'text/plain'})
-        await send_chunk(error_msg.encode('utf-8'), end_response=True)
\ No newline at end of file
+        await send_chunk(error_msg.encode('utf-8'), end_response=True)